@@ -0,0 +1,513 @@
+"""Filtros e agregações do painel de vendas, independentes do Streamlit.
+
+As agregações operam sobre o cubo de ``cube.build_cube`` (medidas aditivas por
+dia/estado/canal/categoria/marca/produto) e devolvem quadros novos, sem alterar
+as entradas, que são compartilhadas entre sessões. Pedidos distintos do recorte
+(total e por canal) vêm de ``sketch.OrderCounter`` quando há um: somar
+``pedidos`` das células conta duas vezes pedidos com itens em várias células.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from concurrent.futures import Executor
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import StageProfiler
+from schema import day_key_of
+from sketch import OrderCounter
+from timeindex import (
+    DailyPrefixIndex,
+    PeriodRollups,
+    comparison_periods,
+    period_keys,
+    period_label,
+    period_start,
+    prorate_targets,
+    spread_targets,
+)
+
+TOP_PRODUTOS = 12
+FILTER_COLUMNS = {"estados": "estado", "canais": "canal", "categorias": "categoria"}
+
+# entradas de cada seção do painel: campos de filtro, a versão dos arquivos de vendas
+# ou de metas, o modo de contagem de pedidos, o grão do gráfico de meta vs. realizado,
+# ou outra seção. As metas não dependem de categorias, e as seções só de vendas não
+# mudam quando apenas o arquivo de metas muda.
+SECTION_DEPENDENCIES: dict[str, tuple[str, ...]] = {
+    "filtro": ("versao_vendas", "inicio", "fim", "estados", "canais", "categorias"),
+    "metas": ("versao_metas", "estados", "canais", "inicio", "fim"),
+    "pedidos": ("filtro", "modo_pedidos"),
+    "comparacao": ("filtro",),
+    "kpis": ("filtro", "metas", "pedidos"),
+    "meta_real": ("filtro", "versao_metas", "grao"),
+    "canal": ("filtro", "pedidos"),
+    "categoria": ("filtro",),
+    "estado": ("filtro",),
+    "produtos": ("filtro", "metas"),
+}
+
+
+def filter_key(filtros: dict) -> tuple:
+    """Chave canônica de um estado de filtros: a ordem da seleção não importa."""
+    return (
+        filtros["inicio"],
+        filtros["fim"],
+        tuple(sorted(filtros["estados"])),
+        tuple(sorted(filtros["canais"])),
+        tuple(sorted(filtros["categorias"])),
+    )
+
+
+def parse_string_list(valor: Any, chave: str) -> list[str]:
+    """Lista de textos vinda do JSON; outro tipo (inclusive um texto solto) é erro do cliente."""
+    if not isinstance(valor, list) or not all(isinstance(item, str) for item in valor):
+        raise ValueError(f"{chave} deve ser uma lista de textos")
+    return valor
+
+
+def parse_filters(payload: dict[str, Any], dimensoes: dict[str, Any]) -> dict[str, Any]:
+    """Filtros no formato do painel a partir do JSON; ausentes ou vazios valem "todos"."""
+    desconhecidos = set(payload) - {"inicio", "fim", "secoes", "grao", *FILTER_COLUMNS}
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    filtros: dict[str, Any] = {}
+    for chave in ("inicio", "fim"):
+        valor = payload.get(chave)
+        try:
+            filtros[chave] = dt.date.fromisoformat(valor) if valor else dimensoes[chave]
+        except (TypeError, ValueError):
+            raise ValueError(f"{chave} deve ser uma data AAAA-MM-DD, recebido {valor!r}") from None
+    if filtros["inicio"] > filtros["fim"]:
+        raise ValueError("inicio é posterior a fim")
+    for chave in FILTER_COLUMNS:
+        valores = parse_string_list(payload.get(chave) or [], chave)
+        invalidos = set(valores) - set(dimensoes[chave])
+        if invalidos:
+            raise ValueError(f"Valores inválidos em {chave}: {', '.join(sorted(map(str, invalidos)))}")
+        filtros[chave] = list(valores) or list(dimensoes[chave])
+    return filtros
+
+
+def section_key(secao: str, entradas: dict[str, Hashable]) -> tuple:
+    """Chave de cache da seção: só os valores das entradas de que ela depende."""
+    return (secao,) + tuple(
+        section_key(dep, entradas) if dep in SECTION_DEPENDENCIES else entradas[dep]
+        for dep in SECTION_DEPENDENCIES[secao]
+    )
+
+
+def filter_positions(df: pd.DataFrame, filtros: dict) -> slice | np.ndarray:
+    """Linhas de ``df`` que atendem aos filtros; ``df`` precisa estar ordenado por ``dia``.
+
+    O período vira um intervalo contíguo por busca binária. Estados, canais e
+    categorias são testados só dentro desse intervalo, por tabela de consulta
+    sobre os códigos categóricos, e ignorados quando todos os valores estão
+    selecionados.
+    """
+    dias = df["dia"].to_numpy()
+    inicio = int(np.searchsorted(dias, day_key_of(filtros["inicio"]), side="left"))
+    fim = int(np.searchsorted(dias, day_key_of(filtros["fim"]), side="right"))
+
+    mascara = None
+    for chave, col in FILTER_COLUMNS.items():
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            permitido = serie.cat.categories.isin(filtros[chave])
+            if permitido.all():
+                continue
+            # código -1 (ausente) cai na última posição, sempre False
+            teste = np.append(permitido, False)[serie.cat.codes.to_numpy()[inicio:fim]]
+        else:
+            teste = np.isin(serie.to_numpy()[inicio:fim], list(filtros[chave]))
+        mascara = teste if mascara is None else mascara & teste
+
+    if mascara is None:
+        return slice(inicio, fim)
+    return inicio + np.flatnonzero(mascara)
+
+
+def filter_data(df: pd.DataFrame, filtros: dict) -> pd.DataFrame:
+    # sem cópia explícita: quando só o período filtra, o resultado é uma fatia de
+    # ``df``; quem precisar alterar o quadro deve chamar .copy()
+    return df.iloc[filter_positions(df, filtros)]
+
+
+def selected_targets(targets: pd.DataFrame, filtros: dict) -> pd.DataFrame:
+    """Metas mensais dos estados e canais filtrados, de todos os meses."""
+    return targets[targets["estado"].isin(filtros["estados"]) & targets["canal"].isin(filtros["canais"])]
+
+
+def filter_targets(targets: pd.DataFrame, filtros: dict) -> pd.DataFrame:
+    """Metas do recorte: meses do período proporcionais aos dias filtrados (``timeindex.prorate_targets``).
+
+    É a regra do cartão de meta, do rateio por produto e, dia a dia, do gráfico
+    de meta vs. realizado, que assim somam o mesmo total em qualquer grão.
+    """
+    return prorate_targets(selected_targets(targets, filtros), filtros["inicio"], filtros["fim"])
+
+
+def target_totals(metas_filtradas: pd.DataFrame) -> tuple[float, int]:
+    """Meta de faturamento e de pedidos do recorte (pedidos arredondados depois de somar)."""
+    if metas_filtradas.empty:
+        return 0.0, 0
+    return float(metas_filtradas["meta_faturamento"].sum()), int(round(metas_filtradas["meta_pedidos"].sum()))
+
+
+def meta_vs_real(realizado: pd.Series, meta: pd.Series, grao: str = "mes") -> pd.DataFrame:
+    """Junta meta e realizado indexados pela chave de período de ``timeindex.period_keys``."""
+    combinado = pd.DataFrame({"meta": meta, "realizado": realizado}).fillna(0).sort_index()
+    chaves = combinado.index.to_numpy()
+    combinado = combinado.reset_index(drop=True)
+    combinado.insert(0, "periodo", period_label(chaves, grao))
+    combinado.insert(1, "periodo_inicio", period_start(chaves, grao))
+    return combinado
+
+
+def period_meta_vs_real(
+    filtrado: pd.DataFrame,
+    targets: pd.DataFrame,
+    filtros: dict,
+    grao: str = "mes",
+    rollups: PeriodRollups | None = None,
+) -> pd.DataFrame:
+    """Meta vs. realizado por dia, semana ISO, mês ou trimestre.
+
+    Com ``rollups``, o realizado sai das tabelas pré-agregadas do grão; sem ele,
+    as linhas de ``filtrado`` são agrupadas na hora. A meta é a das metas mensais
+    distribuídas pelos dias do período filtrado (``timeindex.spread_targets``).
+    """
+    if rollups is not None:
+        realizado = rollups.realized(filtros, grao)
+    else:
+        realizado = pd.Series(filtrado["receita"].to_numpy()).groupby(period_keys(filtrado["dia"], grao)).sum()
+    meta = spread_targets(selected_targets(targets, filtros), filtros["inicio"], filtros["fim"], grao)
+    return meta_vs_real(realizado, meta, grao)
+
+
+def compute_kpis(
+    filtrado: pd.DataFrame,
+    metas_filtradas: pd.DataFrame,
+    pedidos: int | None = None,
+    totais: dict[str, float] | None = None,
+) -> dict[str, float]:
+    """KPIs do recorte; ``pedidos`` (distintos) substitui a soma das células quando informado.
+
+    ``totais`` traz receita e lucro já somados (por exemplo, pelo índice de acumulados).
+    """
+    meta_total, meta_ped = target_totals(metas_filtradas)
+    return kpis_from_totals(
+        receita_total=float(filtrado["receita"].sum()) if totais is None else totais["receita"],
+        pedidos=int(filtrado["pedidos"].sum()) if pedidos is None else pedidos,
+        lucro=float(filtrado["lucro"].sum()) if totais is None else totais["lucro"],
+        meta_total=meta_total,
+        meta_ped=meta_ped,
+    )
+
+
+def kpis_from_totals(
+    receita_total: float, pedidos: int, lucro: float, meta_total: float, meta_ped: int
+) -> dict[str, float]:
+    return {
+        "receita_total": receita_total,
+        "pedidos": pedidos,
+        "ticket": receita_total / pedidos if pedidos else 0,
+        "margem_pct": (lucro / receita_total * 100) if receita_total else 0,
+        "meta_total": meta_total,
+        "meta_ped": meta_ped,
+        "progresso_meta": (receita_total / meta_total * 100) if meta_total else 0,
+        "gap_meta": receita_total - meta_total,
+    }
+
+
+def channel_summary(filtrado: pd.DataFrame, pedidos: pd.Series | None = None) -> pd.DataFrame:
+    canal = (
+        filtrado.groupby("canal", as_index=False, observed=True)
+        .agg(receita=("receita", "sum"), pedidos=("pedidos", "sum"), margem=("lucro", "sum"))
+    )
+    if pedidos is not None:
+        canal["pedidos"] = canal["canal"].astype(str).map(pedidos).fillna(0).astype(np.int64)
+    canal["margem_pct"] = (canal["margem"] / canal["receita"] * 100).round(1)
+    return canal
+
+
+def category_mix(filtrado: pd.DataFrame) -> pd.DataFrame:
+    return (
+        filtrado.groupby(["categoria", "marca"], as_index=False, observed=True)
+        .agg(receita=("receita", "sum"))
+        .astype({"categoria": str, "marca": str})
+    )
+
+
+def state_summary(filtrado: pd.DataFrame) -> pd.DataFrame:
+    estados = (
+        filtrado.groupby("estado", as_index=False, observed=True)
+        .agg(receita=("receita", "sum"), margem=("lucro", "sum"))
+    )
+    estados["margem_pct"] = (estados["margem"] / estados["receita"] * 100).round(1)
+    return estados
+
+
+def _codes_in(serie: pd.Series, valores: pd.Index) -> np.ndarray:
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # traduz só as categorias e depois indexa pelos códigos, sem converter linha a linha
+        traducao = np.append(valores.get_indexer(serie.cat.categories.astype(str)), -1)
+        return traducao[serie.cat.codes.to_numpy()].astype(np.int64)
+    return valores.get_indexer(serie.astype(str)).astype(np.int64)
+
+
+class ProductAllocator:
+    """Rateio da meta por produto e seleção do top N sobre o cubo.
+
+    Montado uma vez por versão dos dados: guarda, para cada célula do cubo, o
+    código do produto (produto/marca/categoria) e do par estado/canal. Para um
+    estado de filtros, a receita por produto sai de um ``np.bincount`` sobre as
+    células selecionadas e o top N é escolhido por seleção parcial
+    (``np.argpartition``), sem ordenar o catálogo inteiro. A meta de cada
+    estado/canal é distribuída pela participação de cada produto, calculada só
+    para os N escolhidos: o custo não cresce com catálogo × estado/canal, o que
+    importa em catálogos de centenas de milhares de SKUs.
+    """
+
+    def __init__(self, cubo: pd.DataFrame) -> None:
+        grupos = cubo.groupby(["produto", "marca", "categoria"], observed=True, sort=True)
+        self.produto_idx = grupos.ngroup().to_numpy(np.int64)
+        self.catalogo = grupos.size().reset_index()[["produto", "marca", "categoria"]].astype(str)
+        self.estados = pd.Index(sorted(pd.unique(cubo["estado"]).astype(str)))
+        self.canais = pd.Index(sorted(pd.unique(cubo["canal"]).astype(str)))
+        self.ec_idx = self.ec_codes(cubo)
+
+    @classmethod
+    def restore(
+        cls, produto_idx: np.ndarray, ec_idx: np.ndarray, catalogo: pd.DataFrame, estados: list[str], canais: list[str]
+    ) -> "ProductAllocator":
+        """Remonta um alocador já calculado (por exemplo, mapeado de ``shared``) sem percorrer o cubo."""
+        alocador = cls.__new__(cls)
+        alocador.produto_idx = produto_idx
+        alocador.ec_idx = ec_idx
+        alocador.catalogo = catalogo
+        alocador.estados = pd.Index(estados)
+        alocador.canais = pd.Index(canais)
+        return alocador
+
+    def __sizeof__(self) -> int:
+        # os vetores têm o comprimento do cubo: sem eles o teto em bytes do cache de dados subestima a entrada
+        return (
+            self.produto_idx.nbytes
+            + self.ec_idx.nbytes
+            + int(self.catalogo.memory_usage(index=True, deep=True).sum())
+            + self.estados.memory_usage(deep=True)
+            + self.canais.memory_usage(deep=True)
+            + object.__sizeof__(self)
+        )
+
+    def ec_codes(self, df: pd.DataFrame) -> np.ndarray:
+        """Código estado × canal de cada linha (-1 para pares fora do cubo)."""
+        estado = _codes_in(df["estado"], self.estados)
+        canal = _codes_in(df["canal"], self.canais)
+        return np.where((estado >= 0) & (canal >= 0), estado * len(self.canais) + canal, -1)
+
+    def top(
+        self,
+        cubo: pd.DataFrame,
+        posicoes: slice | np.ndarray,
+        metas_filtradas: pd.DataFrame,
+        n: int = TOP_PRODUTOS,
+    ) -> pd.DataFrame:
+        n_prod, n_ec = len(self.catalogo), len(self.estados) * len(self.canais)
+        produto = self.produto_idx[posicoes]
+        ec = self.ec_idx[posicoes]
+        receita = cubo["receita"].to_numpy()[posicoes]
+
+        receita_prod = np.bincount(produto, weights=receita, minlength=n_prod)
+        receita_total_ec = np.bincount(ec, weights=receita, minlength=n_ec)
+
+        meta_ec_idx = self.ec_codes(metas_filtradas)
+        validos = meta_ec_idx >= 0
+        meta_ec = np.bincount(
+            meta_ec_idx[validos], weights=metas_filtradas["meta_faturamento"].to_numpy()[validos], minlength=n_ec
+        )
+        # participação de cada produto na receita do estado/canal × meta do estado/canal
+        fator = np.divide(meta_ec, receita_total_ec, out=np.zeros(n_ec), where=receita_total_ec > 0)
+
+        pedidos = np.bincount(produto, weights=cubo["pedidos"].to_numpy()[posicoes], minlength=n_prod)
+        linhas = np.bincount(produto, weights=cubo["linhas"].to_numpy()[posicoes], minlength=n_prod)
+
+        candidatos = np.flatnonzero(linhas > 0)
+        if len(candidatos) > n:
+            candidatos = candidatos[np.argpartition(-receita_prod[candidatos], n - 1)[:n]]
+        escolhidos = candidatos[np.argsort(-receita_prod[candidatos], kind="stable")]
+
+        # receita dos escolhidos por estado/canal: matriz N × estado/canal, não catálogo × estado/canal
+        posto = np.full(n_prod, -1, dtype=np.int64)
+        posto[escolhidos] = np.arange(len(escolhidos))
+        linha = posto[produto]
+        dos_escolhidos = linha >= 0
+        receita_pec = np.bincount(
+            linha[dos_escolhidos] * n_ec + ec[dos_escolhidos],
+            weights=receita[dos_escolhidos],
+            minlength=len(escolhidos) * n_ec,
+        ).reshape(len(escolhidos), n_ec)
+        meta = receita_pec @ fator
+
+        produtos = self.catalogo.iloc[escolhidos].reset_index(drop=True)
+        produtos["receita"] = receita_prod[escolhidos]
+        produtos["pedidos"] = pedidos[escolhidos].astype(np.int64)
+        # média da receita por linha de pedido, recomposta a partir das somas do cubo
+        produtos["ticket"] = receita_prod[escolhidos] / linhas[escolhidos]
+        produtos["meta"] = meta
+        return format_top_products(produtos)
+
+
+def format_top_products(produtos: pd.DataFrame) -> pd.DataFrame:
+    """Atingimento e arredondamentos da tabela de top produtos (receita, pedidos, ticket e meta já somados)."""
+    produtos["atingido_pct"] = np.where(produtos["meta"] > 0, (produtos["receita"] / produtos["meta"]) * 100, np.nan)
+
+    produtos["receita"] = produtos["receita"].round(2)
+    produtos["meta"] = produtos["meta"].round(2)
+    produtos["ticket"] = produtos["ticket"].round(2)
+    produtos["atingido_pct"] = produtos["atingido_pct"].round(1)
+    produtos["% atingido"] = produtos["atingido_pct"].apply(lambda x: f"{x:.1f}%" if pd.notna(x) else "—")
+    return produtos
+
+
+def order_counts(contador: OrderCounter, filtros: dict) -> dict[str, Any]:
+    """Pedidos distintos do recorte, no total e por canal."""
+    posicoes = filter_positions(contador.grupos, filtros)
+    return {"total": contador.count(posicoes), "canal": contador.count_by(posicoes, "canal")}
+
+
+def period_comparison(indice: DailyPrefixIndex, filtros: dict) -> dict[str, dict[str, Any] | None]:
+    """Receita, lucro e margem do período e dos períodos de comparação (None se não houver vendas).
+
+    ``cobertura`` é a fração dos dias do período dentro da base: abaixo de 1, os
+    totais são de só parte do período e não servem para calcular variação.
+    """
+
+    def resumo(inicio, fim) -> dict[str, Any] | None:
+        totais = indice.totals(filtros, inicio, fim)
+        if not totais["linhas"]:
+            return None
+        return {
+            "inicio": inicio,
+            "fim": fim,
+            "receita": totais["receita"],
+            "lucro": totais["lucro"],
+            "margem_pct": totais["lucro"] / totais["receita"] * 100 if totais["receita"] else 0,
+            "cobertura": indice.coverage(inicio, fim),
+        }
+
+    periodos = {"atual": (filtros["inicio"], filtros["fim"]), **comparison_periods(filtros["inicio"], filtros["fim"])}
+    return {nome: resumo(inicio, fim) for nome, (inicio, fim) in periodos.items()}
+
+
+def top_products(filtrado: pd.DataFrame, metas_filtradas: pd.DataFrame, n: int = TOP_PRODUTOS) -> pd.DataFrame:
+    return ProductAllocator(filtrado).top(filtrado, slice(None), metas_filtradas, n)
+
+
+def build_views(
+    df: pd.DataFrame,
+    targets: pd.DataFrame,
+    filtros: dict,
+    alocador: ProductAllocator | None = None,
+    profiler: StageProfiler | None = None,
+    memo: Callable[[Hashable, Callable[[], Any]], Any] | None = None,
+    versoes: dict[str, Hashable] | None = None,
+    contador: OrderCounter | None = None,
+    indice: DailyPrefixIndex | None = None,
+    rollups: PeriodRollups | None = None,
+    grao: str = "mes",
+    executor: Executor | None = None,
+) -> dict[str, Any] | None:
+    """Todos os agregados do painel para um estado de filtros (None se não houver vendas).
+
+    ``alocador`` deve ter sido montado sobre o mesmo ``df``; sem ele, é montado na hora.
+    Com ``profiler`` ligado, cada seção é medida como uma etapa. ``memo`` (por
+    exemplo ``LRUCache.get_or_compute``) guarda cada seção sob ``section_key``;
+    ``versoes`` traz as versões dos arquivos de vendas e de metas que entram na chave.
+    Sem ``contador``, pedidos são a soma das células (exata só com um item por pedido).
+    Com ``indice``, receita e lucro dos KPIs saem dos acumulados por dia, e a
+    seção "comparacao" traz os mesmos totais para os períodos de comparação.
+    ``grao`` é o grão da seção "meta_real", lida de ``rollups`` quando informado.
+
+    Com ``executor`` (um pool de threads), as seções que não dependem umas das
+    outras são calculadas ao mesmo tempo, em duas fases: metas, pedidos e
+    comparação; depois KPIs, meta vs. realizado, canal, categoria, estado e
+    produtos. Cada seção é a mesma função do caminho sequencial sobre os mesmos
+    dados, então o resultado é idêntico. Com o profiler ligado as seções rodam
+    em sequência, para que tempo e memória de cada etapa sejam só dela.
+    """
+    profiler = profiler or StageProfiler()
+    memo = memo or (lambda chave, calcular: calcular())
+    inicio, fim, estados, canais, categorias = filter_key(filtros)
+    entradas: dict[str, Hashable] = {
+        "versao_vendas": None,
+        "versao_metas": None,
+        **(versoes or {}),
+        "modo_pedidos": contador.modo if contador is not None else "celulas",
+        "inicio": inicio,
+        "fim": fim,
+        "estados": estados,
+        "canais": canais,
+        "categorias": categorias,
+        "grao": grao,
+    }
+
+    # o filtro roda sempre (busca binária + máscara); só as seções derivadas vão para o cache
+    with profiler.etapa("filtro", len(df)) as medida:
+        posicoes = filter_positions(df, filtros)
+        filtrado = df.iloc[posicoes]
+        medida["linhas_saida"] = len(filtrado)
+    if filtrado.empty:
+        return None
+
+    def secao(nome: str, linhas: int, calcular: Callable[[], Any]) -> Any:
+        with profiler.etapa(nome, linhas) as medida:
+            valor = memo(section_key(nome, entradas), calcular)
+            medida["linhas_saida"] = len(valor)
+        return valor
+
+    def rodar(tarefas: dict[str, Callable[[], Any]]) -> dict[str, Any]:
+        if executor is None or profiler.enabled:
+            return {nome: calcular() for nome, calcular in tarefas.items()}
+        futuros = {nome: executor.submit(calcular) for nome, calcular in tarefas.items()}
+        return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+    linhas = len(filtrado)
+    fase1 = {
+        "metas": lambda: secao("metas", len(targets), lambda: filter_targets(targets, filtros))
+    }
+    if contador is not None:
+        fase1["pedidos"] = lambda: secao("pedidos", len(contador.grupos), lambda: order_counts(contador, filtros))
+    if indice is not None:
+        fase1["comparacao"] = lambda: secao(
+            "comparacao", len(indice.acumulado["receita"]), lambda: period_comparison(indice, filtros)
+        )
+    dependencias = rodar(fase1)
+    metas_filtradas = dependencias["metas"]
+    pedidos = dependencias.get("pedidos", {"total": None, "canal": None})
+    comparacao = dependencias.get("comparacao")
+    totais = comparacao["atual"] if comparacao is not None else None
+
+    views = rodar(
+        {
+            "kpis": lambda: secao(
+                "kpis", linhas, lambda: compute_kpis(filtrado, metas_filtradas, pedidos["total"], totais)
+            ),
+            "meta_real": lambda: secao(
+                "meta_real", linhas, lambda: period_meta_vs_real(filtrado, targets, filtros, grao, rollups)
+            ),
+            "canal": lambda: secao("canal", linhas, lambda: channel_summary(filtrado, pedidos["canal"])),
+            "categoria": lambda: secao("categoria", linhas, lambda: category_mix(filtrado)),
+            "estados": lambda: secao("estado", linhas, lambda: state_summary(filtrado)),
+            "produtos": lambda: secao(
+                "produtos", linhas, lambda: (alocador or ProductAllocator(df)).top(df, posicoes, metas_filtradas)
+            ),
+        }
+    )
+    if comparacao is not None:
+        views["comparacao"] = comparacao
+    return views
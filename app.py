@@ -1,22 +1,65 @@
 ﻿from __future__ import annotations
 
+from functools import partial
 from pathlib import Path
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
 import urllib.parse
+import uuid
+from typing import Callable
 
-import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
+from cache import LRUCache
+from engine import AGG_WORKERS_PADRAO, BACKENDS, DashboardEngine
+from export import FORMATOS, prune_exports
+from figures import ROTULOS_GRAO, category_figure, channel_figure, frame_digest, meta_real_figure, state_figure
+from instrumentation import StageProfiler, rotating_log
+from sketch import MODOS
+from warmup import WARMUP_PADRAO, WarmUp, parse_warmup, read_extras
+
 st.set_page_config(
     page_title="Painel de Vendas - Eletrônicos",
     page_icon="💡",
     layout="wide",
 )
 
-DATA_PATH = Path(__file__).parent / "data" / "sales_data.csv"
-TARGETS_PATH = Path(__file__).parent / "data" / "monthly_targets.csv"
+DATA_DIR = Path(__file__).parent / "data"
 LOGO_PATH = Path(__file__).parent / "assets" / "logo.svg"
+DATA_CACHE_MAX_MB = int(os.environ.get("PAINEL_DATA_CACHE_MB", "2048"))
+VIEWS_CACHE_ENTRIES = int(os.environ.get("PAINEL_VIEWS_CACHE_ENTRIES", "1024"))
+FIGURES_CACHE_ENTRIES = int(os.environ.get("PAINEL_FIGURES_CACHE_ENTRIES", "256"))
+# "pandas" (referência, cubo em memória) ou "duckdb" (SQL direto sobre os arquivos)
+QUERY_BACKEND = os.environ.get("PAINEL_BACKEND", "pandas").lower()
+DUCKDB_THREADS = int(os.environ.get("PAINEL_DUCKDB_THREADS", "0")) or None
+# "exato" (padrão) ou "hll" (estimativa combinável, para bases com muitos pedidos por grupo) para pedidos distintos
+ORDER_COUNT_MODE = os.environ.get("PAINEL_PEDIDOS", "exato").lower()
+# diretório em memória (ex. /dev/shm/painel) onde o cubo é publicado uma vez para todos os processos
+SHARED_DIR = os.environ.get("PAINEL_SHARED_DIR")
+# threads que calculam as seções independentes de uma visão ao mesmo tempo; 1 volta ao caminho sequencial
+AGG_WORKERS = int(os.environ.get("PAINEL_AGG_WORKERS", str(AGG_WORKERS_PADRAO)))
+# visões pré-calculadas em segundo plano ao subir o processo: cada valor destes filtros sozinho
+WARMUP = os.environ.get("PAINEL_WARMUP", WARMUP_PADRAO)
+WARMUP_FILE = os.environ.get("PAINEL_WARMUP_FILE")
+WARMUP_WORKERS = int(os.environ.get("PAINEL_WARMUP_WORKERS", "2"))
+PROFILE_LOG = os.environ.get("PAINEL_PROFILE_LOG")
+# exportações do recorte: gravadas em disco por um processo à parte, poucas ao mesmo tempo por processo
+EXPORT_DIR = Path(os.environ.get("PAINEL_EXPORT_DIR", Path(tempfile.gettempdir()) / "painel_exports"))
+EXPORT_MAX = int(os.environ.get("PAINEL_EXPORT_MAX", "2"))
+# a pasta é compartilhada: sessões abandonadas não apagam o que exportaram, a limpeza é por idade e quantidade
+EXPORT_TTL_H = float(os.environ.get("PAINEL_EXPORT_TTL_H", "6"))
+EXPORT_KEEP = int(os.environ.get("PAINEL_EXPORT_KEEP", "20"))
+EXPORT_PREFIX = "vendas_"
+# acima deste tamanho o arquivo não passa pelo navegador (o download é servido da memória); fica só o caminho
+EXPORT_DOWNLOAD_MB = float(os.environ.get("PAINEL_EXPORT_DOWNLOAD_MB", "50"))
+PROFILE_LOG_MB = float(os.environ.get("PAINEL_PROFILE_LOG_MB", "5"))
 
 CUSTOM_CSS = """
 <style>
@@ -77,55 +120,249 @@ def fmt_percent(value: float) -> str:
     return f"{value:.1f}%"
 
 
-def load_data() -> tuple[pd.DataFrame, pd.DataFrame]:
-    data = pd.read_csv(DATA_PATH, parse_dates=["data"])
-    data["ano_mes"] = pd.PeriodIndex(data["data"], freq="M").astype(str)
-    data["mes_ord"] = pd.PeriodIndex(data["data"], freq="M").to_timestamp()
-    targets = pd.read_csv(TARGETS_PATH)
-    return data, targets
+# rótulo no seletor -> chave em views["comparacao"] (analytics.period_comparison)
+COMPARACOES = {
+    "Sem comparação": None,
+    "Mesmo período do ano anterior": "ano_anterior",
+    "Período anterior": "periodo_anterior",
+}
 
 
-def filter_data(df: pd.DataFrame, filtros: dict) -> pd.DataFrame:
-    mask = (
-        (df["data"].dt.date >= filtros["inicio"]) &
-        (df["data"].dt.date <= filtros["fim"]) &
-        (df["estado"].isin(filtros["estados"])) &
-        (df["canal"].isin(filtros["canais"])) &
-        (df["categoria"].isin(filtros["categorias"]))
+def comparison_deltas(comparacao: dict, chave: str | None) -> tuple[str | None, str | None, str | None]:
+    """Deltas de faturamento (%) e margem (p.p.) contra o período de comparação, com a legenda do período."""
+    if chave is None:
+        return None, None, None
+    base, atual = comparacao[chave], comparacao["atual"]
+    if base is None:
+        return "sem vendas no período de comparação", None, None
+    if base["cobertura"] < 1 or atual["cobertura"] < 1:
+        # parte do período fica fora da base: a variação compararia durações diferentes
+        return "período de comparação fora da base", None, None
+    legenda = f"{base['inicio']:%d/%m/%Y} - {base['fim']:%d/%m/%Y}"
+    faturamento = (atual["receita"] / base["receita"] - 1) * 100 if base["receita"] else None
+    return (
+        f"{faturamento:+.1f}%".replace(".", ",") if faturamento is not None else None,
+        f"{atual['margem_pct'] - base['margem_pct']:+.1f}".replace(".", ",") + " p.p.",
+        legenda,
     )
-    return df.loc[mask].copy()
 
 
-def monthly_meta_vs_real(filtered: pd.DataFrame, targets: pd.DataFrame) -> pd.DataFrame:
-    real = (
-        filtered.groupby("ano_mes", as_index=False)
-        .agg(realizado=("receita", "sum"))
+@st.cache_resource
+def get_engine() -> DashboardEngine:
+    # instância única por processo, compartilhada por todas as sessões
+    return DashboardEngine(
+        DATA_DIR,
+        data_cache_mb=DATA_CACHE_MAX_MB,
+        views_cache_entries=VIEWS_CACHE_ENTRIES,
+        backend=QUERY_BACKEND,
+        duckdb_threads=DUCKDB_THREADS,
+        pedidos=ORDER_COUNT_MODE,
+        shared_dir=Path(SHARED_DIR) if SHARED_DIR else None,
+        agg_workers=AGG_WORKERS,
     )
-    real["mes_ord"] = pd.PeriodIndex(real["ano_mes"], freq="M").to_timestamp()
 
-    meta = (
-        targets.groupby("ano_mes", as_index=False)
-        .agg(meta=("meta_faturamento", "sum"))
+
+@st.cache_resource
+def get_warmup() -> WarmUp:
+    # dispara uma vez por processo, na primeira sessão; essa sessão não espera pelo fim
+    extras = read_extras(Path(WARMUP_FILE)) if WARMUP_FILE else []
+    return WarmUp(get_engine(), parse_warmup(WARMUP), extras, WARMUP_WORKERS).start()
+
+
+@st.cache_resource
+def get_figures_cache() -> LRUCache:
+    return LRUCache(max_entries=FIGURES_CACHE_ENTRIES)
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get("PAINEL_PROFILE") == "1" or st.query_params.get("profile") == "1"
+
+
+@st.cache_resource
+def get_profile_log() -> logging.Logger | None:
+    return rotating_log(Path(PROFILE_LOG), PROFILE_LOG_MB) if PROFILE_LOG else None
+
+
+@st.cache_resource
+def get_export_slots() -> threading.BoundedSemaphore:
+    return threading.BoundedSemaphore(max(EXPORT_MAX, 1))
+
+
+def clean_exports() -> int:
+    return prune_exports(EXPORT_DIR, EXPORT_PREFIX, EXPORT_TTL_H, EXPORT_KEEP)
+
+
+@st.cache_resource
+def get_startup_cleanup() -> int:
+    # uma vez por processo: sobras de execuções anteriores do painel
+    return clean_exports()
+
+
+def load_figure(nome: str, dados: pd.DataFrame, construir: Callable[[pd.DataFrame], go.Figure]) -> go.Figure:
+    # a figura é compartilhada entre sessões; st.plotly_chart trabalha sobre uma cópia
+    return get_figures_cache().get_or_compute(("figura", nome, frame_digest(dados)), lambda: construir(dados))
+
+
+@st.fragment
+def render_meta_real(
+    engine: DashboardEngine, filtros: dict, versao: tuple, meta_real: pd.DataFrame, grao_carregado: str,
+    profiler: StageProfiler,
+) -> None:
+    """Gráfico de meta vs. realizado com seletor de grão; trocar o grão roda de novo só este trecho."""
+    grao = st.radio(
+        "Granularidade", list(ROTULOS_GRAO), index=2, format_func=ROTULOS_GRAO.get, horizontal=True, key="granularidade"
     )
-    meta["mes_ord"] = pd.PeriodIndex(meta["ano_mes"], freq="M").to_timestamp()
+    if grao != grao_carregado:
+        # os demais agregados vêm do cache; só a série no grão novo é calculada
+        meta_real = engine.views(filtros, versao, grao=grao)["meta_real"]
+    with profiler.etapa("figura_meta_real", len(meta_real)):
+        fig_meta = load_figure(f"meta_real_{grao}", meta_real, partial(meta_real_figure, grao=grao))
+    with profiler.etapa("grafico_meta_real"):
+        st.plotly_chart(fig_meta, use_container_width=True)
 
-    combinado = pd.merge(meta, real, on=["ano_mes", "mes_ord"], how="outer").fillna(0)
-    return combinado.sort_values("mes_ord")
+
+def export_command(filtros: dict, dimensoes: dict, destino: Path) -> list[str]:
+    comando = [
+        sys.executable,
+        str(Path(__file__).parent / "export.py"),
+        "--data", str(DATA_DIR),
+        "--out", str(destino),
+        "--inicio", filtros["inicio"].isoformat(),
+        "--fim", filtros["fim"].isoformat(),
+        "--progress", "json",
+    ]
+    for chave in ("estados", "canais", "categorias"):
+        # seleção completa não filtra: evita comparar cada linha com todos os valores
+        if set(filtros[chave]) != set(dimensoes[chave]):
+            comando += [f"--{chave}", ",".join(filtros[chave])]
+    return comando
+
+
+def run_export(filtros: dict, dimensoes: dict, formato: str) -> dict:
+    """Roda ``export.py`` num processo à parte e acompanha o progresso pelas linhas JSON da saída."""
+    nome = f"{EXPORT_PREFIX}{filtros['inicio']:%Y%m%d}_{filtros['fim']:%Y%m%d}_{uuid.uuid4().hex[:8]}.{formato}"
+    destino = EXPORT_DIR / nome
+    barra = st.progress(0.0, text="Exportando...")
+    resumo: dict = {}
+    # stderr vai para um arquivo: com dois pipes, um stderr grande travaria o processo enquanto lemos o stdout
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as saida_erro:
+        with subprocess.Popen(
+            export_command(filtros, dimensoes, destino), stdout=subprocess.PIPE, stderr=saida_erro, text=True
+        ) as processo:
+            for linha in processo.stdout:
+                resumo = json.loads(linha)
+                fracao = resumo["lidas"] / resumo["total"] if resumo["total"] else 1.0
+                texto = f"{resumo['exportadas']:,} linhas exportadas".replace(",", ".")
+                barra.progress(min(fracao, 1.0), text=texto)
+        saida_erro.seek(0)
+        erro = saida_erro.read().strip()
+    barra.empty()
+    if processo.returncode != 0 or not resumo.get("concluido"):
+        raise RuntimeError(erro.splitlines()[-1] if erro else f"código de saída {processo.returncode}")
+    return resumo
+
+
+@st.fragment
+def render_export(filtros: dict, dimensoes: dict) -> None:
+    """Exportação das vendas do recorte; o botão roda de novo só este trecho, não o painel."""
+    with st.expander("Exportar recorte", expanded=False):
+        formato = st.radio("Formato", FORMATOS, format_func=str.upper, horizontal=True, key="formato_exportacao")
+        if st.button("Exportar vendas", use_container_width=True):
+            vagas = get_export_slots()
+            if not vagas.acquire(blocking=False):
+                st.warning("Outras exportações estão em andamento. Tente novamente em instantes.")
+            else:
+                try:
+                    anterior = st.session_state.pop("exportacao", None)
+                    if anterior:
+                        # uma exportação guardada por sessão
+                        Path(anterior["arquivo"]).unlink(missing_ok=True)
+                    clean_exports()
+                    st.session_state["exportacao"] = run_export(filtros, dimensoes, formato)
+                except (OSError, RuntimeError, ValueError) as erro:
+                    st.error(f"Falha na exportação: {erro}")
+                finally:
+                    vagas.release()
+        resultado = st.session_state.get("exportacao")
+        if not resultado or not Path(resultado["arquivo"]).exists():
+            return
+        arquivo = Path(resultado["arquivo"])
+        st.caption(
+            f"{resultado['exportadas']:,} linhas · {resultado['bytes'] / 1024 ** 2:.1f} MB · "
+            f"{resultado['segundos']:.1f}s".replace(",", ".")
+        )
+        if resultado["bytes"] <= EXPORT_DOWNLOAD_MB * 1024 ** 2:
+            with open(arquivo, "rb") as conteudo:
+                st.download_button("Baixar arquivo", conteudo, file_name=arquivo.name, use_container_width=True)
+        else:
+            st.caption(f"Arquivo acima de {EXPORT_DOWNLOAD_MB:.0f} MB, salvo em: {arquivo}")
+
+
+def render_profile(profiler: StageProfiler) -> None:
+    if not profiler.enabled:
+        return
+    tabela = profiler.table()
+    with st.sidebar.expander("Desempenho por etapa", expanded=False):
+        st.caption(
+            "Etapas ausentes vieram do cache. Memória medida com tracemalloc (pico alocado na etapa)."
+            + (f"  \nLog: {PROFILE_LOG}" if PROFILE_LOG else "")
+        )
+        st.dataframe(
+            tabela,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "segundos": st.column_config.NumberColumn("s", format="%.4f"),
+                "linhas_entrada": st.column_config.NumberColumn("linhas in"),
+                "linhas_saida": st.column_config.NumberColumn("linhas out"),
+                "mb_alocados": st.column_config.NumberColumn("MB pico", format="%.2f"),
+                "mb_retidos": st.column_config.NumberColumn("MB retidos", format="%.2f"),
+            },
+        )
 
 
 def main() -> None:
     st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
-    if not DATA_PATH.exists() or not TARGETS_PATH.exists():
-        st.error("Arquivos de dados não encontrados. Execute `python generate_data.py` para criar os CSVs.")
+    if QUERY_BACKEND not in BACKENDS:
+        st.error(f"PAINEL_BACKEND inválido: {QUERY_BACKEND!r}. Use {' ou '.join(BACKENDS)}.")
+        st.stop()
+    if ORDER_COUNT_MODE not in MODOS:
+        st.error(f"PAINEL_PEDIDOS inválido: {ORDER_COUNT_MODE!r}. Use {' ou '.join(MODOS)}.")
+        st.stop()
+
+    engine = get_engine()
+    if not engine.available():
+        st.error("Arquivos de dados não encontrados. Execute `python generate_data.py` para criar a base.")
+        st.stop()
+    try:
+        aquecimento = get_warmup()
+    except (OSError, ValueError) as erro:
+        st.error(f"Configuração de pré-aquecimento inválida: {erro}")
         st.stop()
+    get_startup_cleanup()
+
+    medir = profiling_enabled()
+    profiler = StageProfiler(
+        enabled=medir, log=get_profile_log() if medir else None, contexto={"execucao": uuid.uuid4().hex[:8]}
+    )
+    try:
+        render_dashboard(engine, aquecimento, profiler)
+    finally:
+        # tracemalloc deixa o processo inteiro mais lento: desliga ao fim da execução
+        profiler.close()
 
-    df, targets = load_data()
 
-    min_date, max_date = df["data"].min().date(), df["data"].max().date()
-    default_estados = sorted(df["estado"].unique())
-    default_canais = sorted(df["canal"].unique())
-    default_categorias = sorted(df["categoria"].unique())
+def render_dashboard(engine: DashboardEngine, aquecimento: WarmUp, profiler: StageProfiler) -> None:
+    with profiler.etapa("versao_dados"):
+        versao = engine.version()
+    with profiler.etapa("carga"):
+        dimensoes = engine.dimensions(versao, profiler)
+
+    min_date, max_date = dimensoes["inicio"], dimensoes["fim"]
+    default_estados = dimensoes["estados"]
+    default_canais = dimensoes["canais"]
+    default_categorias = dimensoes["categorias"]
 
     header_html = """
         <div style="display:flex; align-items:center; gap: 0.75rem; margin-bottom: 0.6rem;">
@@ -182,6 +419,7 @@ def main() -> None:
             estados = st.multiselect("Estados", default_estados, default=st.session_state["estados_filter"], key="estados_filter")
             canais = st.multiselect("Canais", default_canais, default=st.session_state["canais_filter"], key="canais_filter")
             categorias = st.multiselect("Categorias", default_categorias, default=st.session_state["categorias_filter"], key="categorias_filter")
+        comparar = st.selectbox("Comparar com", list(COMPARACOES), key="comparacao")
 
     filtros = {
         "inicio": inicio,
@@ -191,18 +429,31 @@ def main() -> None:
         "categorias": categorias or default_categorias,
     }
 
-    filtrado = filter_data(df, filtros)
+    grao = st.session_state.get("granularidade", "mes")
+    with profiler.etapa("agregados"):
+        views = engine.views(filtros, versao, profiler, grao=grao)
+
+    with st.sidebar:
+        render_export(filtros, dimensoes)
+        dados_stats = engine.data_cache.stats()
+        views_stats = engine.views_cache.stats()
+        figuras_stats = get_figures_cache().stats()
+        st.caption(
+            f"Cache de dados: {dados_stats['hits']} acertos · {dados_stats['misses']} leituras · "
+            f"{dados_stats['bytes'] / 1024 ** 2:.0f}/{DATA_CACHE_MAX_MB} MB  \n"
+            f"Cache de agregados: {views_stats['hits']} acertos · {views_stats['misses']} cálculos · "
+            f"{views_stats['entries']}/{VIEWS_CACHE_ENTRIES} entradas  \n"
+            f"Cache de figuras: {figuras_stats['hits']} acertos · {figuras_stats['misses']} montagens"
+        )
+        progresso = aquecimento.status()
+        if progresso["etapa"] != "pronto":
+            st.caption(f"Pré-aquecimento ({progresso['etapa']}): {progresso['concluidos']}/{progresso['total']} visões")
 
-    if filtrado.empty:
+    if views is None:
+        render_profile(profiler)
         st.warning("Sem dados para os filtros selecionados.")
         st.stop()
 
-    metas_filtradas = targets[
-        targets["estado"].isin(filtros["estados"]) &
-        targets["canal"].isin(filtros["canais"]) &
-        targets["ano_mes"].isin(filtrado["ano_mes"].unique())
-    ]
-
     chips = [
         ("Período", f"{inicio:%d/%m/%Y} - {fim:%d/%m/%Y}"),
         ("Estados", ", ".join(filtros["estados"])),
@@ -212,22 +463,42 @@ def main() -> None:
     chips_html = "".join([f"<span class='chip'><b>{label}:</b> {valor}</span>" for label, valor in chips])
     st.markdown(f"<div class='filter-summary'>{chips_html}</div>", unsafe_allow_html=True)
 
-    receita_total = float(filtrado["receita"].sum())
-    pedidos = int(filtrado["pedido_id"].nunique())
-    ticket = receita_total / pedidos if pedidos else 0
-    margem_pct = (float(filtrado["lucro"].sum()) / receita_total * 100) if receita_total else 0
-
-    meta_total = float(metas_filtradas["meta_faturamento"].sum()) if not metas_filtradas.empty else 0
-    meta_ped = int(metas_filtradas["meta_pedidos"].sum()) if not metas_filtradas.empty else 0
-    progresso_meta = (receita_total / meta_total * 100) if meta_total else 0
-    gap_meta = receita_total - meta_total
+    kpis = views["kpis"]
+    receita_total = kpis["receita_total"]
+    pedidos = kpis["pedidos"]
+    ticket = kpis["ticket"]
+    margem_pct = kpis["margem_pct"]
+    meta_total = kpis["meta_total"]
+    meta_ped = kpis["meta_ped"]
+    progresso_meta = kpis["progresso_meta"]
+    gap_meta = kpis["gap_meta"]
 
     st.markdown("<div class='section-title'>Performance consolidada</div>", unsafe_allow_html=True)
     col1, col2, col3, col4 = st.columns([1.3, 1, 1, 1])
-    col1.metric("Faturamento", fmt_currency(receita_total), delta=f"{progresso_meta:.1f}% da meta")
-    col2.metric("Pedidos", f"{pedidos:,}".replace(",", "."), delta=f"Meta: {meta_ped:,}".replace(",", "."))
-    col3.metric("Ticket médio", fmt_currency(ticket))
-    col4.metric("Margem", fmt_percent(margem_pct))
+    # a comparação sai do índice de acumulados por dia, sem nova varredura do cubo
+    delta_receita, delta_margem, periodo_base = comparison_deltas(views.get("comparacao", {}), COMPARACOES[comparar])
+    if periodo_base is not None:
+        col1.metric(
+            "Faturamento",
+            fmt_currency(receita_total),
+            delta=delta_receita,
+            help=f"Comparado a {periodo_base}. Meta: {progresso_meta:.1f}% atingida.",
+        )
+    elif COMPARACOES[comparar] is not None:
+        col1.metric("Faturamento", fmt_currency(receita_total), delta=delta_receita, delta_color="off")
+    else:
+        col1.metric("Faturamento", fmt_currency(receita_total), delta=f"{progresso_meta:.1f}% da meta")
+    estimado = "Estimativa HyperLogLog (erro típico ~0,8%)." if ORDER_COUNT_MODE == "hll" else None
+    col2.metric(
+        "Pedidos", f"{pedidos:,}".replace(",", "."), delta=f"Meta: {meta_ped:,}".replace(",", "."), help=estimado
+    )
+    col3.metric("Ticket médio", fmt_currency(ticket), help=estimado)
+    col4.metric(
+        "Margem",
+        fmt_percent(margem_pct),
+        delta=delta_margem,
+        help=f"Comparado a {periodo_base}." if periodo_base is not None else None,
+    )
 
     st.markdown(
         f"""
@@ -246,110 +517,32 @@ def main() -> None:
     )
     st.markdown("<div style='margin-top: 0.6rem;'></div>", unsafe_allow_html=True)
 
-    meta_real = monthly_meta_vs_real(filtrado, metas_filtradas)
-    fig_meta = px.bar(
-        meta_real,
-        x="mes_ord",
-        y=["meta", "realizado"],
-        barmode="group",
-        color_discrete_map={"meta": "#f59e0b", "realizado": "#0ea5e9"},
-        labels={"value": "R$", "mes_ord": "Mês", "variable": ""},
-        title="Meta vs. realizado por mês",
-    )
-    fig_meta.update_layout(margin=dict(l=0, r=0, t=40, b=30))
+    # figuras em cache pelo conteúdo do agregado: gráficos que não mudaram não passam pelo px
+    canal = views["canal"]
+    with profiler.etapa("figura_canal", len(canal)):
+        fig_canal = load_figure("canal", canal, channel_figure)
 
-    canal = (
-        filtrado.groupby("canal", as_index=False)
-        .agg(receita=("receita", "sum"), pedidos=("pedido_id", "nunique"), margem=("lucro", "sum"))
-    )
-    canal["margem_pct"] = (canal["margem"] / canal["receita"] * 100).round(1)
-    fig_canal = px.bar(
-        canal.sort_values("receita"),
-        x="receita",
-        y="canal",
-        orientation="h",
-        color="margem_pct",
-        color_continuous_scale=["#0ea5e9", "#14b8a6", "#f59e0b"],
-        labels={"receita": "Receita", "canal": "Canal", "margem_pct": "Margem %"},
-        title="Receita por canal",
-    )
-    fig_canal.update_layout(coloraxis_showscale=False, margin=dict(l=0, r=0, t=50, b=10))
+    categoria = views["categoria"]
+    with profiler.etapa("figura_categoria", len(categoria)):
+        fig_categoria = load_figure("categoria", categoria, category_figure)
 
-    categoria = (
-        filtrado.groupby(["categoria", "marca"], as_index=False)
-        .agg(receita=("receita", "sum"))
-    )
-    fig_categoria = px.treemap(
-        categoria,
-        path=["categoria", "marca"],
-        values="receita",
-        color="categoria",
-        title="Mix por categoria e marca",
-    )
-    fig_categoria.update_layout(margin=dict(l=0, r=0, t=50, b=10))
-
-    estados = (
-        filtrado.groupby("estado", as_index=False)
-        .agg(receita=("receita", "sum"), margem=("lucro", "sum"))
-    )
-    estados["margem_pct"] = (estados["margem"] / estados["receita"] * 100).round(1)
-    fig_estado = px.bar(
-        estados.sort_values("receita", ascending=False),
-        x="estado",
-        y="receita",
-        color="margem_pct",
-        color_continuous_scale=["#0ea5e9", "#22c55e", "#f59e0b"],
-        labels={"estado": "UF", "receita": "Receita", "margem_pct": "Margem %"},
-        title="Receita por estado",
-    )
-    fig_estado.update_layout(coloraxis_showscale=False, margin=dict(l=0, r=0, t=50, b=10))
+    estados = views["estados"]
+    with profiler.etapa("figura_estado", len(estados)):
+        fig_estado = load_figure("estados", estados, state_figure)
 
+    # st.plotly_chart serializa a figura para o navegador: medido à parte da construção
     col_a, col_b = st.columns(2)
     with col_a:
-        st.plotly_chart(fig_meta, use_container_width=True)
-        st.plotly_chart(fig_categoria, use_container_width=True)
+        render_meta_real(engine, filtros, versao, views["meta_real"], grao, profiler)
+        with profiler.etapa("grafico_categoria"):
+            st.plotly_chart(fig_categoria, use_container_width=True)
     with col_b:
-        st.plotly_chart(fig_canal, use_container_width=True)
-        st.plotly_chart(fig_estado, use_container_width=True)
-
-    base_prod = (
-        filtrado.groupby(["produto", "marca", "categoria"], as_index=False)
-        .agg(
-            receita=("receita", "sum"),
-            pedidos=("pedido_id", "nunique"),
-            ticket=("receita", "mean"),
-        )
-    )
-
-    prod_ec = (
-        filtrado.groupby(["produto", "marca", "categoria", "estado", "canal"], as_index=False)
-        .agg(receita=("receita", "sum"))
-    )
-    meta_ec = metas_filtradas.groupby(["estado", "canal"], as_index=False).agg(meta_ec=("meta_faturamento", "sum"))
-    receita_tot = prod_ec.groupby(["estado", "canal"], as_index=False).agg(receita_total_ec=("receita", "sum"))
-
-    prod_ec = (
-        prod_ec.merge(meta_ec, on=["estado", "canal"], how="left")
-        .merge(receita_tot, on=["estado", "canal"], how="left")
-    )
-    prod_ec["meta_calc"] = np.where(
-        prod_ec["receita_total_ec"] > 0,
-        prod_ec["meta_ec"] * (prod_ec["receita"] / prod_ec["receita_total_ec"]),
-        0,
-    )
-
-    meta_prod = prod_ec.groupby(["produto", "marca", "categoria"], as_index=False).agg(meta=("meta_calc", "sum"))
-    produtos = base_prod.merge(meta_prod, on=["produto", "marca", "categoria"], how="left")
-    produtos["meta"] = produtos["meta"].fillna(0)
-    produtos["atingido_pct"] = np.where(produtos["meta"] > 0, (produtos["receita"] / produtos["meta"]) * 100, np.nan)
-
-    produtos = produtos.sort_values("receita", ascending=False).head(12)
-    produtos["receita"] = produtos["receita"].round(2)
-    produtos["meta"] = produtos["meta"].round(2)
-    produtos["ticket"] = produtos["ticket"].round(2)
-    produtos["atingido_pct"] = produtos["atingido_pct"].round(1)
-    produtos["% atingido"] = produtos["atingido_pct"].apply(lambda x: f"{x:.1f}%" if pd.notna(x) else "—")
+        with profiler.etapa("grafico_canal"):
+            st.plotly_chart(fig_canal, use_container_width=True)
+        with profiler.etapa("grafico_estado"):
+            st.plotly_chart(fig_estado, use_container_width=True)
 
+    produtos = views["produtos"]
     produtos_fmt = produtos.rename(
         columns={
             "receita": "Realizado",
@@ -363,11 +556,14 @@ def main() -> None:
     ]
 
     st.markdown("<div class='section-title'>Top produtos</div>", unsafe_allow_html=True)
-    st.dataframe(
-        produtos_fmt,
-        use_container_width=True,
-        hide_index=True,
-    )
+    with profiler.etapa("tabela_produtos", len(produtos_fmt)):
+        st.dataframe(
+            produtos_fmt,
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    render_profile(profiler)
 
     st.caption(
         "Base totalmente fictícia gerada em Python para demonstração de análises de vendas, mix de produtos e metas."
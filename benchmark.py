@@ -0,0 +1,305 @@
+"""Benchmark headless do pipeline de dados do painel, em várias escalas de base.
+
+Para cada escala gera (ou reaproveita) uma base Parquet com ``generate_data.py``
+e mede, sem Streamlit nem renderização, cada etapa do pipeline: leitura,
+compactação, montagem do cubo e, para cada cenário de filtros, o filtro e cada
+agregação do painel. O resultado (tempo, pico de RSS e linhas/s) sai em JSON e
+pode ser comparado com uma linha de base salva para acusar regressões.
+
+Exemplos::
+
+    python benchmark.py --scales 10k,1m --output bench.json
+    python benchmark.py --scales 10k,1m --save-baseline bench_baseline.json
+    python benchmark.py --scales 10k,1m --baseline bench_baseline.json --tolerance 0.3
+    python benchmark.py --scales 1m --catalog 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import analytics
+import storage
+from cube import SOURCE_COLUMNS, build_cube
+from engine import AGG_WORKERS_PADRAO
+from schema import compact_targets, date_of_day, prepare_sales
+from sketch import OrderCounter
+from timeindex import GRAOS, DailyPrefixIndex, PeriodRollups
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+ROOT = Path(__file__).parent
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return pico / 1024**2 if sys.platform == "darwin" else pico / 1024
+
+
+def scenarios(cubo) -> dict[str, dict]:
+    inicio, fim = date_of_day(cubo["dia"].min()), date_of_day(cubo["dia"].max())
+    estados = sorted(cubo["estado"].unique())
+    canais = sorted(cubo["canal"].unique())
+    categorias = sorted(cubo["categoria"].unique())
+    ultimo_mes = fim.replace(day=1)
+    seis_meses = max(inicio, fim - dt.timedelta(days=182))
+    return {
+        "todos": {"inicio": inicio, "fim": fim, "estados": estados, "canais": canais, "categorias": categorias},
+        "um_estado": {"inicio": inicio, "fim": fim, "estados": estados[:1], "canais": canais, "categorias": categorias},
+        "canal_ultimo_mes": {
+            "inicio": ultimo_mes, "fim": fim, "estados": estados, "canais": canais[:1], "categorias": categorias,
+        },
+        "recorte_semestre": {
+            "inicio": seis_meses, "fim": fim, "estados": estados[:3], "canais": canais[:2], "categorias": categorias[:2],
+        },
+    }
+
+
+class Medidor:
+    def __init__(self, repeticoes: int) -> None:
+        self.repeticoes = repeticoes
+        self.resultados: list[dict[str, Any]] = []
+
+    def medir(self, etapa: str, linhas: int, func: Callable[[], Any], cenario: str | None = None) -> Any:
+        # etapas de cenário repetem e guardam o melhor tempo; carga e cubo rodam uma vez
+        vezes = self.repeticoes if cenario is not None else 1
+        melhor = float("inf")
+        for _ in range(vezes):
+            inicio = time.perf_counter()
+            resultado = func()
+            melhor = min(melhor, time.perf_counter() - inicio)
+        self.resultados.append(
+            {
+                "etapa": etapa,
+                "cenario": cenario,
+                "segundos": round(melhor, 6),
+                "linhas": int(linhas),
+                "linhas_por_s": round(linhas / melhor, 1) if melhor > 0 else None,
+                "pico_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+            }
+        )
+        return resultado
+
+
+def run_pipeline(base_dir: Path, repeticoes: int) -> list[dict[str, Any]]:
+    medidor = Medidor(repeticoes)
+    total = storage.count_sales(base_dir)
+
+    vendas = medidor.medir("leitura", total, lambda: storage.read_sales(base_dir, columns=SOURCE_COLUMNS))
+    targets = medidor.medir("leitura_metas", 0, lambda: compact_targets(storage.read_targets(base_dir)))
+    vendas = medidor.medir("compactacao", total, lambda: prepare_sales(vendas))
+    cubo = medidor.medir("cubo", total, lambda: build_cube(vendas))
+    contador = medidor.medir("contador_pedidos", total, lambda: OrderCounter.from_sales(vendas))
+    del vendas
+    alocador = medidor.medir("alocador_produtos", len(cubo), lambda: analytics.ProductAllocator(cubo))
+    indice = medidor.medir("indice_acumulados", len(cubo), lambda: DailyPrefixIndex(cubo))
+    rollups = medidor.medir("rollups_periodos", len(indice.acumulado["receita"]), lambda: PeriodRollups(indice))
+    pool = ThreadPoolExecutor(max_workers=AGG_WORKERS_PADRAO) if AGG_WORKERS_PADRAO > 1 else None
+
+    for nome, filtros in scenarios(cubo).items():
+        posicoes = medidor.medir("filtro", len(cubo), lambda: analytics.filter_positions(cubo, filtros), nome)
+        filtrado = cubo.iloc[posicoes]
+        linhas = len(filtrado)
+        metas = medidor.medir(
+            "filtro_metas", len(targets),
+            lambda: analytics.filter_targets(targets, filtros), nome,
+        )
+        pedidos = medidor.medir("pedidos", len(contador.grupos), lambda: analytics.order_counts(contador, filtros), nome)
+        medidor.medir("kpis", linhas, lambda: analytics.compute_kpis(filtrado, metas, pedidos["total"]), nome)
+        medidor.medir("comparacao", len(indice.acumulado["receita"]), lambda: analytics.period_comparison(indice, filtros), nome)
+        for grao in GRAOS:
+            medidor.medir(
+                f"meta_vs_realizado_{grao}", linhas,
+                lambda: analytics.period_meta_vs_real(filtrado, targets, filtros, grao, rollups), nome,
+            )
+        medidor.medir("canal", linhas, lambda: analytics.channel_summary(filtrado, pedidos["canal"]), nome)
+        medidor.medir("categoria_marca", linhas, lambda: analytics.category_mix(filtrado), nome)
+        medidor.medir("estado", linhas, lambda: analytics.state_summary(filtrado), nome)
+        medidor.medir("top_produtos", linhas, lambda: alocador.top(cubo, posicoes, metas), nome)
+
+        def painel(executor: ThreadPoolExecutor | None = None) -> dict | None:
+            return analytics.build_views(
+                cubo, targets, filtros, alocador, contador=contador, indice=indice, rollups=rollups, executor=executor
+            )
+
+        medidor.medir("painel_completo", len(cubo), painel, nome)
+        if pool is not None:
+            # seções independentes em paralelo (máquinas de um núcleo só medem o caminho sequencial)
+            medidor.medir("painel_completo_paralelo", len(cubo), lambda: painel(pool), nome)
+
+    if pool is not None:
+        pool.shutdown()
+    return medidor.resultados
+
+
+def scale_name(escala: str, catalogo: int = 0) -> str:
+    # o catálogo sintético entra no nome: bases e linhas de base não se misturam com as do catálogo fixo
+    return f"{escala}_sku{catalogo}" if catalogo else escala
+
+
+def ensure_dataset(workdir: Path, escala: str, workers: int, catalogo: int = 0) -> tuple[Path, float | None]:
+    destino = workdir / f"base_{scale_name(escala, catalogo)}"
+    registros = SCALES[escala]
+    if storage.has_parquet(destino) and storage.count_sales(destino) == registros:
+        return destino, None
+
+    inicio = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable, str(ROOT / "generate_data.py"),
+            "--records", str(registros),
+            "--out", str(destino),
+            "--format", "parquet",
+            "--workers", str(workers),
+            "--catalog", str(catalogo),
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return destino, time.perf_counter() - inicio
+
+
+def compare(resultado: dict, baseline: dict, tolerancia: float) -> list[dict[str, Any]]:
+    def chave(item: dict) -> tuple:
+        return item["escala"], item["etapa"], item["cenario"]
+
+    referencia = {chave(item): item for item in baseline["medicoes"]}
+    regressoes = []
+    for item in resultado["medicoes"]:
+        base = referencia.get(chave(item))
+        if base is None or base["segundos"] <= 0:
+            continue
+        razao = item["segundos"] / base["segundos"]
+        if razao > 1 + tolerancia:
+            regressoes.append({**dict(zip(["escala", "etapa", "cenario"], chave(item))), "razao": round(razao, 2)})
+    return regressoes
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark headless do pipeline de dados do painel.")
+    parser.add_argument(
+        "--scales",
+        type=str,
+        default="10k,1m",
+        help=f"Escalas separadas por vírgula, entre {', '.join(SCALES)} (padrão: 10k,1m)",
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=Path(".bench"),
+        help="Diretório onde as bases geradas ficam guardadas entre execuções (padrão: .bench)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições por etapa de cenário (padrão: 3)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processos usados para gerar as bases (padrão: todos os núcleos)",
+    )
+    parser.add_argument(
+        "--catalog",
+        type=int,
+        default=0,
+        help="SKUs do catálogo sintético das bases, ex. 100000 (padrão: 0, catálogo fixo do gerador)",
+    )
+    parser.add_argument("--output", type=Path, help="Grava o resultado em JSON neste arquivo (padrão: stdout)")
+    parser.add_argument("--baseline", type=Path, help="Linha de base JSON para comparação")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Aumento relativo de tempo aceito antes de acusar regressão (padrão: 0.25)",
+    )
+    parser.add_argument("--save-baseline", type=Path, help="Grava o resultado como nova linha de base")
+    parser.add_argument("--run-scale", type=Path, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.run_scale is not None:
+        # modo interno: uma escala por processo, para o pico de RSS não se misturar
+        json.dump(run_pipeline(args.run_scale, args.repeat), sys.stdout)
+        return
+
+    escalas = [escala.strip().lower() for escala in args.scales.split(",") if escala.strip()]
+    desconhecidas = [escala for escala in escalas if escala not in SCALES]
+    if desconhecidas:
+        raise ValueError(f"Escalas desconhecidas: {', '.join(desconhecidas)}. Use {', '.join(SCALES)}.")
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    medicoes = []
+    for escala in escalas:
+        base_dir, segundos_geracao = ensure_dataset(args.workdir, escala, args.workers, args.catalog)
+        nome = scale_name(escala, args.catalog)
+        if segundos_geracao is not None:
+            medicoes.append(
+                {
+                    "escala": nome,
+                    "etapa": "geracao",
+                    "cenario": None,
+                    "segundos": round(segundos_geracao, 3),
+                    "linhas": SCALES[escala],
+                    "linhas_por_s": round(SCALES[escala] / segundos_geracao, 1),
+                    "pico_rss_mb": None,
+                }
+            )
+        saida = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--run-scale", str(base_dir), "--repeat", str(args.repeat)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        medicoes.extend({"escala": nome, **item} for item in json.loads(saida.stdout))
+        print(f"[{nome}] {len(medicoes)} medições", file=sys.stderr)
+
+    resultado = {
+        "gerado_em": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "maquina": platform.platform(),
+        "cpus": os.cpu_count(),
+        "medicoes": medicoes,
+    }
+
+    regressoes = []
+    if args.baseline is not None:
+        regressoes = compare(resultado, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        resultado["regressoes"] = regressoes
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.output is not None:
+        args.output.write_text(texto, encoding="utf-8")
+    else:
+        print(texto)
+    if args.save_baseline is not None:
+        args.save_baseline.write_text(texto, encoding="utf-8")
+
+    if regressoes:
+        for item in regressoes:
+            print(
+                f"REGRESSÃO: {item['escala']} / {item['etapa']} / {item['cenario']}: {item['razao']}x a linha de base",
+                file=sys.stderr,
+            )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
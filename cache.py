@@ -0,0 +1,122 @@
+"""Cache LRU em memória, seguro para várias threads, com teto de bytes ou de entradas.
+
+Pensado para ser compartilhado por todas as sessões do Streamlit no mesmo
+processo (via ``st.cache_resource``): a chave deve incluir a versão dos dados
+para que arquivos alterados nunca devolvam resultados antigos.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_size(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        max_entries: int | None = None,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._sizeof = sizeof
+        self._itens: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._em_calculo: dict[Hashable, threading.Lock] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._itens
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._itens:
+                self._itens.move_to_end(key)
+                self.hits += 1
+                return self._itens[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        tamanho = self._sizeof(value)
+        with self._lock:
+            if key in self._itens:
+                self.bytes -= self._itens.pop(key)[1]
+            self._itens[key] = (value, tamanho)
+            self.bytes += tamanho
+            self._evict()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._itens:
+                self._itens.move_to_end(key)
+                self.hits += 1
+                return self._itens[key][0]
+            trava = self._em_calculo.setdefault(key, threading.Lock())
+
+        # sessões que pedem a mesma chave ao mesmo tempo esperam um único cálculo
+        with trava:
+            with self._lock:
+                if key in self._itens:
+                    self._itens.move_to_end(key)
+                    self.hits += 1
+                    return self._itens[key][0]
+                self.misses += 1
+            try:
+                value = compute()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._em_calculo.pop(key, None)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._itens.clear()
+            self.bytes = 0
+
+    def _evict(self) -> None:
+        # a entrada mais recente é sempre mantida, mesmo acima do teto
+        while len(self._itens) > 1 and (
+            (self.max_bytes is not None and self.bytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._itens) > self.max_entries)
+        ):
+            _, (_, tamanho) = self._itens.popitem(last=False)
+            self.bytes -= tamanho
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._itens),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
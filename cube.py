@@ -0,0 +1,74 @@
+"""Cubo pré-agregado de vendas no grão dia × estado × canal × categoria × marca × produto.
+
+Guarda apenas medidas aditivas, de modo que qualquer filtro ou agrupamento do
+painel sobre essas dimensões pode ser respondido somando células do cubo, sem
+voltar às linhas de pedido. O tamanho do cubo depende do número de
+combinações de dimensões, não do volume de pedidos.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from schema import month_key_of_day
+
+CUBE_DIMS = ["dia", "estado", "canal", "categoria", "marca", "produto"]
+CUBE_MEASURES = ["receita", "lucro", "custo", "quantidade", "pedidos", "linhas"]
+# colunas da base de pedidos necessárias para montar o cubo (antes da compactação)
+SOURCE_COLUMNS = ["data", "estado", "canal", "categoria", "marca", "produto", "pedido_id", "receita", "lucro", "custo", "quantidade"]
+
+
+def build_cube(vendas: pd.DataFrame) -> pd.DataFrame:
+    """Agrega uma base já compactada por ``schema.compact_sales``."""
+    # pedidos: pedidos distintos na célula. Cada pedido tem um único dia/estado/canal,
+    # então a soma por produto é exata; entre produtos um pedido com vários itens
+    # conta mais de uma vez, e o total do recorte vem de sketch.OrderCounter
+    cubo = (
+        vendas.groupby(CUBE_DIMS, observed=True, sort=True)
+        .agg(
+            receita=("receita", "sum"),
+            lucro=("lucro", "sum"),
+            custo=("custo", "sum"),
+            quantidade=("quantidade", "sum"),
+            pedidos=("pedido_id", "nunique"),
+            linhas=("pedido_id", "size"),
+        )
+        .reset_index()
+        .astype({"quantidade": np.int32, "pedidos": np.int32, "linhas": np.int32})
+    )
+    cubo["mes_key"] = month_key_of_day(cubo["dia"].to_numpy())
+    return cubo
+
+
+def align_categories(*frames: pd.DataFrame, columns: list[str]) -> list[pd.DataFrame]:
+    """Dá às colunas categóricas de todos os quadros a mesma lista (união ordenada)."""
+    alinhados = list(frames)
+    for col in columns:
+        categorias = sorted(set().union(*(f[col].cat.categories for f in frames)))
+        tipo = pd.CategoricalDtype(categorias)
+        alinhados = [f.astype({col: tipo}) for f in alinhados]
+    return alinhados
+
+
+def merge_cubes(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Incorpora o cubo de pedidos novos ao cubo existente, ambos ordenados por dia.
+
+    Só as células dos dias cobertos pelo delta são reagregadas; o restante do
+    cubo é apenas concatenado. ``pedidos`` continua exato porque pedidos novos
+    têm identificadores que não existem na base.
+    """
+    base, delta = align_categories(base, delta, columns=CUBE_DIMS[1:])
+    dias = base["dia"].to_numpy()
+    inicio = int(np.searchsorted(dias, delta["dia"].min(), side="left"))
+    fim = int(np.searchsorted(dias, delta["dia"].max(), side="right"))
+
+    janela = (
+        pd.concat([base.iloc[inicio:fim], delta], ignore_index=True)
+        .groupby(CUBE_DIMS, observed=True, sort=True)[CUBE_MEASURES]
+        .sum()
+        .reset_index()
+        .astype({"quantidade": np.int32, "pedidos": np.int32, "linhas": np.int32})
+    )
+    janela["mes_key"] = month_key_of_day(janela["dia"].to_numpy())
+    return pd.concat([base.iloc[:inicio], janela, base.iloc[fim:]], ignore_index=True)
@@ -0,0 +1,221 @@
+"""Motor de dados do painel, sem Streamlit: leitura, cubo, caches e agregados.
+
+Reúne o que o painel (``app.py``) e o serviço HTTP (``service.py``) precisam
+para responder a um estado de filtros com os mesmos números: a base lida e
+compactada, o cubo com o alocador de metas e o contador de pedidos, e os
+agregados de ``analytics.build_views`` (ou do backend DuckDB). Uma instância
+por processo, compartilhada por todas as sessões ou requisições; os caches são
+seguros para várias threads e as chaves incluem a versão dos arquivos. Com
+``shared_dir``, o cubo e as estruturas derivadas são publicados uma vez por
+máquina e mapeados sem cópia pelos demais processos (ver ``shared``). Com
+``agg_workers`` > 1, as seções independentes de cada visão são calculadas em
+paralelo num pool de threads da instância.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+import storage
+from analytics import ProductAllocator, build_views, filter_key
+from cache import LRUCache
+from cube import SOURCE_COLUMNS, build_cube, merge_cubes
+from instrumentation import StageProfiler
+from schema import compact_targets, date_of_day, prepare_sales
+from shared import SharedStore
+from sketch import MODOS, OrderCounter
+from sql_backend import DuckDBBackend
+from timeindex import GRAOS, DailyPrefixIndex, PeriodRollups
+
+BACKENDS = ("pandas", "duckdb")
+# colunas da base de vendas efetivamente usadas pelo painel (via cubo)
+APP_COLUMNS = SOURCE_COLUMNS
+# threads das agregações de uma visão: uma por seção calculada em paralelo, até o número de núcleos
+AGG_WORKERS_PADRAO = min(6, os.cpu_count() or 1)
+
+
+class DashboardEngine:
+    """Dados e agregados do painel para os arquivos em ``data_dir``."""
+
+    def __init__(
+        self,
+        data_dir: Path,
+        data_cache_mb: int = 2048,
+        views_cache_entries: int = 1024,
+        backend: str = "pandas",
+        duckdb_threads: int | None = None,
+        pedidos: str = "exato",
+        shared_dir: Path | None = None,
+        agg_workers: int = 1,
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend inválido: {backend!r}. Use {' ou '.join(BACKENDS)}.")
+        if pedidos not in MODOS:
+            raise ValueError(f"Modo de contagem de pedidos inválido: {pedidos!r}. Use {' ou '.join(MODOS)}.")
+        self.data_dir = Path(data_dir)
+        self.backend = backend
+        self.duckdb_threads = duckdb_threads
+        self.pedidos = pedidos
+        self.data_cache = LRUCache(max_bytes=data_cache_mb * 1024 * 1024)
+        self.views_cache = LRUCache(max_entries=views_cache_entries)
+        # último cubo montado, usado para incorporar acréscimos sem reler o histórico
+        self._cube_state: dict[str, Any] = {}
+        self._sql: DuckDBBackend | None = None
+        self._sql_lock = threading.Lock()
+        self.shared = SharedStore(shared_dir) if shared_dir else None
+        # 1 mantém o caminho sequencial; o pool é compartilhado por todas as sessões do processo
+        self.agg_workers = max(agg_workers, 1)
+        self.pool = (
+            ThreadPoolExecutor(max_workers=self.agg_workers, thread_name_prefix="painel-agregacoes")
+            if self.agg_workers > 1
+            else None
+        )
+
+    def available(self) -> bool:
+        return storage.has_parquet(self.data_dir) or (
+            (self.data_dir / storage.SALES_CSV).exists() and (self.data_dir / storage.TARGETS_CSV).exists()
+        )
+
+    def version(self) -> tuple:
+        return storage.data_version(self.data_dir)
+
+    def sql_backend(self) -> DuckDBBackend:
+        with self._sql_lock:
+            if self._sql is None:
+                self._sql = DuckDBBackend(self.data_dir, threads=self.duckdb_threads, pedidos=self.pedidos)
+            return self._sql
+
+    def read_data(self, profiler: StageProfiler | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+        profiler = profiler or StageProfiler()
+        with profiler.etapa("leitura_vendas") as medida:
+            brutos = storage.read_sales(self.data_dir, columns=APP_COLUMNS)
+            medida["linhas_saida"] = len(brutos)
+        with profiler.etapa("compactacao", len(brutos)):
+            # o hash dos pedidos só é calculado para os esboços HyperLogLog
+            data = prepare_sales(brutos, pedido_hash=self.pedidos == "hll")
+        del brutos
+        with profiler.etapa("leitura_metas") as medida:
+            targets = compact_targets(storage.read_targets(self.data_dir))
+            medida["linhas_saida"] = len(targets)
+        return data, targets
+
+    def load_data(
+        self, versao: tuple | None = None, profiler: StageProfiler | None = None
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        # os quadros devolvidos são compartilhados entre sessões: não devem ser alterados
+        versao = versao if versao is not None else self.version()
+        return self.data_cache.get_or_compute(
+            ("vendas", versao, tuple(APP_COLUMNS)), lambda: self.read_data(profiler)
+        )
+
+    def load_cube(
+        self, versao: tuple, profiler: StageProfiler | None = None
+    ) -> tuple[pd.DataFrame, pd.DataFrame, ProductAllocator, OrderCounter]:
+        estado = self._cube_state
+        profiler = profiler or StageProfiler()
+
+        def build() -> tuple[pd.DataFrame, pd.DataFrame, ProductAllocator, OrderCounter]:
+            novos = storage.appended_files(estado["versao"], versao) if estado else None
+            if novos is not None:
+                # acréscimo incremental: lê só os arquivos novos e funde no cubo e no contador anteriores
+                cubo, contador = estado["cubo"], estado["contador"]
+                if novos:
+                    with profiler.etapa("acrescimo_incremental", len(cubo)) as medida:
+                        delta = prepare_sales(
+                            storage.read_sales_files(self.data_dir, novos, columns=APP_COLUMNS),
+                            pedido_hash=contador.modo == "hll",
+                        )
+                        cubo = merge_cubes(cubo, build_cube(delta))
+                        # códigos do delta deslocados para não colidir com os pedidos já contados
+                        contador = contador.merge(
+                            OrderCounter.from_sales(delta, contador.modo, primeiro_codigo=contador.proximo_codigo)
+                        )
+                        medida["linhas_saida"] = len(cubo)
+                targets = compact_targets(storage.read_targets(self.data_dir))
+            else:
+                # publicando em memória compartilhada, a base linha a linha não fica no cache deste processo
+                data, targets = self.read_data(profiler) if self.shared is not None else self.load_data(versao, profiler)
+                with profiler.etapa("montagem_cubo", len(data)) as medida:
+                    cubo = build_cube(data)
+                    medida["linhas_saida"] = len(cubo)
+                with profiler.etapa("contador_pedidos", len(data)) as medida:
+                    contador = OrderCounter.from_sales(data, self.pedidos)
+                    medida["linhas_saida"] = len(contador.grupos)
+            estado.update(versao=versao, cubo=cubo, contador=contador)
+            with profiler.etapa("alocador_produtos", len(cubo)):
+                alocador = ProductAllocator(cubo)
+            return cubo, targets, alocador, contador
+
+        if self.shared is None:
+            # depois de montado o cubo, a base linha a linha pode ser descartada pelo LRU
+            return self.data_cache.get_or_compute(("cubo", versao), build)
+
+        def build_shared() -> tuple[pd.DataFrame, pd.DataFrame, ProductAllocator, OrderCounter]:
+            # monta e publica só se nenhum processo publicou esta versão; depois, todos usam o mapeamento
+            with profiler.etapa("memoria_compartilhada"):
+                cubo, targets, alocador, contador = self.shared.load((versao, self.pedidos), build)
+            estado.update(versao=versao, cubo=cubo, contador=contador)
+            return cubo, targets, alocador, contador
+
+        return self.data_cache.get_or_compute(("cubo", versao), build_shared)
+
+    def dimensions(self, versao: tuple, profiler: StageProfiler | None = None) -> dict:
+        """Período coberto e valores possíveis de cada filtro."""
+        if self.backend == "duckdb":
+            return self.data_cache.get_or_compute(("dimensoes", versao), lambda: self.sql_backend().dimensions())
+
+        def from_cube() -> dict:
+            df, _, _, _ = self.load_cube(versao, profiler)
+            return {
+                "inicio": date_of_day(df["dia"].min()),
+                "fim": date_of_day(df["dia"].max()),
+                "estados": sorted(df["estado"].unique()),
+                "canais": sorted(df["canal"].unique()),
+                "categorias": sorted(df["categoria"].unique()),
+            }
+
+        # recalculadas só quando a versão muda; cada rerun e cada requisição pedem as dimensões
+        return self.data_cache.get_or_compute(("dimensoes", versao), from_cube)
+
+    def views(
+        self, filtros: dict, versao: tuple, profiler: StageProfiler | None = None, grao: str = "mes"
+    ) -> dict | None:
+        """Agregados do painel; ``grao`` é o grão do gráfico de meta vs. realizado (``timeindex.GRAOS``)."""
+        if grao not in GRAOS:
+            raise ValueError(f"Grão inválido: {grao!r}. Use {', '.join(GRAOS)}.")
+        if self.backend == "duckdb":
+            # filtros equivalentes (mesma seleção em outra ordem) compartilham a mesma entrada
+            chave = ("views", self.backend, versao, filter_key(filtros))
+            views = self.views_cache.get_or_compute(chave, lambda: self.sql_backend().build_views(filtros))
+            if views is None or grao == "mes":
+                return views
+            # outro grão: só a série de meta vs. realizado é consultada de novo
+            meta_real = self.views_cache.get_or_compute(
+                chave + (grao,), lambda: self.sql_backend().meta_real(filtros, grao)
+            )
+            return {**views, "meta_real": meta_real}
+        # cada seção fica em cache sob as entradas de que depende (analytics.SECTION_DEPENDENCIES):
+        # mudar só categorias reaproveita as metas, mudar só o arquivo de metas reaproveita os gráficos de vendas
+        df, targets, alocador, contador = self.load_cube(versao, profiler)
+        indice = self.data_cache.get_or_compute(("indice", versao), lambda: DailyPrefixIndex(df))
+        rollups = self.data_cache.get_or_compute(("rollups", versao), lambda: PeriodRollups(indice))
+        return build_views(
+            df,
+            targets,
+            filtros,
+            alocador,
+            profiler,
+            memo=self.views_cache.get_or_compute,
+            versoes=storage.split_version(versao),
+            contador=contador,
+            indice=indice,
+            rollups=rollups,
+            grao=grao,
+            executor=self.pool,
+        )
@@ -0,0 +1,243 @@
+"""Exportação das vendas de um recorte para CSV ou Parquet, em blocos.
+
+O painel trabalha sobre o cubo agregado; as linhas de pedido por trás de um
+recorte só existem nos arquivos de dados. A exportação relê esses arquivos em
+blocos de ``batch_size`` linhas (no Parquet, só as partições dos meses do
+período), aplica os filtros a cada bloco e grava o resultado à medida que
+lê: a memória usada depende do tamanho do bloco, não do tamanho do recorte.
+O arquivo é escrito com nome temporário e renomeado ao final, então quem o
+procura nunca vê uma exportação pela metade.
+
+No painel, a exportação roda este script num processo à parte, para que uma
+exportação de vários GB não dispute memória nem o GIL com as sessões do
+Streamlit; o progresso chega como linhas JSON na saída padrão
+(``--progress json``). Os arquivos ficam numa pasta compartilhada entre as
+sessões; ``prune_exports`` apaga os antigos, por idade e por quantidade.
+
+Exemplo::
+
+    python export.py --out recorte.parquet --inicio 2024-01-01 --fim 2024-06-30 --estados SP,RJ
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import storage
+from analytics import FILTER_COLUMNS
+
+FORMATOS = ("csv", "parquet")
+BLOCO_PADRAO = 500_000
+
+
+def months_between(filtros: dict[str, Any]) -> list[str] | None:
+    """Partições ``ano_mes`` (AAAA-MM) que cobrem o período; None se ele não tem os dois limites."""
+    if filtros.get("inicio") is None or filtros.get("fim") is None:
+        return None
+    return [str(mes) for mes in pd.period_range(filtros["inicio"], filtros["fim"], freq="M")]
+
+
+def filter_mask(chunk: pd.DataFrame, filtros: dict[str, Any]) -> np.ndarray:
+    """Linhas do bloco dentro dos filtros; chaves ausentes ou vazias não filtram."""
+    mascara = np.ones(len(chunk), dtype=bool)
+    if filtros.get("inicio") is not None:
+        mascara &= (chunk["data"] >= pd.Timestamp(filtros["inicio"])).to_numpy()
+    if filtros.get("fim") is not None:
+        mascara &= (chunk["data"] < pd.Timestamp(filtros["fim"]) + pd.Timedelta(days=1)).to_numpy()
+    for chave, col in FILTER_COLUMNS.items():
+        if filtros.get(chave):
+            mascara &= chunk[col].isin(filtros[chave]).to_numpy()
+    return mascara
+
+
+def iter_filtered_sales(
+    base_dir: Path, filtros: dict[str, Any], batch_size: int = BLOCO_PADRAO
+) -> Iterator[tuple[pd.DataFrame, int]]:
+    """Blocos já filtrados, com o número de linhas lidas da base para chegar a cada um."""
+    # no CSV não há partições a podar: o período sai da máscara, e todo bloco lido conta no progresso
+    meses = months_between(filtros) if storage.has_parquet(base_dir) else None
+    for chunk in storage.iter_sales_batches(base_dir, ano_meses=meses, batch_size=batch_size):
+        yield chunk[filter_mask(chunk, filtros)], len(chunk)
+
+
+def export_sales(
+    base_dir: Path,
+    filtros: dict[str, Any],
+    destino: Path,
+    formato: str | None = None,
+    batch_size: int = BLOCO_PADRAO,
+    progresso: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """Grava em ``destino`` as vendas do recorte; ``progresso`` recebe um resumo a cada bloco.
+
+    ``formato`` sai da extensão de ``destino`` quando não informado.
+    """
+    destino = Path(destino)
+    formato = formato or destino.suffix.lstrip(".").lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato!r}. Use {' ou '.join(FORMATOS)}.")
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f".{destino.name}.tmp-{os.getpid()}")
+
+    # total de linhas a ler (no Parquet, sai dos metadados das partições do período)
+    total = storage.count_sales(base_dir, months_between(filtros))
+    estado: dict[str, Any] = {"lidas": 0, "total": total, "exportadas": 0}
+    inicio = time.perf_counter()
+    arquivo = open(temporario, "w", encoding="utf-8", newline="") if formato == "csv" else None
+    escritor: pq.ParquetWriter | None = None
+    vazio: pd.DataFrame | None = None
+    try:
+        for chunk, lidas in iter_filtered_sales(base_dir, filtros, batch_size):
+            if arquivo is not None:
+                # cabeçalho no primeiro bloco, mesmo que ele não tenha linhas no recorte
+                chunk.to_csv(arquivo, header=estado["lidas"] == 0, index=False)
+            elif len(chunk):
+                tabela = pa.Table.from_pandas(chunk, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(temporario, tabela.schema)
+                # categorias de cada bloco viram dicionários próprios, com o mesmo tipo do primeiro
+                escritor.write_table(tabela.cast(escritor.schema))
+            else:
+                vazio = chunk
+            estado["lidas"] += lidas
+            estado["exportadas"] += len(chunk)
+            if progresso is not None:
+                progresso(dict(estado))
+        if arquivo is not None:
+            if estado["lidas"] == 0:
+                # nenhum bloco lido (período fora das partições): só o cabeçalho
+                storage.empty_sales(base_dir).to_csv(arquivo, index=False)
+            arquivo.close()
+        elif escritor is not None:
+            escritor.close()
+        else:
+            # recorte sem linhas: arquivo válido só com o esquema, mesmo sem nenhum bloco lido
+            vazio = vazio if vazio is not None else storage.empty_sales(base_dir)
+            tabela = pa.Table.from_pandas(vazio, preserve_index=False)
+            pq.write_table(tabela, temporario)
+        os.replace(temporario, destino)
+    finally:
+        if arquivo is not None:
+            arquivo.close()
+        if escritor is not None:
+            escritor.close()
+        temporario.unlink(missing_ok=True)
+
+    return {
+        **estado,
+        "arquivo": str(destino),
+        "bytes": destino.stat().st_size,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+
+def prune_exports(pasta: Path, prefixo: str, idade_horas: float, manter: int, agora: float | None = None) -> int:
+    """Apaga as exportações de ``pasta`` sem modificação há mais de ``idade_horas`` e as concluídas além
+    das ``manter`` mais recentes; devolve quantos arquivos apagou.
+
+    Só considera arquivos com ``prefixo`` no nome. Os temporários de exportações em andamento são
+    reescritos a cada bloco, então só saem pela idade (sobras de processos interrompidos).
+    """
+    pasta = Path(pasta)
+    if not pasta.is_dir():
+        return 0
+    agora = time.time() if agora is None else agora
+    concluidos, temporarios = [], []
+    for caminho in pasta.iterdir():
+        if caminho.name.startswith(prefixo) and caminho.suffix.lstrip(".") in FORMATOS:
+            lista = concluidos
+        elif caminho.name.startswith(f".{prefixo}") and ".tmp-" in caminho.name:
+            lista = temporarios
+        else:
+            continue
+        try:
+            lista.append((caminho.stat().st_mtime, caminho))
+        except FileNotFoundError:  # apagado por outra sessão
+            continue
+    concluidos.sort(reverse=True)
+    remover = {caminho for modificado, caminho in concluidos + temporarios if agora - modificado > idade_horas * 3600}
+    remover.update(caminho for _, caminho in concluidos[max(manter, 0):])
+    apagados = 0
+    for caminho in remover:
+        try:
+            caminho.unlink(missing_ok=True)
+        except OSError:  # sem permissão ou em uso: fica para a próxima limpeza
+            continue
+        apagados += 1
+    return apagados
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Exporta as vendas de um recorte para CSV ou Parquet, em blocos.")
+    parser.add_argument("--out", type=Path, required=True, help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument("--format", choices=FORMATOS, help="Formato de saída (padrão: pela extensão de --out)")
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path(__file__).parent / "data",
+        help="Diretório com a base em CSV ou Parquet (padrão: data)",
+    )
+    parser.add_argument("--inicio", type=dt.date.fromisoformat, help="Data inicial AAAA-MM-DD (padrão: sem limite)")
+    parser.add_argument("--fim", type=dt.date.fromisoformat, help="Data final AAAA-MM-DD (padrão: sem limite)")
+    for chave in FILTER_COLUMNS:
+        parser.add_argument(
+            f"--{chave}", type=str, default="", help=f"Valores de {chave} separados por vírgula (padrão: todos)"
+        )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BLOCO_PADRAO,
+        help=f"Linhas lidas por bloco; limita a memória usada (padrão: {BLOCO_PADRAO})",
+    )
+    parser.add_argument(
+        "--progress",
+        choices=["texto", "json", "nenhum"],
+        default="texto",
+        help="Progresso em texto no stderr, em linhas JSON no stdout ou desligado (padrão: texto)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.batch_size <= 0:
+        raise ValueError("O tamanho do bloco precisa ser positivo.")
+    if args.inicio is not None and args.fim is not None and args.inicio > args.fim:
+        raise ValueError("A data inicial é posterior à final.")
+    filtros: dict[str, Any] = {"inicio": args.inicio, "fim": args.fim}
+    for chave in FILTER_COLUMNS:
+        filtros[chave] = [valor.strip() for valor in getattr(args, chave).split(",") if valor.strip()]
+
+    def progresso(estado: dict[str, Any]) -> None:
+        if args.progress == "json":
+            print(json.dumps(estado), flush=True)
+        elif args.progress == "texto":
+            fracao = estado["lidas"] / estado["total"] if estado["total"] else 1.0
+            texto = f"\r{fracao:6.1%} · {estado['exportadas']:,} linhas exportadas".replace(",", ".")
+            print(texto, end="", file=sys.stderr, flush=True)
+
+    resumo = export_sales(args.data, filtros, args.out, args.format, args.batch_size, progresso)
+    if args.progress == "json":
+        print(json.dumps({**resumo, "concluido": True}), flush=True)
+    elif args.progress == "texto":
+        print(file=sys.stderr)
+        print(
+            f"Foram exportadas {resumo['exportadas']:,} linhas em {resumo['segundos']:.1f}s.".replace(",", ".")
+        )
+        print(f"Arquivo salvo em: {resumo['arquivo']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Figuras Plotly do painel, montadas a partir dos agregados de ``analytics``.
+
+Cada figura depende só do seu quadro de entrada, então pode ser guardada em
+cache sob ``frame_digest`` do quadro: filtros que produzem o mesmo agregado
+reaproveitam a figura sem passar de novo pelo ``plotly.express``.
+
+Para reduzir o JSON enviado ao navegador, valores monetários vão para o
+gráfico em reais inteiros (as tabelas continuam com centavos), o tema só leva
+os padrões dos tipos de traço usados na figura e o treemap tem um teto de
+folhas, com o restante de cada categoria somado em "outros".
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+TREEMAP_MAX_FOLHAS = 40
+# rótulo do eixo de cada grão de timeindex.GRAOS
+ROTULOS_GRAO = {"dia": "Dia", "semana": "Semana", "mes": "Mês", "trimestre": "Trimestre"}
+OUTROS = "outros"
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Hash do conteúdo do quadro (valores, colunas e tipos), independente do índice."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(col, str(tipo)) for col, tipo in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def compact_money(df: pd.DataFrame, colunas: list[str]) -> pd.DataFrame:
+    # inteiros saem no JSON com metade dos dígitos de um float64 de soma
+    return df.assign(**{col: np.rint(df[col].to_numpy()).astype(np.int64) for col in colunas})
+
+
+def prune_template(fig: go.Figure) -> go.Figure:
+    """Remove do tema os padrões de tipos de traço que a figura não usa (quase metade do JSON)."""
+    tema = fig.layout.template
+    usados = {trace.type for trace in fig.data}
+    fig.update_layout(
+        template=go.layout.Template(layout=tema.layout, data={tipo: tema.data[tipo] for tipo in usados if tema.data[tipo]})
+    )
+    return fig
+
+
+def cap_treemap(categoria: pd.DataFrame, max_folhas: int = TREEMAP_MAX_FOLHAS) -> pd.DataFrame:
+    """Mantém as ``max_folhas`` marcas de maior receita; as demais viram "outros" na categoria."""
+    if len(categoria) <= max_folhas:
+        return categoria
+    ordem = np.argsort(-categoria["receita"].to_numpy(), kind="stable")
+    cauda = categoria.iloc[ordem[max_folhas:]]
+    outros = (
+        cauda.groupby("categoria", as_index=False, sort=True)
+        .agg(receita=("receita", "sum"))
+        .assign(marca=OUTROS)
+    )
+    return pd.concat([categoria.iloc[np.sort(ordem[:max_folhas])], outros[categoria.columns]], ignore_index=True)
+
+
+def meta_real_figure(meta_real: pd.DataFrame, grao: str = "mes") -> go.Figure:
+    rotulo = ROTULOS_GRAO[grao]
+    fig = px.bar(
+        compact_money(meta_real, ["meta", "realizado"]),
+        x="periodo_inicio",
+        y=["meta", "realizado"],
+        barmode="group",
+        hover_data=["periodo"],
+        color_discrete_map={"meta": "#f59e0b", "realizado": "#0ea5e9"},
+        labels={"value": "R$", "periodo_inicio": rotulo, "periodo": rotulo, "variable": ""},
+        title=f"Meta vs. realizado por {rotulo.lower()}",
+    )
+    fig.update_layout(margin=dict(l=0, r=0, t=40, b=30))
+    return prune_template(fig)
+
+
+def channel_figure(canal: pd.DataFrame) -> go.Figure:
+    fig = px.bar(
+        compact_money(canal.sort_values("receita"), ["receita"]),
+        x="receita",
+        y="canal",
+        orientation="h",
+        color="margem_pct",
+        color_continuous_scale=["#0ea5e9", "#14b8a6", "#f59e0b"],
+        labels={"receita": "Receita", "canal": "Canal", "margem_pct": "Margem %"},
+        title="Receita por canal",
+    )
+    fig.update_layout(coloraxis_showscale=False, margin=dict(l=0, r=0, t=50, b=10))
+    return prune_template(fig)
+
+
+def category_figure(categoria: pd.DataFrame, max_folhas: int = TREEMAP_MAX_FOLHAS) -> go.Figure:
+    fig = px.treemap(
+        compact_money(cap_treemap(categoria, max_folhas), ["receita"]),
+        path=["categoria", "marca"],
+        values="receita",
+        color="categoria",
+        title="Mix por categoria e marca",
+    )
+    fig.update_layout(margin=dict(l=0, r=0, t=50, b=10))
+    return prune_template(fig)
+
+
+def state_figure(estados: pd.DataFrame) -> go.Figure:
+    fig = px.bar(
+        compact_money(estados.sort_values("receita", ascending=False), ["receita"]),
+        x="estado",
+        y="receita",
+        color="margem_pct",
+        color_continuous_scale=["#0ea5e9", "#22c55e", "#f59e0b"],
+        labels={"estado": "UF", "receita": "Receita", "margem_pct": "Margem %"},
+        title="Receita por estado",
+    )
+    fig.update_layout(coloraxis_showscale=False, margin=dict(l=0, r=0, t=50, b=10))
+    return prune_template(fig)
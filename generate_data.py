@@ -6,16 +6,26 @@ O objetivo é fornecer uma base consistente para visualizações em BI/Streamlit
 from __future__ import annotations
 
 import argparse
-import random
+import os
+import re
+import shutil
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
 import numpy as np
 import pandas as pd
 
+import storage
+
 RANDOM_SEED = 42
-np.random.seed(RANDOM_SEED)
-random.seed(RANDOM_SEED)
+# pedidos por bloco de sementes: os blocos começam nos múltiplos deste valor e cada um
+# tem semente própria, então a base não depende de --chunk-size (só de --records e RANDOM_SEED)
+BLOCO_SEMENTE = 50_000
+# dígitos do sequencial em pedido_id: comporta até 10 bilhões de pedidos sem mudar de largura
+ID_DIGITS = 10
 
 STATE_CONFIG = [
     {"uf": "SP", "regiao": "Sudeste", "cidades": ["São Paulo", "Campinas", "Santos", "São José dos Campos"], "peso": 0.26},
@@ -100,87 +110,404 @@ SAZONALIDADE = {
 }
 
 
-def sample_dates(total: int, start_date: pd.Timestamp, end_date: pd.Timestamp) -> np.ndarray:
+def build_calendar(start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.DataFrame:
+    """Uma linha por dia do intervalo, com peso sazonal e rótulos já formatados.
+
+    Os rótulos textuais são calculados uma vez por dia e depois indexados por
+    pedido, evitando formatar datas linha a linha.
+    """
     dias = pd.date_range(start=start_date, end=end_date, freq="D")
-    pesos = np.array([SAZONALIDADE[d.month] for d in dias], dtype=float)
-    pesos = pesos / pesos.sum()
-    return np.random.choice(dias, size=total, p=pesos)
-
-
-def generate_sales(rows: int, start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.DataFrame:
-    datas = pd.to_datetime(sample_dates(rows, start_date, end_date))
-    registros = []
-
-    estado_pesos = [estado["peso"] for estado in STATE_CONFIG]
-    canal_pesos = [canal["peso"] for canal in CHANNELS]
-
-    for i, dt in enumerate(datas, start=1):
-        dt = pd.Timestamp(dt)
-        estado = random.choices(STATE_CONFIG, weights=estado_pesos, k=1)[0]
-        canal = random.choices(CHANNELS, weights=canal_pesos, k=1)[0]
-        categoria = random.choice(CATEGORIES)
-        marca = random.choice(categoria["marcas"])
-        produto = random.choice(marca["produtos"])
-
-        preco_base = marca["preco_base"]
-        preco = np.random.normal(loc=preco_base, scale=preco_base * 0.12)
-        preco = max(preco, preco_base * 0.55)
-
-        quantidade = int(
-            np.random.choice(
-                [1, 1, 1, 1, 2, 2, 3, 4, 5],
-                p=[0.22, 0.2, 0.18, 0.15, 0.1, 0.08, 0.04, 0.02, 0.01],
-            )
-        )
+    pesos = np.array([SAZONALIDADE[m] for m in dias.month], dtype=float)
+    return pd.DataFrame(
+        {
+            "data": dias,
+            "peso": pesos / pesos.sum(),
+            "ano": dias.year,
+            "mes": dias.month,
+            "prefixo": "P" + dias.strftime("%y%m") + "-",
+            "ano_mes": dias.to_period("M").astype(str),
+            "trimestre": dias.to_period("Q").astype(str),
+        }
+    )
+
+
+def _product_table() -> pd.DataFrame:
+    """Achata CATEGORIES em uma linha por produto com a probabilidade de sorteio.
+
+    Replica o sorteio hierárquico original: categoria uniforme, marca uniforme
+    dentro da categoria e produto uniforme dentro da marca.
+    """
+    linhas = []
+    for categoria in CATEGORIES:
+        for marca in categoria["marcas"]:
+            for produto in marca["produtos"]:
+                linhas.append(
+                    {
+                        "categoria": categoria["nome"],
+                        "marca": marca["nome"],
+                        "produto": produto,
+                        "preco_base": float(marca["preco_base"]),
+                        "custo_ratio_base": 0.5 if categoria["nome"] in {"Acessórios", "Casa Inteligente"} else 0.58,
+                        "prob": 1 / len(CATEGORIES) / len(categoria["marcas"]) / len(marca["produtos"]),
+                    }
+                )
+    tabela = pd.DataFrame(linhas)
+    tabela["prob"] = tabela["prob"] / tabela["prob"].sum()
+    return tabela
+
+
+PRODUTOS = _product_table()
+# catálogo sintético (--catalog): SKUs numerados a partir daqui, com popularidade de Zipf
+SKU_BASE = 100_000
+ZIPF_EXPOENTE = 1.1
+
+
+@lru_cache(maxsize=4)
+def product_table(catalogo: int = 0) -> pd.DataFrame:
+    """Produtos sorteáveis: o catálogo fixo de ``CATEGORIES`` ou ``catalogo`` SKUs sintéticos.
+
+    No catálogo sintético cada SKU é um código inteiro (``SKU_BASE + 1``, ...)
+    ligado a uma marca de ``CATEGORIES``, com preço base variando em torno do
+    da marca. A probabilidade de venda segue uma lei de Zipf sobre uma ordem
+    de popularidade sorteada, então poucos SKUs concentram a receita e a
+    maioria forma uma cauda longa. O catálogo depende só do tamanho, e
+    ``--append`` com o mesmo ``--catalog`` continua a mesma base.
+    """
+    if catalogo <= 0:
+        return PRODUTOS
+    marcas = PRODUTOS.drop_duplicates("marca", ignore_index=True)
+    rng = np.random.default_rng(np.random.SeedSequence([RANDOM_SEED, catalogo]))
+    marca_idx = rng.integers(len(marcas), size=catalogo)
+    popularidade = 1 / np.arange(1, catalogo + 1) ** ZIPF_EXPOENTE
+    prob = popularidade[rng.permutation(catalogo)]
+    return pd.DataFrame(
+        {
+            "categoria": marcas["categoria"].to_numpy()[marca_idx],
+            "marca": marcas["marca"].to_numpy()[marca_idx],
+            "produto": np.arange(SKU_BASE + 1, SKU_BASE + catalogo + 1, dtype=np.int32),
+            "preco_base": (marcas["preco_base"].to_numpy()[marca_idx] * rng.lognormal(0, 0.35, catalogo)).round(2),
+            "custo_ratio_base": marcas["custo_ratio_base"].to_numpy()[marca_idx],
+            "prob": prob / prob.sum(),
+        }
+    )
+
+
+ESTADO_PESOS = np.array([estado["peso"] for estado in STATE_CONFIG], dtype=float)
+ESTADO_PESOS = ESTADO_PESOS / ESTADO_PESOS.sum()
+CANAL_PESOS = np.array([canal["peso"] for canal in CHANNELS], dtype=float)
+CANAL_PESOS = CANAL_PESOS / CANAL_PESOS.sum()
+UFS = np.array([estado["uf"] for estado in STATE_CONFIG], dtype=object)
+REGIOES = np.array([estado["regiao"] for estado in STATE_CONFIG], dtype=object)
+CANAIS = np.array([canal["nome"] for canal in CHANNELS], dtype=object)
+DESCONTOS_BASE = np.array([canal["desconto_base"] for canal in CHANNELS])
+CIDADES = np.array([cidade for estado in STATE_CONFIG for cidade in estado["cidades"]], dtype=object)
+CIDADES_QTD = np.array([len(estado["cidades"]) for estado in STATE_CONFIG])
+CIDADES_INICIO = np.concatenate([[0], np.cumsum(CIDADES_QTD)[:-1]])
+QTD_VALORES = np.array([1, 1, 1, 1, 2, 2, 3, 4, 5])
+QTD_PESOS = np.array([0.22, 0.2, 0.18, 0.15, 0.1, 0.08, 0.04, 0.02, 0.01])
+# itens (linhas) por pedido no formato "tamanho:peso,...": o padrão mantém um item por pedido
+CESTA_PADRAO = "1:1"
+
+
+def parse_basket(texto: str) -> tuple[np.ndarray, np.ndarray] | None:
+    """Distribuição de itens por pedido, ex. "1:0.55,2:0.25,3:0.12,4:0.08"; None para um item sempre."""
+    tamanhos, pesos = [], []
+    for parte in texto.split(","):
+        tamanho, _, peso = parte.partition(":")
+        tamanhos.append(int(tamanho))
+        pesos.append(float(peso) if peso else 1.0)
+    tamanhos, pesos = np.array(tamanhos), np.array(pesos, dtype=float)
+    if (tamanhos <= 0).any() or (pesos < 0).any() or pesos.sum() <= 0:
+        raise ValueError(f"Distribuição de itens por pedido inválida: {texto!r}")
+    if (tamanhos[pesos > 0] == 1).all():
+        return None
+    return tamanhos, pesos / pesos.sum()
+
+
+def chunk_rng(offset: int, seed: int = RANDOM_SEED) -> np.random.Generator:
+    # cada bloco de sementes tem semente própria derivada de RANDOM_SEED e da posição do seu
+    # primeiro pedido: o resultado não depende da ordem em que os blocos são
+    # produzidos e blocos acrescentados depois nunca repetem sementes
+    return np.random.default_rng(np.random.SeedSequence([seed, offset]))
+
+
+def seed_blocks(offset: int, rows: int, chunk_size: int) -> list[list[tuple[int, int]]]:
+    """Shards de ``rows`` pedidos a partir de ``offset``, cada um uma lista de blocos (início, pedidos).
+
+    Os blocos são cortados nos múltiplos de ``BLOCO_SEMENTE`` e cada shard junta
+    blocos inteiros até ``chunk_size`` pedidos (ao menos um bloco): o tamanho do
+    shard muda só quantos blocos vão para cada arquivo, não os sorteios.
+    """
+    if rows <= 0:
+        return []
+    fim = offset + rows
+    cortes = [offset, *range((offset // BLOCO_SEMENTE + 1) * BLOCO_SEMENTE, fim, BLOCO_SEMENTE), fim]
+    shards: list[list[tuple[int, int]]] = []
+    pedidos = 0
+    for inicio, seguinte in zip(cortes, cortes[1:]):
+        if not shards or pedidos + seguinte - inicio > chunk_size:
+            shards.append([])
+            pedidos = 0
+        shards[-1].append((inicio, seguinte - inicio))
+        pedidos += seguinte - inicio
+    return shards
+
+
+def generate_blocks(
+    blocos: list[tuple[int, int]],
+    calendario: pd.DataFrame,
+    seed: int = RANDOM_SEED,
+    cesta: tuple[np.ndarray, np.ndarray] | None = None,
+    catalogo: int = 0,
+) -> pd.DataFrame:
+    """Pedidos de um shard de ``seed_blocks``, bloco a bloco, cada um com a semente da sua posição."""
+    partes = [
+        generate_chunk(chunk_rng(inicio, seed), inicio, pedidos, calendario, cesta, catalogo)
+        for inicio, pedidos in blocos
+    ]
+    return partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+
+
+def generate_chunk(
+    rng: np.random.Generator,
+    offset: int,
+    rows: int,
+    calendario: pd.DataFrame,
+    cesta: tuple[np.ndarray, np.ndarray] | None = None,
+    catalogo: int = 0,
+) -> pd.DataFrame:
+    """``rows`` pedidos a partir da posição ``offset``; com ``cesta``, cada pedido tem vários itens.
+
+    Com ``catalogo``, os produtos vêm do catálogo sintético de ``product_table``.
+
+    Dia, estado, cidade e canal são do pedido e se repetem nas suas linhas;
+    produto, preço, quantidade, desconto e custo são sorteados por item.
+    """
+    dia_idx = rng.choice(len(calendario), size=rows, p=calendario["peso"].to_numpy())
+
+    estado_idx = rng.choice(len(STATE_CONFIG), size=rows, p=ESTADO_PESOS)
+    canal_idx = rng.choice(len(CHANNELS), size=rows, p=CANAL_PESOS)
+    if cesta is None:
+        # um item por pedido: mesma sequência de sorteios da base original
+        linhas = rows
+
+        def por_item(valores: np.ndarray) -> np.ndarray:
+            return valores
+    else:
+        tamanhos, pesos = cesta
+        itens = tamanhos[rng.choice(len(tamanhos), size=rows, p=pesos)]
+        pedido_idx = np.repeat(np.arange(rows), itens)
+        linhas = len(pedido_idx)
+
+        def por_item(valores: np.ndarray) -> np.ndarray:
+            return valores[pedido_idx]
+
+    produtos = product_table(catalogo)
+    produto_idx = rng.choice(len(produtos), size=linhas, p=produtos["prob"].to_numpy())
+    cidade_idx = CIDADES_INICIO[estado_idx] + (rng.random(rows) * CIDADES_QTD[estado_idx]).astype(np.int64)
+
+    preco_base = produtos["preco_base"].to_numpy()[produto_idx]
+    preco = np.maximum(rng.normal(loc=preco_base, scale=preco_base * 0.12), preco_base * 0.55)
+    quantidade = QTD_VALORES[rng.choice(len(QTD_VALORES), size=linhas, p=QTD_PESOS)]
+
+    desconto = np.clip(rng.normal(DESCONTOS_BASE[por_item(canal_idx)], 0.03), 0, 0.3)
+    receita = preco * quantidade * (1 - desconto)
+
+    custo_ratio_base = produtos["custo_ratio_base"].to_numpy()[produto_idx]
+    custo_ratio = np.clip(rng.normal(custo_ratio_base, 0.05), 0.38, 0.8)
+    custo = receita * custo_ratio
+    lucro = receita - custo
+    margem_pct = np.divide(lucro * 100, receita, out=np.zeros(linhas), where=receita != 0)
+
+    sequencia = pd.Series(np.arange(offset + 1, offset + rows + 1)).astype(str).str.zfill(ID_DIGITS)
+    pedido_id = calendario["prefixo"].to_numpy()[dia_idx] + sequencia.to_numpy()
+    dia_idx, estado_idx, canal_idx, cidade_idx = (por_item(idx) for idx in (dia_idx, estado_idx, canal_idx, cidade_idx))
+
+    return pd.DataFrame(
+        {
+            "pedido_id": por_item(pedido_id),
+            "data": calendario["data"].to_numpy()[dia_idx],
+            "ano": calendario["ano"].to_numpy()[dia_idx],
+            "mes": calendario["mes"].to_numpy()[dia_idx],
+            "estado": UFS[estado_idx],
+            "regiao": REGIOES[estado_idx],
+            "cidade": CIDADES[cidade_idx],
+            "canal": CANAIS[canal_idx],
+            "categoria": produtos["categoria"].to_numpy()[produto_idx],
+            "marca": produtos["marca"].to_numpy()[produto_idx],
+            "produto": produtos["produto"].to_numpy()[produto_idx],
+            "preco_unitario": preco.round(2),
+            "quantidade": quantidade,
+            "desconto": desconto.round(3),
+            "receita": receita.round(2),
+            "custo": custo.round(2),
+            "lucro": lucro.round(2),
+            "margem_pct": margem_pct.round(2),
+            "ano_mes": calendario["ano_mes"].to_numpy()[dia_idx],
+            "trimestre": calendario["trimestre"].to_numpy()[dia_idx],
+        }
+    )
+
+
+def iter_sales_chunks(
+    rows: int,
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    chunk_size: int = 1_000_000,
+    seed: int = RANDOM_SEED,
+    offset: int = 0,
+    cesta: tuple[np.ndarray, np.ndarray] | None = None,
+    catalogo: int = 0,
+) -> Iterator[pd.DataFrame]:
+    """Shards de até ``chunk_size`` pedidos (ao menos um bloco de sementes); ``offset`` é quantos pedidos a
+    base já tem."""
+    calendario = build_calendar(start_date, end_date)
+    for blocos in seed_blocks(offset, rows, chunk_size):
+        yield generate_blocks(blocos, calendario, seed, cesta, catalogo)
+
+
+def generate_sales(
+    rows: int,
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    cesta: tuple[np.ndarray, np.ndarray] | None = None,
+    catalogo: int = 0,
+) -> pd.DataFrame:
+    return pd.concat(
+        list(iter_sales_chunks(rows, start_date, end_date, cesta=cesta, catalogo=catalogo)), ignore_index=True
+    )
 
-        desconto = float(np.clip(np.random.normal(canal["desconto_base"], 0.03), 0, 0.3))
-        bruto = preco * quantidade
-        receita = bruto * (1 - desconto)
-
-        custo_ratio_base = 0.58 if categoria["nome"] not in {"Acessórios", "Casa Inteligente"} else 0.5
-        custo_ratio = float(np.clip(np.random.normal(custo_ratio_base, 0.05), 0.38, 0.8))
-        custo = receita * custo_ratio
-        lucro = receita - custo
-        margem_pct = (lucro / receita * 100) if receita else 0
-
-        registros.append(
-            {
-                "pedido_id": f"P{dt:%y%m}-{i:05d}",
-                "data": dt.normalize(),
-                "ano": dt.year,
-                "mes": dt.month,
-                "estado": estado["uf"],
-                "regiao": estado["regiao"],
-                "cidade": random.choice(estado["cidades"]),
-                "canal": canal["nome"],
-                "categoria": categoria["nome"],
-                "marca": marca["nome"],
-                "produto": produto,
-                "preco_unitario": round(preco, 2),
-                "quantidade": quantidade,
-                "desconto": round(desconto, 3),
-                "receita": round(receita, 2),
-                "custo": round(custo, 2),
-                "lucro": round(lucro, 2),
-                "margem_pct": round(margem_pct, 2),
-            }
+
+def _generate_shard(tarefa: tuple) -> pd.DataFrame:
+    blocos, start_date, end_date, output_dir, formato, csv_destino, seed, cesta, catalogo = tarefa
+    calendario = build_calendar(start_date, end_date)
+    chunk = generate_blocks(blocos, calendario, seed, cesta, catalogo)
+    offset = blocos[0][0]
+    if formato == "parquet":
+        storage.write_sales_chunk(chunk, output_dir, offset)
+    else:
+        # só o primeiro shard leva cabeçalho; em paralelo os shards são concatenados em ordem
+        chunk.to_csv(csv_destino, mode="a", header=offset == 0, index=False)
+    return aggregate_targets_base(chunk)
+
+
+def generate_shards(
+    rows: int,
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    output_dir: Path,
+    formato: str = "csv",
+    chunk_size: int = 1_000_000,
+    workers: int = 1,
+    offset: int = 0,
+    seed: int = RANDOM_SEED,
+    cesta: tuple[np.ndarray, np.ndarray] | None = None,
+    catalogo: int = 0,
+) -> list[pd.DataFrame]:
+    """Gera e grava a base em blocos, opcionalmente em paralelo; devolve os agregados parciais das metas.
+
+    Cada shard é independente: junta blocos de sementes inteiros
+    (``seed_blocks``), a semente de cada bloco vem da posição do seu primeiro
+    pedido e o sequencial de ``pedido_id`` é global, então o resultado é o mesmo
+    para qualquer número de workers e qualquer ``chunk_size``.
+    """
+    sales_path = output_dir / storage.SALES_CSV
+    shards = seed_blocks(offset, rows, chunk_size)
+    paralelo = workers > 1 and len(shards) > 1
+    tarefas = [
+        (
+            blocos,
+            start_date,
+            end_date,
+            output_dir,
+            formato,
+            # em paralelo cada shard CSV vai para um arquivo próprio, concatenado em ordem no fim
+            output_dir / f".{storage.SALES_CSV}.{blocos[0][0]:012d}.part" if paralelo else sales_path,
+            seed,
+            cesta,
+            catalogo,
         )
+        for blocos in shards
+    ]
 
-    df = pd.DataFrame(registros)
-    df["ano_mes"] = df["data"].dt.to_period("M").astype(str)
-    df["trimestre"] = df["data"].dt.to_period("Q").astype(str)
-    return df
+    if not paralelo:
+        return [_generate_shard(tarefa) for tarefa in tarefas]
 
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parciais = list(pool.map(_generate_shard, tarefas))
 
-def build_targets(sales_df: pd.DataFrame) -> pd.DataFrame:
-    agrupado = sales_df.groupby(["ano_mes", "estado", "canal"], as_index=False).agg(
+    if formato == "csv":
+        with open(sales_path, "wb") as destino:
+            for tarefa in tarefas:
+                with open(tarefa[5], "rb") as parte:
+                    shutil.copyfileobj(parte, destino, length=16 * 1024 * 1024)
+                tarefa[5].unlink()
+    return parciais
+
+
+def aggregate_targets_base(sales_df: pd.DataFrame) -> pd.DataFrame:
+    return sales_df.groupby(["ano_mes", "estado", "canal"], as_index=False).agg(
         faturamento=("receita", "sum"),
         pedidos=("pedido_id", "nunique"),
     )
 
-    rng = np.random.default_rng(RANDOM_SEED + 7)
-    fator_meta = rng.normal(loc=1.05, scale=0.07, size=len(agrupado))
-    fator_ped = rng.normal(loc=1.03, scale=0.05, size=len(agrupado))
+
+def merge_targets_base(parciais: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    # a soma das contagens parciais só equivale ao nunique sobre a base inteira
+    # se nenhum pedido aparece em mais de uma parcial: os shards gerados são
+    # cortados entre pedidos, e build_targets_from_disk guarda o último pedido
+    # de cada bloco lido para o bloco seguinte
+    return (
+        pd.concat(list(parciais), ignore_index=True)
+        .groupby(["ano_mes", "estado", "canal"], as_index=False)
+        .agg(faturamento=("faturamento", "sum"), pedidos=("pedidos", "sum"))
+    )
+
+
+def build_targets_from_disk(
+    base_dir: Path, ano_meses: Iterable[str] | None = None, chunk_size: int = 1_000_000
+) -> pd.DataFrame:
+    """Metas calculadas por redução em blocos sobre a base gravada (CSV ou Parquet).
+
+    A memória usada é limitada pelo número de grupos ano_mes/estado/canal, não
+    pelo número de pedidos, e o resultado é igual ao de ``build_targets`` sobre
+    a base inteira. Os itens de um pedido precisam estar em linhas seguidas,
+    como nas bases gravadas por este script: o bloco lido pode terminar no meio
+    de um pedido, então as linhas do último pedido de cada bloco só são
+    contadas com o bloco seguinte.
+    """
+    colunas = ["ano_mes", "estado", "canal", "receita", "pedido_id"]
+    acumulado = None
+    pendente: pd.DataFrame | None = None
+    for bloco in storage.iter_sales_batches(
+        base_dir, columns=colunas, ano_meses=list(ano_meses) if ano_meses is not None else None, batch_size=chunk_size
+    ):
+        bloco = bloco.astype({"estado": str, "canal": str, "pedido_id": str})
+        if pendente is not None:
+            bloco = pd.concat([pendente, bloco], ignore_index=True)
+        ultimo = bloco["pedido_id"].to_numpy() == bloco["pedido_id"].iat[-1]
+        pendente = bloco[ultimo]
+        parcial = aggregate_targets_base(bloco[~ultimo])
+        acumulado = parcial if acumulado is None else merge_targets_base([acumulado, parcial])
+    if pendente is None:
+        raise ValueError(f"Nenhum pedido encontrado em {base_dir}.")
+    return targets_from_base(merge_targets_base([acumulado, aggregate_targets_base(pendente)]))
+
+
+def target_factors(ano_mes: str, estado: str, canal: str) -> tuple[float, float]:
+    # semente por grupo: recalcular só alguns meses gera as mesmas metas que a
+    # geração completa
+    grupo = zlib.crc32(f"{ano_mes}|{estado}|{canal}".encode("utf-8"))
+    rng = np.random.default_rng([RANDOM_SEED + 7, grupo])
+    return rng.normal(loc=1.05, scale=0.07), rng.normal(loc=1.03, scale=0.05)
+
+
+def targets_from_base(agrupado: pd.DataFrame) -> pd.DataFrame:
+    agrupado = agrupado.sort_values(["ano_mes", "estado", "canal"], ignore_index=True)
+    fatores = np.array(
+        [target_factors(*grupo) for grupo in agrupado[["ano_mes", "estado", "canal"]].astype(str).itertuples(index=False)]
+    ).reshape(-1, 2)
+    fator_meta, fator_ped = fatores[:, 0], fatores[:, 1]
 
     agrupado["meta_faturamento"] = (agrupado["faturamento"] * fator_meta).round(2)
     agrupado["meta_pedidos"] = np.maximum(
@@ -190,6 +517,10 @@ def build_targets(sales_df: pd.DataFrame) -> pd.DataFrame:
     return agrupado[["ano_mes", "estado", "canal", "meta_faturamento", "meta_pedidos"]]
 
 
+def build_targets(sales_df: pd.DataFrame) -> pd.DataFrame:
+    return targets_from_base(aggregate_targets_base(sales_df))
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Gera dados fictícios de vendas e metas.")
     parser.add_argument(
@@ -214,11 +545,104 @@ def parse_args() -> argparse.Namespace:
         "--out",
         type=Path,
         default=Path("data"),
-        help="Diretório de saída para os CSVs (padrão: data)",
+        help="Diretório de saída para os arquivos (padrão: data)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Formato de saída: csv ou parquet particionado por ano_mes (padrão: csv)",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Acrescenta os pedidos do período a uma base Parquet existente, recalculando só as metas dos meses afetados",
+    )
+    parser.add_argument(
+        "--targets-only",
+        action="store_true",
+        help="Recalcula só as metas a partir da base já gravada em --out, lendo-a em blocos",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=f"Processos usados na geração; o resultado não depende desse número (padrão: 1, máquina: {os.cpu_count()})",
+    )
+    parser.add_argument(
+        "--basket",
+        type=str,
+        default=CESTA_PADRAO,
+        help='Itens por pedido como "tamanho:peso,...", ex. "1:0.55,2:0.25,3:0.12,4:0.08" (padrão: 1:1, um item)',
+    )
+    parser.add_argument(
+        "--catalog",
+        type=int,
+        default=0,
+        help="Número de SKUs de um catálogo sintético com códigos inteiros e popularidade de Zipf, ex. 100000 "
+        "(padrão: 0, catálogo fixo de ~50 produtos); com --append, use o mesmo valor da base",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1_000_000,
+        help=f"Pedidos gerados e gravados por bloco, em múltiplos de {BLOCO_SEMENTE}; não muda a base gerada "
+        "(padrão: 1000000)",
     )
     return parser.parse_args()
 
 
+def next_order_offset(output_dir: Path) -> int:
+    """Quantos pedidos a base Parquet já tem, isto é, a posição do próximo pedido.
+
+    Com vários itens por pedido o número de linhas não serve; os arquivos levam
+    no nome a posição do primeiro pedido do bloco, então basta o maior
+    sequencial de ``pedido_id`` entre os arquivos do último bloco.
+    """
+    padrao = re.compile(r"part-(\d{12})-")
+    posicoes: dict[int, list[str]] = {}
+    for caminho, _, _ in storage.split_version(storage.data_version(output_dir))["versao_vendas"]:
+        encontrado = padrao.search(caminho)
+        if encontrado is None:
+            # arquivos de outra origem: sem posição no nome, vale a contagem de linhas
+            return storage.count_sales(output_dir)
+        posicoes.setdefault(int(encontrado.group(1)), []).append(caminho)
+    if not posicoes:
+        return 0
+    ultimos = storage.read_sales_files(output_dir, posicoes[max(posicoes)], columns=["pedido_id"])
+    return int(ultimos["pedido_id"].str[-ID_DIGITS:].astype(np.int64).max())
+
+
+def append_sales(
+    output_dir: Path,
+    rows: int,
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    chunk_size: int,
+    workers: int = 1,
+    cesta: tuple[np.ndarray, np.ndarray] | None = None,
+    catalogo: int = 0,
+) -> tuple[int, list[str]]:
+    """Grava novos pedidos como arquivos extras nas partições e atualiza as metas dos meses tocados."""
+    if not storage.has_parquet(output_dir):
+        raise ValueError("O modo --append exige uma base Parquet. Gere a base com --format parquet.")
+
+    offset = next_order_offset(output_dir)
+    parciais = generate_shards(
+        rows, start_date, end_date, output_dir, "parquet", chunk_size, workers, offset=offset, cesta=cesta,
+        catalogo=catalogo,
+    )
+
+    # só os meses afetados são relidos, em blocos e com poda de partições; o
+    # restante das metas é mantido
+    meses = sorted(set().union(*(parcial["ano_mes"] for parcial in parciais)))
+    novas = build_targets_from_disk(output_dir, ano_meses=meses, chunk_size=chunk_size)
+    metas = storage.read_targets(output_dir).astype({"estado": str, "canal": str})
+    metas = pd.concat([metas[~metas["ano_mes"].isin(meses)], novas], ignore_index=True)
+    storage.write_targets(metas.sort_values(["ano_mes", "estado", "canal"], ignore_index=True), output_dir)
+    return rows, meses
+
+
 def main() -> None:
     args = parse_args()
     start_date = pd.to_datetime(args.start)
@@ -226,20 +650,57 @@ def main() -> None:
 
     if end_date < start_date:
         raise ValueError("A data final precisa ser maior ou igual à data inicial.")
+    if args.chunk_size <= 0:
+        raise ValueError("O tamanho do bloco precisa ser positivo.")
+    if args.workers <= 0:
+        raise ValueError("O número de workers precisa ser positivo.")
+    if args.catalog < 0:
+        raise ValueError("O tamanho do catálogo não pode ser negativo.")
+
+    cesta = parse_basket(args.basket)
 
     output_dir = Path(args.out)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    sales_df = generate_sales(args.records, start_date, end_date)
-    targets_df = build_targets(sales_df)
-
-    sales_path = output_dir / "sales_data.csv"
-    targets_path = output_dir / "monthly_targets.csv"
+    if args.targets_only:
+        targets_df = build_targets_from_disk(output_dir, chunk_size=args.chunk_size)
+        if storage.has_parquet(output_dir):
+            targets_path = storage.write_targets(targets_df, output_dir)
+        else:
+            targets_path = output_dir / storage.TARGETS_CSV
+            targets_df.to_csv(targets_path, index=False)
+        print(f"Metas recalculadas a partir da base gravada: {targets_path}")
+        return
+
+    if args.append:
+        total, meses = append_sales(
+            output_dir, args.records, start_date, end_date, args.chunk_size, args.workers, cesta, args.catalog
+        )
+        print(f"Foram acrescentados {total:,} pedidos fictícios.".replace(",", "."))
+        print(f"Metas recalculadas para: {', '.join(meses)}")
+        return
+
+    if args.format == "parquet":
+        sales_path = storage.reset_sales_dataset(output_dir)
+    else:
+        sales_path = output_dir / storage.SALES_CSV
+        sales_path.unlink(missing_ok=True)
+
+    # cada bloco é gravado assim que gerado; da base só ficam em memória os
+    # agregados parciais por ano_mes/estado/canal usados nas metas
+    parciais = generate_shards(
+        args.records, start_date, end_date, output_dir, args.format, args.chunk_size, args.workers, cesta=cesta,
+        catalogo=args.catalog,
+    )
 
-    sales_df.to_csv(sales_path, index=False)
-    targets_df.to_csv(targets_path, index=False)
+    targets_df = targets_from_base(merge_targets_base(parciais))
+    if args.format == "parquet":
+        targets_path = storage.write_targets(targets_df, output_dir)
+    else:
+        targets_path = output_dir / storage.TARGETS_CSV
+        targets_df.to_csv(targets_path, index=False)
 
-    print(f"Foram gerados {len(sales_df):,} pedidos fictícios.".replace(",", "."))
+    print(f"Foram gerados {args.records:,} pedidos fictícios.".replace(",", "."))
     print(f"Dados salvos em: {sales_path}")
     print(f"Metas salvas em: {targets_path}")
 
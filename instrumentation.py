@@ -0,0 +1,135 @@
+"""Instrumentação opcional por etapa do painel: tempo, linhas e memória alocada.
+
+Desligada por padrão, sem custo quando desligada. No painel liga com
+``PAINEL_PROFILE=1`` ou com ``?profile=1`` na URL; com ``PAINEL_PROFILE_LOG``
+apontando para um arquivo, as medições também vão para um log local rotativo,
+uma linha JSON por etapa.
+
+A memória é medida com ``tracemalloc``: ``mb_alocados`` é o pico alocado
+durante a etapa e ``mb_retidos`` o que continuou alocado ao final. O
+rastreamento vale para o processo inteiro e deixa o Python mais lento enquanto
+está ligado, então só fica ligado enquanto houver um profiler aberto: o último
+a ser fechado com ``close()`` o desliga, a menos que ele já estivesse ligado
+antes do primeiro. Com várias sessões simultâneas, o pico de uma etapa pode
+incluir alocações de outra sessão.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Iterator
+
+import pandas as pd
+
+MB = 1024**2
+
+_rastreio_lock = threading.Lock()
+_rastreio = {"abertos": 0, "ligado_aqui": False}
+
+
+def _open_tracing() -> None:
+    with _rastreio_lock:
+        if _rastreio["abertos"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _rastreio["ligado_aqui"] = True
+        _rastreio["abertos"] += 1
+
+
+def _close_tracing() -> None:
+    with _rastreio_lock:
+        _rastreio["abertos"] -= 1
+        if _rastreio["abertos"] == 0 and _rastreio["ligado_aqui"]:
+            tracemalloc.stop()
+            _rastreio["ligado_aqui"] = False
+
+
+class StageProfiler:
+    """Coleta as medições de uma execução; etapas podem ser aninhadas."""
+
+    def __init__(self, enabled: bool = False, log: logging.Logger | None = None, contexto: dict | None = None) -> None:
+        self.enabled = enabled
+        self.log = log
+        self.contexto = contexto or {}
+        self.registros: list[dict[str, Any]] = []
+        self._pilha: list[dict[str, Any]] = []
+        if enabled:
+            _open_tracing()
+
+    def close(self) -> None:
+        """Encerra a execução: as etapas seguintes não são medidas e o rastreamento pode ser desligado."""
+        if self.enabled:
+            self.enabled = False
+            _close_tracing()
+
+    @contextmanager
+    def etapa(self, nome: str, linhas_entrada: int | None = None) -> Iterator[dict[str, Any]]:
+        """Mede o bloco; quem chama pode preencher ``linhas_saida`` no registro devolvido."""
+        if not self.enabled:
+            yield {}
+            return
+
+        registro: dict[str, Any] = {
+            "etapa": nome,
+            "nivel": len(self._pilha),
+            "linhas_entrada": linhas_entrada,
+            "linhas_saida": None,
+        }
+        self.registros.append(registro)
+        if self._pilha:
+            # o pico até aqui pertence à etapa de fora, antes de ser zerado
+            self._pilha[-1]["_pico"] = max(self._pilha[-1]["_pico"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        registro["_base"] = registro["_pico"] = tracemalloc.get_traced_memory()[0]
+        self._pilha.append(registro)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro["segundos"] = time.perf_counter() - inicio
+            atual, pico = tracemalloc.get_traced_memory()
+            self._pilha.pop()
+            pico = max(pico, registro.pop("_pico"))
+            base = registro.pop("_base")
+            registro["mb_alocados"] = max(pico - base, 0) / MB
+            registro["mb_retidos"] = (atual - base) / MB
+            if self._pilha:
+                self._pilha[-1]["_pico"] = max(self._pilha[-1]["_pico"], pico)
+            if self.log is not None:
+                self.log.info(
+                    json.dumps(
+                        {"em": dt.datetime.now().isoformat(timespec="milliseconds"), **self.contexto, **registro},
+                        ensure_ascii=False,
+                        default=str,
+                    )
+                )
+
+    def table(self) -> pd.DataFrame:
+        """Medições em ordem de início, com o nome recuado conforme o aninhamento."""
+        colunas = ["etapa", "segundos", "linhas_entrada", "linhas_saida", "mb_alocados", "mb_retidos"]
+        if not self.registros:
+            return pd.DataFrame(columns=colunas)
+        tabela = pd.DataFrame([r for r in self.registros if "segundos" in r])
+        tabela["etapa"] = tabela["nivel"].map(lambda n: "· " * n) + tabela["etapa"]
+        return tabela[colunas].astype({"linhas_entrada": "Int64", "linhas_saida": "Int64"})
+
+
+def rotating_log(caminho: Path, max_mb: float = 5, backups: int = 3) -> logging.Logger:
+    """Logger que grava só a mensagem, em arquivo rotativo de até ``max_mb``."""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    log = logging.getLogger(f"painel.profile.{caminho.resolve()}")
+    if not log.handlers:
+        handler = RotatingFileHandler(caminho, maxBytes=int(max_mb * MB), backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    return log
@@ -0,0 +1,172 @@
+"""Teste de carga do serviço de agregados (``service.py``): latência sob concorrência.
+
+Abre ``--concurrency`` conexões persistentes e dispara ``--requests``
+requisições ``POST /views`` no total, sorteadas entre ``--distinct``
+combinações de filtros (a primeira é sempre "todos os filtros"). Menos
+combinações distintas que requisições exercitam os caches; mais, o cálculo.
+Ao final imprime vazão, erros e latências p50/p90/p99/máx em milissegundos.
+
+Exemplo::
+
+    python service.py --workers 8 &
+    python loadtest.py --concurrency 32 --requests 2000 --distinct 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import random
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from service import read_message
+
+
+class Connection:
+    """Conexão HTTP/1.1 persistente e mínima, uma requisição por vez."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host, self.port = host, port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def request(self, metodo: str, caminho: str, payload: Any = None) -> tuple[int, Any]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        corpo = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.writer.write(
+            (
+                f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n"
+            ).encode("latin-1")
+            + corpo
+        )
+        await self.writer.drain()
+        mensagem = await read_message(self.reader)
+        if mensagem is None:
+            await self.close()
+            raise ConnectionError("O servidor fechou a conexão")
+        inicial, cabecalhos, resposta = mensagem
+        if cabecalhos.get("connection", "").lower() == "close":
+            await self.close()
+        return int(inicial.split(" ")[1]), json.loads(resposta)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def filter_combinations(dimensoes: dict[str, Any], quantidade: int, seed: int) -> list[dict[str, Any]]:
+    """Combinações sorteadas de período, estados, canais e categorias; a primeira é "todos"."""
+    rng = random.Random(seed)
+    inicio, fim = dt.date.fromisoformat(dimensoes["inicio"]), dt.date.fromisoformat(dimensoes["fim"])
+    dias = (fim - inicio).days
+    combinacoes: list[dict[str, Any]] = [{}]
+    while len(combinacoes) < quantidade:
+        a, b = sorted(rng.randint(0, dias) for _ in range(2))
+        combinacao: dict[str, Any] = {
+            "inicio": (inicio + dt.timedelta(days=a)).isoformat(),
+            "fim": (inicio + dt.timedelta(days=b)).isoformat(),
+        }
+        for chave in ("estados", "canais", "categorias"):
+            valores = dimensoes[chave]
+            combinacao[chave] = sorted(rng.sample(valores, rng.randint(1, len(valores))))
+        combinacoes.append(combinacao)
+    return combinacoes
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    url = urllib.parse.urlsplit(args.url)
+    host, port = url.hostname or "127.0.0.1", url.port or 80
+
+    inicial = Connection(host, port)
+    status, dimensoes = await inicial.request("GET", "/dimensions")
+    await inicial.close()
+    if status != 200:
+        raise SystemExit(f"GET /dimensions respondeu {status}: {dimensoes}")
+    combinacoes = filter_combinations(dimensoes, args.distinct, args.seed)
+
+    rng = random.Random(args.seed)
+    fila: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.requests):
+        fila.put_nowait(rng.choice(combinacoes))
+    latencias: list[float] = []
+    erros: dict[str, int] = {}
+
+    async def cliente() -> None:
+        conexao = Connection(host, port)
+        while not fila.empty():
+            payload = fila.get_nowait()
+            inicio = time.perf_counter()
+            try:
+                status, resposta = await conexao.request("POST", "/views", payload)
+            except (ConnectionError, asyncio.IncompleteReadError, json.JSONDecodeError) as erro:
+                await conexao.close()
+                erros[type(erro).__name__] = erros.get(type(erro).__name__, 0) + 1
+                continue
+            if status == 200:
+                latencias.append(time.perf_counter() - inicio)
+            else:
+                erros[str(status)] = erros.get(str(status), 0) + 1
+        await conexao.close()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(args.concurrency)))
+    segundos = time.perf_counter() - inicio
+
+    ms = np.array(latencias) * 1000
+    resumo: dict[str, Any] = {
+        "url": args.url,
+        "concorrencia": args.concurrency,
+        "requisicoes": args.requests,
+        "combinacoes": len(combinacoes),
+        "ok": len(latencias),
+        "erros": erros,
+        "segundos": round(segundos, 3),
+        "req_por_s": round(len(latencias) / segundos, 1) if segundos > 0 else None,
+    }
+    if len(ms):
+        resumo.update(
+            {
+                f"{nome}_ms": round(float(np.percentile(ms, p)), 2)
+                for nome, p in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+            }
+        )
+    return resumo
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço de agregados do painel.")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:8765", help="Endereço do serviço")
+    parser.add_argument("--concurrency", type=int, default=16, help="Conexões simultâneas (padrão: 16)")
+    parser.add_argument("--requests", type=int, default=500, help="Total de requisições (padrão: 500)")
+    parser.add_argument(
+        "--distinct", type=int, default=50, help="Combinações distintas de filtros sorteadas (padrão: 50)"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Semente do sorteio (padrão: 42)")
+    parser.add_argument("--output", type=Path, help="Grava o resumo em JSON neste arquivo")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    resumo = asyncio.run(run(args))
+    texto = json.dumps(resumo, ensure_ascii=False, indent=2)
+    if args.output is not None:
+        args.output.write_text(texto, encoding="utf-8")
+    print(texto)
+    if resumo["erros"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Representação compacta em memória da base de vendas e relatório de memória.
+
+- dimensões de baixa cardinalidade viram ``category`` com lista de categorias
+  ordenada e fixa para a versão dos dados;
+- ``data`` vira ``dia`` (int32, dias desde 1970-01-01) e ``ano_mes`` vira
+  ``mes_key`` (int32 no formato AAAAMM);
+- ``pedido_id`` vira um código inteiro (a contagem de distintos continua exata)
+  e, se pedido, ganha ``pedido_hash``, o hash do identificador usado pelos
+  esboços HyperLogLog de ``sketch``;
+- medidas pequenas usam tipos estreitos; valores monetários continuam em
+  float64 porque são somados em milhões de linhas.
+
+Uso: ``python schema.py --data data`` imprime o relatório de memória da base.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+DIM_COLUMNS = ["estado", "regiao", "cidade", "canal", "categoria", "marca", "produto", "trimestre"]
+NARROW_TYPES = {
+    "quantidade": np.int16,
+    "ano": np.int16,
+    "mes": np.int8,
+    "desconto": np.float32,
+    "margem_pct": np.float32,
+}
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def day_key(datas: pd.Series | pd.DatetimeIndex | np.ndarray) -> np.ndarray:
+    return (np.asarray(datas, dtype="datetime64[D]") - EPOCH).astype(np.int32)
+
+
+def day_key_of(data: dt.date) -> int:
+    return int((np.datetime64(data, "D") - EPOCH).astype(np.int64))
+
+
+def date_of_day(dia: int) -> dt.date:
+    return (EPOCH + np.timedelta64(int(dia), "D")).astype(dt.date)
+
+
+def month_key_of_day(dia: np.ndarray) -> np.ndarray:
+    meses = (EPOCH + np.asarray(dia).astype("timedelta64[D]")).astype("datetime64[M]").astype(np.int64)
+    return ((1970 + meses // 12) * 100 + meses % 12 + 1).astype(np.int32)
+
+
+def month_key(ano_mes: pd.Series) -> np.ndarray:
+    texto = ano_mes.astype(str)
+    return (texto.str[:4].astype(np.int32) * 100 + texto.str[5:7].astype(np.int32)).to_numpy(np.int32)
+
+
+def month_label(mes: pd.Series | np.ndarray) -> pd.Series:
+    mes = pd.Series(np.asarray(mes), dtype=np.int32)
+    return (mes // 100).astype(str) + "-" + (mes % 100).astype(str).str.zfill(2)
+
+
+def month_start(mes: pd.Series | np.ndarray) -> pd.Series:
+    mes = np.asarray(mes).astype(np.int64)
+    meses = ((mes // 100 - 1970) * 12 + mes % 100 - 1).astype("datetime64[M]")
+    return pd.Series(meses.astype("datetime64[ns]"))
+
+
+def order_hash(pedidos: np.ndarray) -> np.ndarray:
+    """Primeiros 8 bytes do MD5 de cada identificador, como ``md5_number_upper`` do DuckDB.
+
+    Depende só do texto do pedido, então o backend DuckDB e os acréscimos
+    incrementais chegam aos mesmos registradores HyperLogLog.
+    """
+    digestos = b"".join(hashlib.md5(str(pedido).encode("utf-8")).digest()[:8] for pedido in pedidos)
+    return np.frombuffer(digestos, dtype="<u8").astype(np.uint64)
+
+
+def compact_sales(df: pd.DataFrame, pedido_hash: bool = False) -> pd.DataFrame:
+    compacto = {}
+    for col in df.columns:
+        serie = df[col]
+        if col in DIM_COLUMNS and isinstance(serie.dtype, pd.CategoricalDtype):
+            # dicionário vindo do Parquet: só reordena, sem materializar strings por linha
+            serie = serie.cat.remove_unused_categories()
+            compacto[col] = serie.cat.reorder_categories(sorted(serie.cat.categories))
+        elif col in DIM_COLUMNS:
+            compacto[col] = serie.astype(pd.CategoricalDtype(sorted(pd.unique(serie))))
+        elif col == "data":
+            compacto["dia"] = day_key(serie)
+        elif col == "ano_mes":
+            compacto["mes_key"] = month_key(serie)
+        elif col == "pedido_id":
+            codigos, unicos = pd.factorize(serie)
+            compacto[col] = codigos.astype(np.int32 if len(codigos) < 2**31 else np.int64)
+            if pedido_hash:
+                # um MD5 por pedido distinto, não por linha
+                compacto["pedido_hash"] = order_hash(np.asarray(unicos))[codigos]
+        elif col in NARROW_TYPES:
+            compacto[col] = serie.astype(NARROW_TYPES[col])
+        else:
+            compacto[col] = serie
+    return pd.DataFrame(compacto, index=df.index)
+
+
+def prepare_sales(vendas: pd.DataFrame, pedido_hash: bool = False) -> pd.DataFrame:
+    # ordenada por dia uma única vez: filtros de período viram fatias contíguas
+    return compact_sales(vendas, pedido_hash).sort_values("dia", kind="stable", ignore_index=True)
+
+
+def compact_targets(targets: pd.DataFrame) -> pd.DataFrame:
+    compacto = targets.astype({"estado": "category", "canal": "category"})
+    compacto["mes_key"] = month_key(targets["ano_mes"])
+    return compacto.drop(columns="ano_mes")
+
+
+def memory_report(antes: pd.DataFrame, depois: pd.DataFrame) -> pd.DataFrame:
+    """Bytes por coluna antes e depois da compactação (colunas renomeadas pareadas)."""
+    renomeadas = {"data": "dia", "ano_mes": "mes_key"}
+    linhas = []
+    for col in antes.columns:
+        destino = renomeadas.get(col, col)
+        bytes_antes = int(antes[col].memory_usage(index=False, deep=True))
+        bytes_depois = int(depois[destino].memory_usage(index=False, deep=True)) if destino in depois else 0
+        linhas.append(
+            {
+                "coluna": col,
+                "tipo_antes": str(antes[col].dtype),
+                "tipo_depois": str(depois[destino].dtype) if destino in depois else "—",
+                "mb_antes": bytes_antes / 1024**2,
+                "mb_depois": bytes_depois / 1024**2,
+            }
+        )
+    relatorio = pd.DataFrame(linhas)
+    relatorio.loc[len(relatorio)] = {
+        "coluna": "TOTAL",
+        "tipo_antes": "",
+        "tipo_depois": "",
+        "mb_antes": relatorio["mb_antes"].sum(),
+        "mb_depois": relatorio["mb_depois"].sum(),
+    }
+    relatorio["reducao_pct"] = np.where(
+        relatorio["mb_antes"] > 0, (1 - relatorio["mb_depois"] / relatorio["mb_antes"]) * 100, 0
+    ).round(1)
+    return relatorio
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compara a memória da base de vendas antes e depois da compactação.")
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path("data"),
+        help="Diretório com a base em CSV ou Parquet (padrão: data)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    antes = storage.read_sales(args.data)
+    # formato antigo: dimensões como strings Python, mesmo quando lidas do Parquet
+    antes = antes.astype({col: object for col in antes.columns if isinstance(antes[col].dtype, pd.CategoricalDtype)})
+    depois = compact_sales(antes)
+
+    relatorio = memory_report(antes, depois)
+    with pd.option_context("display.float_format", "{:,.2f}".format, "display.width", 120):
+        print(relatorio.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
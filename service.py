@@ -0,0 +1,338 @@
+"""Serviço HTTP local que devolve em JSON os mesmos agregados do painel.
+
+Para consumidores de BI e relatórios agendados que precisam dos números do
+painel (faturamento, pedidos, ticket, margem, meta vs. realizado, canal,
+categoria, estado e top produtos) sem abrir o Streamlit. O servidor é
+``asyncio`` puro (sem dependências novas) e escuta só em localhost por padrão;
+as agregações rodam em um pool de threads, todas sobre a mesma
+``engine.DashboardEngine``, de modo que a base carregada e os caches de seções
+são compartilhados entre as requisições simultâneas (requisições iguais em
+paralelo calculam uma vez só). A resposta já convertida para JSON também fica
+em cache, sob a versão dos dados, os filtros normalizados e as seções pedidas.
+
+Rotas::
+
+    GET  /health       estado do serviço e versão dos dados
+    GET  /dimensions   período e valores possíveis de cada filtro
+    POST /views        agregados para os filtros do corpo JSON
+    GET  /views        idem, com os filtros na query string (listas separadas por vírgula)
+    GET  /stats        acertos e tamanho dos caches
+
+Os filtros têm o formato do ``filtros`` do painel: ``inicio`` e ``fim`` em
+ISO (AAAA-MM-DD) e listas ``estados``, ``canais`` e ``categorias``; campos
+ausentes ou listas vazias valem "todos", como no painel. ``secoes`` limita a
+resposta a algumas seções e ``grao`` (dia, semana, mes ou trimestre; padrão:
+mes) escolhe o grão de "meta_real".
+
+Exemplo::
+
+    python service.py --port 8765 --workers 8
+    curl -s localhost:8765/views -d '{"estados": ["SP", "RJ"], "inicio": "2024-01-01", "fim": "2024-06-30"}'
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import logging
+import math
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from analytics import filter_key, parse_filters, parse_string_list
+from cache import LRUCache
+from engine import BACKENDS, DashboardEngine
+from sketch import MODOS
+from timeindex import GRAOS
+from warmup import WARMUP_PADRAO, WarmUp, parse_warmup, read_extras
+
+SECOES = ("kpis", "meta_real", "canal", "categoria", "estados", "produtos", "comparacao")
+MAX_CORPO = 1024 * 1024
+STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+log = logging.getLogger("painel.service")
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, mensagem: str) -> None:
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _records(df: pd.DataFrame) -> list[dict[str, Any]]:
+    return [{col: _scalar(valor) for col, valor in linha.items()} for linha in df.to_dict(orient="records")]
+
+
+def _scalar(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        return {chave: _scalar(v) for chave, v in valor.items()}
+    if isinstance(valor, (pd.Timestamp, dt.date)):
+        return valor.isoformat()
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def views_payload(views: dict[str, Any] | None, secoes: list[str]) -> dict[str, Any]:
+    if views is None:
+        return {"vazio": True}
+    resposta: dict[str, Any] = {"vazio": False}
+    for secao in secoes:
+        valor = views[secao]
+        resposta[secao] = _records(valor) if isinstance(valor, pd.DataFrame) else _scalar(valor)
+    return resposta
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple[str, dict[str, str], bytes] | None:
+    """Linha inicial, cabeçalhos (minúsculos) e corpo de uma mensagem HTTP/1.1; None no fim da conexão."""
+    try:
+        inicial = await reader.readline()
+    except ValueError:  # linha acima do limite do StreamReader
+        raise HTTPError(400, "Linha inicial grande demais") from None
+    if not inicial:
+        return None
+    cabecalhos: dict[str, str] = {}
+    while True:
+        try:
+            linha = await reader.readline()
+        except ValueError:
+            raise HTTPError(431, "Cabeçalho grande demais") from None
+        if linha in (b"\r\n", b"\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    valor = cabecalhos.get("content-length", "0")
+    # só dígitos ASCII: int() aceitaria sinal, espaços e "_", e um tamanho negativo
+    if not (valor.isascii() and valor.isdigit()):
+        raise HTTPError(400, f"Content-Length inválido: {valor!r}")
+    tamanho = int(valor)
+    if tamanho > MAX_CORPO:
+        raise HTTPError(413, "Corpo da requisição grande demais")
+    corpo = await reader.readexactly(tamanho) if tamanho else b""
+    return inicial.decode("latin-1").strip(), cabecalhos, corpo
+
+
+class AggregationService:
+    """Rotas HTTP sobre uma ``DashboardEngine``, com o trabalho pesado num pool de threads."""
+
+    def __init__(
+        self,
+        engine: DashboardEngine,
+        workers: int,
+        responses_cache_entries: int = 1024,
+        aquecimento: WarmUp | None = None,
+    ) -> None:
+        self.engine = engine
+        self.aquecimento = aquecimento
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="painel-agregacao")
+        self.responses_cache = LRUCache(max_entries=responses_cache_entries)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    mensagem = await read_message(reader)
+                except HTTPError as erro:
+                    await self._send(writer, erro.status, {"erro": str(erro)}, fechar=True)
+                    break
+                if mensagem is None:
+                    break
+                inicial, cabecalhos, corpo = mensagem
+                metodo, alvo, versao_http = (inicial.split(" ") + ["", ""])[:3]
+                fechar = cabecalhos.get("connection", "").lower() == "close" or versao_http == "HTTP/1.0"
+                try:
+                    status, resposta = 200, await self.route(metodo, alvo, corpo)
+                except HTTPError as erro:
+                    status, resposta = erro.status, {"erro": str(erro)}
+                except ValueError as erro:
+                    status, resposta = 400, {"erro": str(erro)}
+                except Exception:
+                    log.exception("Falha ao atender %s %s", metodo, alvo)
+                    status, resposta = 500, {"erro": "Erro interno"}
+                await self._send(writer, status, resposta, fechar)
+                if fechar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, resposta: Any, fechar: bool) -> None:
+        corpo = json.dumps(resposta, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(corpo)}\r\n"
+                f"Connection: {'close' if fechar else 'keep-alive'}\r\n\r\n"
+            ).encode("latin-1")
+            + corpo
+        )
+        await writer.drain()
+
+    async def route(self, metodo: str, alvo: str, corpo: bytes) -> Any:
+        url = urllib.parse.urlsplit(alvo)
+        rotas = {"/health": ("GET",), "/dimensions": ("GET",), "/views": ("GET", "POST"), "/stats": ("GET",)}
+        if url.path not in rotas:
+            raise HTTPError(404, f"Rota desconhecida: {url.path}")
+        if metodo not in rotas[url.path]:
+            raise HTTPError(405, f"Método {metodo} não aceito em {url.path}")
+
+        if url.path == "/stats":
+            return {
+                "dados": self.engine.data_cache.stats(),
+                "agregados": self.engine.views_cache.stats(),
+                "respostas": self.responses_cache.stats(),
+            }
+        versao = await self._run(self.engine.version)
+        if url.path == "/health":
+            return {
+                "status": "ok",
+                "backend": self.engine.backend,
+                "arquivos": len(versao),
+                "aquecimento": self.aquecimento.status() if self.aquecimento is not None else None,
+            }
+        dimensoes = await self._run(self.engine.dimensions, versao)
+        if url.path == "/dimensions":
+            return {chave: _scalar(valor) if not isinstance(valor, list) else valor for chave, valor in dimensoes.items()}
+
+        if metodo == "POST":
+            try:
+                payload = json.loads(corpo or b"{}")
+            except json.JSONDecodeError as erro:
+                raise ValueError(f"JSON inválido: {erro}") from None
+            if not isinstance(payload, dict):
+                raise ValueError("O corpo deve ser um objeto JSON")
+        else:
+            consulta = urllib.parse.parse_qs(url.query)
+            payload = {
+                chave: valores[-1] if chave in ("inicio", "fim", "grao") else [v for v in valores[-1].split(",") if v]
+                for chave, valores in consulta.items()
+            }
+        secoes = parse_string_list(payload.get("secoes") or list(SECOES), "secoes")
+        desconhecidas = set(secoes) - set(SECOES)
+        if desconhecidas:
+            raise ValueError(f"Seções desconhecidas: {', '.join(sorted(desconhecidas))}. Use {', '.join(SECOES)}.")
+        grao = payload.get("grao") or "mes"
+        if not isinstance(grao, str) or grao not in GRAOS:
+            raise ValueError(f"Grão inválido: {grao!r}. Use {', '.join(GRAOS)}.")
+        filtros = parse_filters(payload, dimensoes)
+        chave = ("resposta", versao, filter_key(filtros), tuple(secoes), grao)
+        return await self._run(
+            self.responses_cache.get_or_compute,
+            chave,
+            lambda: views_payload(self.engine.views(filtros, versao, grao=grao), secoes),
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serviço HTTP local com os agregados do painel em JSON.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Endereço de escuta (padrão: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Porta (padrão: 8765)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Threads que executam as agregações (padrão: todos os núcleos)",
+    )
+    parser.add_argument(
+        "--agg-workers",
+        type=int,
+        default=int(os.environ.get("PAINEL_AGG_WORKERS", "1")),
+        help="Threads por requisição para as seções independentes de uma visão; 1 é sequencial "
+        "(padrão: PAINEL_AGG_WORKERS ou 1, já que as requisições rodam em paralelo)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=str,
+        default=os.environ.get("PAINEL_WARMUP", WARMUP_PADRAO),
+        help=f'Filtros pré-calculados um valor por vez ao subir; "" desliga (padrão: PAINEL_WARMUP ou {WARMUP_PADRAO})',
+    )
+    parser.add_argument(
+        "--warmup-file",
+        type=Path,
+        default=os.environ.get("PAINEL_WARMUP_FILE"),
+        help="Lista JSON de filtros adicionais a pré-calcular (padrão: PAINEL_WARMUP_FILE)",
+    )
+    parser.add_argument(
+        "--warmup-workers",
+        type=int,
+        default=int(os.environ.get("PAINEL_WARMUP_WORKERS", "2")),
+        help="Threads do pré-aquecimento (padrão: PAINEL_WARMUP_WORKERS ou 2)",
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path(__file__).parent / "data",
+        help="Diretório com a base em CSV ou Parquet (padrão: data)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=os.environ.get("PAINEL_BACKEND", "pandas").lower(),
+        help="Backend de consulta (padrão: PAINEL_BACKEND ou pandas)",
+    )
+    parser.add_argument(
+        "--pedidos",
+        choices=MODOS,
+        default=os.environ.get("PAINEL_PEDIDOS", "exato").lower(),
+        help="Contagem de pedidos distintos (padrão: PAINEL_PEDIDOS ou exato)",
+    )
+    return parser.parse_args()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    engine = DashboardEngine(
+        args.data,
+        data_cache_mb=int(os.environ.get("PAINEL_DATA_CACHE_MB", "2048")),
+        views_cache_entries=int(os.environ.get("PAINEL_VIEWS_CACHE_ENTRIES", "1024")),
+        backend=args.backend,
+        duckdb_threads=int(os.environ.get("PAINEL_DUCKDB_THREADS", "0")) or None,
+        pedidos=args.pedidos,
+        shared_dir=Path(os.environ["PAINEL_SHARED_DIR"]) if os.environ.get("PAINEL_SHARED_DIR") else None,
+        agg_workers=args.agg_workers,
+    )
+    if not engine.available():
+        raise SystemExit(f"Base não encontrada em {args.data}. Execute `python generate_data.py` para criá-la.")
+    aquecimento = WarmUp(engine, parse_warmup(args.warmup), read_extras(args.warmup_file), args.warmup_workers)
+    servico = AggregationService(engine, args.workers, aquecimento=aquecimento)
+    servidor = await asyncio.start_server(servico.handle_connection, args.host, args.port)
+    log.info("Servindo em http://%s:%s com %s workers", args.host, args.port, args.workers)
+    # as requisições são atendidas desde já, com o que o aquecimento tiver deixado pronto
+    aquecimento.start()
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Cubo do painel publicado em memória compartilhada para vários processos.
+
+Com vários processos do Streamlit (ou do serviço HTTP) por máquina, cada um
+leria a base e guardaria o próprio cubo, contador de pedidos e alocador de
+metas. Com ``PAINEL_SHARED_DIR`` apontando para um diretório em memória (por
+exemplo ``/dev/shm/painel``), um único processo monta essas estruturas e as
+publica como arquivos ``.npy``, uma coluna por arquivo; os demais mapeiam os
+arquivos só para leitura (``np.load(mmap_mode="r")``) e montam os quadros sobre
+esses buffers, sem cópia. A memória física é a do cache de páginas do sistema,
+uma vez por máquina.
+
+Cada versão dos dados é um diretório próprio, escrito num diretório
+temporário e renomeado ao final: quem procura a versão nova vê o diretório
+completo ou não vê nada. Quando os arquivos de dados mudam, o primeiro
+processo a notar publica a versão nova sob uma trava de arquivo, enquanto os
+outros esperam pela trava e mapeiam o resultado. Versões antigas são apagadas
+depois de cada publicação; processos que ainda as mapeiam continuam lendo
+normalmente, pois o sistema só libera os arquivos quando o último mapeamento
+é fechado.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from analytics import ProductAllocator
+from sketch import OrderCounter
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava, cada processo pode publicar por conta própria
+    fcntl = None
+
+META = "meta.json"
+
+
+def version_digest(versao: tuple) -> str:
+    return hashlib.blake2b(repr(versao).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def write_frame(df: pd.DataFrame, pasta: Path, prefixo: str) -> list[dict[str, Any]]:
+    """Grava cada coluna como ``.npy``; categóricas e textos viram códigos + lista de categorias."""
+    colunas = []
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        if serie.dtype == object:
+            serie = serie.astype("category")
+        arquivo = f"{prefixo}_{i}.npy"
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            np.save(pasta / arquivo, serie.cat.codes.to_numpy())
+            colunas.append({"nome": col, "arquivo": arquivo, "categorias": serie.cat.categories.tolist()})
+        else:
+            np.save(pasta / arquivo, serie.to_numpy())
+            colunas.append({"nome": col, "arquivo": arquivo})
+    return colunas
+
+
+def map_frame(pasta: Path, colunas: list[dict[str, Any]]) -> pd.DataFrame:
+    """Quadro sobre os arquivos mapeados só para leitura, sem cópia das colunas."""
+    dados = {}
+    for coluna in colunas:
+        valores = np.load(pasta / coluna["arquivo"], mmap_mode="r")
+        if "categorias" in coluna:
+            valores = pd.Categorical.from_codes(valores, dtype=pd.CategoricalDtype(coluna["categorias"]))
+        dados[coluna["nome"]] = valores
+    # copy=False mantém uma coluna por bloco, apontando para o mapeamento
+    return pd.DataFrame(dados, copy=False)
+
+
+class SharedStore:
+    """Publica e mapeia ``(cubo, metas, alocador, contador)`` por versão dos dados em ``raiz``.
+
+    A versão passada a ``load`` deve incluir tudo que muda o conteúdo publicado
+    (arquivos de dados e modo de contagem de pedidos).
+    """
+
+    def __init__(self, raiz: Path, manter: int = 2) -> None:
+        self.raiz = Path(raiz)
+        self.manter = manter
+        self.raiz.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.raiz / ".lock", "a+b") as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def load(
+        self, versao: tuple, construir: Callable[[], tuple[pd.DataFrame, pd.DataFrame, ProductAllocator, OrderCounter]]
+    ) -> tuple[pd.DataFrame, pd.DataFrame, ProductAllocator, OrderCounter]:
+        """Mapeia a versão publicada; se ainda não existe, monta com ``construir`` e publica."""
+        pasta = self.raiz / version_digest(versao)
+        if not (pasta / META).exists():
+            with self._lock():
+                # outro processo pode ter publicado enquanto esperávamos pela trava
+                if not (pasta / META).exists():
+                    self.publish(pasta, *construir())
+                    self.prune(pasta)
+        return self.map(pasta)
+
+    def publish(
+        self,
+        pasta: Path,
+        cubo: pd.DataFrame,
+        targets: pd.DataFrame,
+        alocador: ProductAllocator,
+        contador: OrderCounter,
+    ) -> None:
+        temporaria = pasta.with_name(f"{pasta.name}.tmp-{os.getpid()}")
+        shutil.rmtree(temporaria, ignore_errors=True)
+        temporaria.mkdir()
+        np.save(temporaria / "produto_idx.npy", alocador.produto_idx)
+        np.save(temporaria / "ec_idx.npy", alocador.ec_idx)
+        np.save(temporaria / "inicios.npy", contador.inicios)
+        np.save(temporaria / "valores.npy", contador.valores)
+        meta = {
+            "cubo": write_frame(cubo, temporaria, "cubo"),
+            "metas": write_frame(targets, temporaria, "metas"),
+            "grupos": write_frame(contador.grupos, temporaria, "grupos"),
+            "catalogo": alocador.catalogo.to_dict(orient="list"),
+            "estados": alocador.estados.tolist(),
+            "canais": alocador.canais.tolist(),
+            "modo_pedidos": contador.modo,
+            "proximo_codigo": contador.proximo_codigo,
+        }
+        # meta.json por último: sua presença marca a versão como completa
+        (temporaria / META).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        try:
+            os.rename(temporaria, pasta)
+        except OSError:
+            # outro processo publicou a mesma versão primeiro (sem trava de arquivo)
+            shutil.rmtree(temporaria, ignore_errors=True)
+
+    def map(self, pasta: Path) -> tuple[pd.DataFrame, pd.DataFrame, ProductAllocator, OrderCounter]:
+        meta = json.loads((pasta / META).read_text(encoding="utf-8"))
+
+        def array(nome: str) -> np.ndarray:
+            return np.load(pasta / nome, mmap_mode="r")
+
+        cubo = map_frame(pasta, meta["cubo"])
+        targets = map_frame(pasta, meta["metas"])
+        alocador = ProductAllocator.restore(
+            array("produto_idx.npy"),
+            array("ec_idx.npy"),
+            pd.DataFrame(meta["catalogo"]),
+            meta["estados"],
+            meta["canais"],
+        )
+        contador = OrderCounter(
+            meta["modo_pedidos"],
+            map_frame(pasta, meta["grupos"]),
+            array("inicios.npy"),
+            array("valores.npy"),
+            meta["proximo_codigo"],
+        )
+        return cubo, targets, alocador, contador
+
+    def prune(self, atual: Path) -> None:
+        """Apaga versões antigas, mantendo as ``manter`` mais recentes (incluindo ``atual``)."""
+        if fcntl is not None:
+            # sob a trava ninguém está publicando: temporárias restantes são de processos interrompidos
+            for temporaria in self.raiz.glob("*.tmp-*"):
+                shutil.rmtree(temporaria, ignore_errors=True)
+        versoes = sorted(
+            (p for p in self.raiz.iterdir() if p.is_dir() and (p / META).exists() and p != atual),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for antiga in versoes[max(self.manter - 1, 0):]:
+            shutil.rmtree(antiga, ignore_errors=True)
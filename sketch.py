@@ -0,0 +1,212 @@
+"""Contagem de pedidos distintos por grupo, combinável entre grupos e acréscimos.
+
+Um pedido pode ter vários itens (linhas) e, portanto, aparecer em várias
+células do cubo; somar ``pedidos`` por célula conta o mesmo pedido mais de uma
+vez quando o recorte junta produtos ou categorias. ``OrderCounter`` guarda, no
+grão dia × estado × canal × categoria, um resumo dos pedidos de cada grupo que
+pode ser unido a outros grupos sem voltar aos identificadores:
+
+- ``"exato"`` (padrão): a lista de códigos de pedido de cada grupo; a união
+  marca os códigos num vetor de bits.
+- ``"hll"``: esboço HyperLogLog com 2**14 registradores, guardado de forma
+  esparsa (só os registradores ocupados de cada grupo). A união é o máximo
+  registrador a registrador; o erro típico da estimativa é ~0,8%. O hash de
+  cada pedido é o de ``schema.order_hash`` (MD5 do identificador), o mesmo que
+  o backend DuckDB calcula, então os dois estimam os mesmos números. Só
+  economiza memória quando cada grupo tem muito mais pedidos que
+  registradores ocupados; em grupos pequenos o esboço esparso tem uma entrada
+  por pedido, como a lista exata, e ainda erra.
+
+``grupos`` fica ordenado por ``dia`` e tem as colunas de filtro, então as
+posições de ``analytics.filter_positions`` valem diretamente para ele.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from cube import align_categories
+
+MODOS = ("exato", "hll")
+GROUP_DIMS = ["dia", "estado", "canal", "categoria"]
+PRECISAO = 14
+REGISTRADORES = 2**PRECISAO
+# modo exato: o mapa de bits de todos os códigos só compensa com ao menos 1/FRACAO_MAPA deles selecionados
+FRACAO_MAPA = 16
+# bits do hash que sobram para o posto depois de escolher o registrador
+_BITS_POSTO = 64 - PRECISAO
+
+
+def split_hash(h: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Registrador (bits altos) e resto (bits baixos) de cada hash de 64 bits."""
+    h = np.asarray(h).astype(np.uint64)
+    return (h >> np.uint64(_BITS_POSTO)).astype(np.int32), h & np.uint64((1 << _BITS_POSTO) - 1)
+
+
+def hll_rank(resto: np.ndarray) -> np.ndarray:
+    """Posição do primeiro bit 1 do resto, contando do bit mais alto (1 a ``_BITS_POSTO + 1``)."""
+    # frexp devolve o número de bits significativos (0 para resto zero); exato, pois o resto cabe na mantissa
+    return (_BITS_POSTO - np.frexp(np.asarray(resto).astype(np.float64))[1] + 1).astype(np.int32)
+
+
+def hll_entries(hashes: np.ndarray) -> np.ndarray:
+    """Registrador e posto de cada hash, empacotados como ``registrador * 64 + posto``."""
+    registrador, resto = split_hash(hashes)
+    return registrador * 64 + hll_rank(resto)
+
+
+def hll_estimate(registradores: np.ndarray) -> int:
+    m = len(registradores)
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimativa = alfa * m * m / np.ldexp(1.0, -registradores.astype(np.int64)).sum()
+    vazios = int(np.count_nonzero(registradores == 0))
+    if estimativa <= 2.5 * m and vazios:
+        # faixa pequena: contagem linear pelos registradores vazios
+        estimativa = m * np.log(m / vazios)
+    return int(round(estimativa))
+
+
+def _spans(inicios: np.ndarray, posicoes: slice | np.ndarray) -> np.ndarray | slice:
+    """Índices das entradas dos grupos em ``posicoes`` (fatia se forem contíguos)."""
+    if isinstance(posicoes, slice):
+        primeiro, ultimo, _ = posicoes.indices(len(inicios) - 1)
+        return slice(inicios[primeiro], inicios[max(ultimo, primeiro)])
+    comecos, tamanhos = inicios[posicoes], inicios[posicoes + 1] - inicios[posicoes]
+    deslocamento = np.repeat(comecos - np.cumsum(tamanhos) + tamanhos, tamanhos)
+    return deslocamento + np.arange(tamanhos.sum())
+
+
+class OrderCounter:
+    """Pedidos distintos por grupo dia × estado × canal × categoria."""
+
+    def __init__(
+        self, modo: str, grupos: pd.DataFrame, inicios: np.ndarray, valores: np.ndarray, proximo_codigo: int
+    ) -> None:
+        if modo not in MODOS:
+            raise ValueError(f"Modo de contagem de pedidos inválido: {modo!r}. Use {' ou '.join(MODOS)}.")
+        self.modo = modo
+        self.grupos = grupos
+        # entradas do grupo i: valores[inicios[i]:inicios[i + 1]]
+        self.inicios = inicios
+        self.valores = valores
+        self.proximo_codigo = proximo_codigo
+
+    def __sizeof__(self) -> int:
+        return (
+            int(self.grupos.memory_usage(index=True, deep=True).sum())
+            + self.inicios.nbytes
+            + self.valores.nbytes
+            + object.__sizeof__(self)
+        )
+
+    @classmethod
+    def from_sales(cls, vendas: pd.DataFrame, modo: str = "exato", primeiro_codigo: int = 0) -> "OrderCounter":
+        """Monta o contador de uma base compactada (``pedido_id`` como código inteiro).
+
+        No modo "hll" a base precisa de ``pedido_hash`` (``schema.prepare_sales``
+        com ``pedido_hash=True``). ``primeiro_codigo`` desloca os códigos, para
+        que pedidos de um acréscimo não colidam com os de um contador já montado.
+        """
+        if modo == "hll" and "pedido_hash" not in vendas.columns:
+            raise ValueError("O modo hll precisa da coluna pedido_hash (prepare_sales com pedido_hash=True).")
+        grupos = vendas.groupby(GROUP_DIMS, observed=True, sort=True)
+        grupo_idx = grupos.ngroup().to_numpy(np.int64)
+        codigos = vendas["pedido_id"].to_numpy().astype(np.int64) + primeiro_codigo
+        tabela = grupos.size().reset_index()[GROUP_DIMS]
+        proximo = int(codigos.max()) + 1 if len(codigos) else primeiro_codigo
+        valores = hll_entries(vendas["pedido_hash"].to_numpy()) if modo == "hll" else codigos
+        return cls._compacted(modo, tabela, grupo_idx, valores, proximo)
+
+    @classmethod
+    def _compacted(
+        cls, modo: str, grupos: pd.DataFrame, grupo_idx: np.ndarray, valores: np.ndarray, proximo_codigo: int
+    ) -> "OrderCounter":
+        # uma entrada por (grupo, pedido) no modo exato; por (grupo, registrador), com o maior posto, no hll
+        if modo == "hll":
+            chave = grupo_idx * REGISTRADORES + valores // 64
+            ordem = np.lexsort((valores, chave))
+            chave, valores = chave[ordem], valores[ordem]
+            ultimo = np.append(chave[1:] != chave[:-1], True)
+            grupo_idx, valores = chave[ultimo] // REGISTRADORES, valores[ultimo].astype(np.int32)
+        else:
+            ordem = np.lexsort((valores, grupo_idx))
+            grupo_idx, valores = grupo_idx[ordem], valores[ordem]
+            novo = np.append(True, (grupo_idx[1:] != grupo_idx[:-1]) | (valores[1:] != valores[:-1]))
+            grupo_idx, valores = grupo_idx[novo], valores[novo]
+        inicios = np.zeros(len(grupos) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grupo_idx, minlength=len(grupos)), out=inicios[1:])
+        return cls(modo, grupos.reset_index(drop=True), inicios, valores, proximo_codigo)
+
+    def merge(self, outro: "OrderCounter") -> "OrderCounter":
+        """Une o contador de um acréscimo, ambos ordenados por dia.
+
+        Como em ``cube.merge_cubes``, só os grupos dos dias cobertos pelo
+        acréscimo são recombinados; o restante é concatenado.
+        """
+        if outro.modo != self.modo:
+            raise ValueError("Contadores de pedidos em modos diferentes não podem ser unidos.")
+        if outro.grupos.empty:
+            return self
+        base, delta = align_categories(self.grupos, outro.grupos, columns=GROUP_DIMS[1:])
+        dias = base["dia"].to_numpy()
+        inicio = int(np.searchsorted(dias, delta["dia"].min(), side="left"))
+        fim = int(np.searchsorted(dias, delta["dia"].max(), side="right"))
+
+        janela = pd.concat([base.iloc[inicio:fim], delta], ignore_index=True)
+        agrupada = janela.groupby(GROUP_DIMS, observed=True, sort=True)
+        novo_idx = agrupada.ngroup().to_numpy(np.int64)
+        tamanhos = np.concatenate([np.diff(self.inicios[inicio : fim + 1]), np.diff(outro.inicios)])
+        entradas = np.concatenate(
+            [self.valores[self.inicios[inicio] : self.inicios[fim]], outro.valores]
+        ).astype(self.valores.dtype)
+        combinado = self._compacted(
+            self.modo,
+            agrupada.size().reset_index()[GROUP_DIMS],
+            np.repeat(novo_idx, tamanhos),
+            entradas,
+            max(self.proximo_codigo, outro.proximo_codigo),
+        )
+
+        grupos = pd.concat([base.iloc[:inicio], combinado.grupos, base.iloc[fim:]], ignore_index=True)
+        valores = np.concatenate(
+            [
+                self.valores[: self.inicios[inicio]],
+                combinado.valores,
+                self.valores[self.inicios[fim] :],
+            ]
+        )
+        inicios = np.concatenate(
+            [
+                self.inicios[:inicio],
+                self.inicios[inicio] + combinado.inicios[:-1],
+                self.inicios[fim:] - self.inicios[fim] + self.inicios[inicio] + combinado.inicios[-1],
+            ]
+        )
+        return OrderCounter(self.modo, grupos, inicios, valores, combinado.proximo_codigo)
+
+    def _distinct(self, entradas: np.ndarray) -> int:
+        if self.modo == "hll":
+            registradores = np.zeros(REGISTRADORES, dtype=np.uint8)
+            np.maximum.at(registradores, entradas // 64, (entradas % 64).astype(np.uint8))
+            return hll_estimate(registradores)
+        if len(entradas) * FRACAO_MAPA < self.proximo_codigo:
+            # recorte estreito: ordenar só as entradas selecionadas custa menos que um mapa do tamanho da base
+            return len(np.unique(entradas))
+        marcados = np.zeros(self.proximo_codigo, dtype=bool)
+        marcados[entradas] = True
+        return int(np.count_nonzero(marcados))
+
+    def count(self, posicoes: slice | np.ndarray = slice(None)) -> int:
+        """Pedidos distintos na união dos grupos em ``posicoes``."""
+        return self._distinct(self.valores[_spans(self.inicios, posicoes)])
+
+    def count_by(self, posicoes: slice | np.ndarray, coluna: str) -> pd.Series:
+        """Pedidos distintos por valor de ``coluna`` (uma dimensão dos grupos), só valores presentes."""
+        serie = self.grupos[coluna].iloc[posicoes]
+        codigos = serie.cat.codes.to_numpy()
+        indices = np.arange(len(self.grupos))[posicoes]
+        resultado = {}
+        for codigo in np.unique(codigos):
+            resultado[serie.cat.categories[codigo]] = self.count(indices[codigos == codigo])
+        return pd.Series(resultado, name="pedidos", dtype=np.int64).rename_axis(coluna)
@@ -0,0 +1,304 @@
+"""Backend SQL embarcado (DuckDB) para os filtros e agregações do painel.
+
+Alternativa ao caminho em pandas de ``analytics``, que continua sendo a
+referência: as mesmas visões (KPIs, meta vs. realizado, canal, categoria,
+estado e top produtos) saem de consultas SQL executadas direto sobre os
+arquivos CSV/Parquet, em vários núcleos. No Parquet, o período vira filtro
+sobre a partição ``ano_mes`` (só os meses necessários são abertos) e os
+demais filtros são empurrados para a leitura das colunas.
+
+Os números seguem a mesma definição do cubo: a consulta primeiro agrega as
+vendas filtradas no grão dia × estado × canal × categoria × marca × produto,
+com ``pedidos`` contado por célula, e as visões somam essas células. Pedidos
+distintos do recorte (KPIs e canal) saem de uma consulta à parte sobre as
+linhas: no modo "exato" com ``count(DISTINCT ...)``; no modo "hll" a consulta
+devolve, por canal e registrador HyperLogLog, o menor resto do hash MD5 do
+pedido (o mesmo hash e a mesma precisão de ``sketch.OrderCounter``) e o posto
+e a estimativa são calculados em Python, com o total saindo da união dos
+registradores dos canais; os dois backends chegam aos mesmos números. O ``approx_count_distinct`` do DuckDB
+usa poucos registradores e erra demais para o KPI.
+
+Requer o pacote opcional ``duckdb``.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+import storage
+from analytics import FILTER_COLUMNS, TOP_PRODUTOS, format_top_products, kpis_from_totals, meta_vs_real, target_totals
+from schema import day_key
+from timeindex import comparison_periods, period_coverage, period_keys, prorate_targets, spread_targets
+from sketch import MODOS, PRECISAO, REGISTRADORES, hll_estimate, hll_rank
+
+try:
+    import duckdb
+except ImportError:  # dependência opcional
+    duckdb = None
+
+
+def _literal(caminho: Path) -> str:
+    return "'" + Path(caminho).as_posix().replace("'", "''") + "'"
+
+
+class DuckDBBackend:
+    """Consultas do painel sobre os arquivos em ``base_dir``, lidos a cada consulta.
+
+    Uma conexão por instância; cada consulta usa um cursor próprio, então a
+    instância pode ser compartilhada entre as sessões do Streamlit.
+    """
+
+    def __init__(self, base_dir: Path, threads: int | None = None, pedidos: str = "exato") -> None:
+        if duckdb is None:
+            raise ImportError("O backend SQL precisa do pacote duckdb: pip install duckdb")
+        if pedidos not in MODOS:
+            raise ValueError(f"Modo de contagem de pedidos inválido: {pedidos!r}. Use {' ou '.join(MODOS)}.")
+        self.base_dir = Path(base_dir)
+        self.pedidos = pedidos
+        self._con = duckdb.connect(config={"threads": threads} if threads else {})
+        self._lock = threading.Lock()
+
+    def _cursor(self):
+        with self._lock:
+            return self._con.cursor()
+
+    def _sales(self) -> str:
+        if storage.has_parquet(self.base_dir):
+            arquivos = storage.sales_dataset_path(self.base_dir) / "**" / "*.parquet"
+            return f"read_parquet({_literal(arquivos)}, hive_partitioning = true, hive_types = {{'ano_mes': VARCHAR}})"
+        return (
+            f"read_csv({_literal(self.base_dir / storage.SALES_CSV)}, header = true, "
+            "types = {'pedido_id': 'VARCHAR', 'ano_mes': 'VARCHAR', 'data': 'DATE'})"
+        )
+
+    def _targets(self) -> str:
+        if storage.has_parquet(self.base_dir):
+            return f"read_parquet({_literal(self.base_dir / storage.TARGETS_PARQUET)})"
+        return f"read_csv({_literal(self.base_dir / storage.TARGETS_CSV)}, header = true, types = {{'ano_mes': 'VARCHAR'}})"
+
+    def dimensions(self) -> dict[str, Any]:
+        """Período coberto e valores distintos de estado, canal e categoria."""
+        cur = self._cursor()
+        inicio, fim = cur.execute(f"SELECT min(data)::DATE, max(data)::DATE FROM {self._sales()}").fetchone()
+        dimensoes: dict[str, Any] = {"inicio": inicio, "fim": fim}
+        for chave, col in FILTER_COLUMNS.items():
+            linhas = cur.execute(f"SELECT DISTINCT {col}::VARCHAR FROM {self._sales()} ORDER BY 1").fetchall()
+            dimensoes[chave] = [linha[0] for linha in linhas]
+        return dimensoes
+
+    def _where(self, filtros: dict) -> tuple[str, list[Any]]:
+        inicio: dt.date = filtros["inicio"]
+        fim: dt.date = filtros["fim"]
+        # a faixa de ano_mes é redundante com a de data, mas poda partições inteiras do Parquet
+        condicoes = ["ano_mes BETWEEN ? AND ?", "data >= ?::DATE", "data < ?::DATE + INTERVAL 1 DAY"]
+        parametros: list[Any] = [f"{inicio:%Y-%m}", f"{fim:%Y-%m}", inicio, fim]
+        for chave, col in FILTER_COLUMNS.items():
+            valores = list(filtros[chave])
+            condicoes.append(f"{col} IN ({', '.join(['?'] * len(valores))})" if valores else "FALSE")
+            parametros.extend(valores)
+        return " AND ".join(condicoes), parametros
+
+    def build_views(self, filtros: dict, n: int = TOP_PRODUTOS) -> dict[str, Any] | None:
+        """Mesmo contrato de ``analytics.build_views`` (None se não houver vendas)."""
+        cur = self._cursor()
+        where, parametros = self._where(filtros)
+        cur.execute(
+            f"""
+            CREATE OR REPLACE TEMP TABLE celulas AS
+            SELECT
+                data::DATE AS dia,
+                (year(data) * 100 + month(data))::INTEGER AS mes_key,
+                estado::VARCHAR AS estado,
+                canal::VARCHAR AS canal,
+                categoria::VARCHAR AS categoria,
+                marca::VARCHAR AS marca,
+                produto::VARCHAR AS produto,
+                sum(receita) AS receita,
+                sum(lucro) AS lucro,
+                count(DISTINCT pedido_id) AS pedidos,
+                count(*) AS linhas
+            FROM {self._sales()}
+            WHERE {where}
+            GROUP BY ALL
+            """,
+            parametros,
+        )
+        if cur.execute("SELECT count(*) FROM celulas").fetchone()[0] == 0:
+            return None
+
+        # metas do recorte pela mesma regra do caminho em pandas (analytics.filter_targets),
+        # visíveis às consultas deste cursor como a tabela "metas"
+        metas = prorate_targets(self._selected_targets(cur, filtros), filtros["inicio"], filtros["fim"])
+        cur.register("metas", metas)
+
+        receita, lucro = cur.execute("SELECT sum(receita), sum(lucro) FROM celulas").fetchone()
+        pedidos, pedidos_canal = self._order_counts(cur, where, parametros)
+        meta_total, meta_ped = target_totals(metas)
+
+        return {
+            "kpis": kpis_from_totals(float(receita), int(pedidos), float(lucro), meta_total, meta_ped),
+            "meta_real": self._meta_real(
+                cur, filtros, "mes", "SELECT dia, sum(receita) AS receita FROM celulas GROUP BY dia"
+            ),
+            "canal": self._summary(cur, "canal", pedidos=pedidos_canal),
+            "categoria": cur.execute(
+                "SELECT categoria, marca, sum(receita) AS receita FROM celulas GROUP BY ALL ORDER BY categoria, marca"
+            ).df(),
+            "estados": self._summary(cur, "estado"),
+            "produtos": self._top_products(cur, n),
+            "comparacao": self._comparison(cur, filtros),
+        }
+
+    def _order_counts(self, cur, where: str, parametros: list[Any]) -> tuple[int, pd.Series]:
+        if self.pedidos == "exato":
+            por_canal = cur.execute(
+                f"""
+                SELECT canal::VARCHAR AS canal, count(DISTINCT pedido_id) AS pedidos
+                FROM {self._sales()}
+                WHERE {where}
+                GROUP BY GROUPING SETS ((), (canal))
+                """,
+                parametros,
+            ).df()
+            total = por_canal["canal"].isna()
+            return int(por_canal.loc[total, "pedidos"].iloc[0]), por_canal[~total].set_index("canal")["pedidos"]
+
+        # hash de schema.order_hash; o maior posto do registrador é o do menor resto
+        bits = 64 - PRECISAO
+        registros = cur.execute(
+            f"""
+            WITH h AS (
+                SELECT canal::VARCHAR AS canal, md5_number_upper(pedido_id::VARCHAR) AS h
+                FROM {self._sales()} WHERE {where}
+            )
+            SELECT canal, (h >> {bits})::INTEGER AS reg, min(h & ((1::UBIGINT << {bits}) - 1)) AS resto
+            FROM h
+            GROUP BY ALL
+            """,
+            parametros,
+        ).df()
+        canais = sorted(registros["canal"].unique())
+        matriz = np.zeros((len(canais), REGISTRADORES), dtype=np.uint8)
+        matriz[pd.Index(canais).get_indexer(registros["canal"]), registros["reg"].to_numpy()] = hll_rank(
+            registros["resto"].to_numpy()
+        )
+        # a união dos canais é o máximo registrador a registrador
+        pedidos_canal = pd.Series([hll_estimate(linha) for linha in matriz], index=canais, dtype=np.int64)
+        return hll_estimate(matriz.max(axis=0)), pedidos_canal
+
+    def _comparison(self, cur, filtros: dict) -> dict[str, dict[str, Any] | None]:
+        # os três períodos numa única leitura, com as mesmas dimensões filtradas
+        periodos = {"atual": (filtros["inicio"], filtros["fim"]), **comparison_periods(filtros["inicio"], filtros["fim"])}
+        inicio = min(p[0] for p in periodos.values())
+        where, parametros = self._where({**filtros, "inicio": inicio, "fim": filtros["fim"]})
+        colunas, extras = [], []
+        for nome, (de, ate) in periodos.items():
+            condicao = "data >= ?::DATE AND data < ?::DATE + INTERVAL 1 DAY"
+            colunas.append(
+                f"sum(receita) FILTER ({condicao}) AS receita_{nome}, "
+                f"sum(lucro) FILTER ({condicao}) AS lucro_{nome}, "
+                f"count(*) FILTER ({condicao}) AS linhas_{nome}"
+            )
+            extras.extend([de, ate] * 3)
+        linha = cur.execute(
+            f"SELECT {', '.join(colunas)} FROM {self._sales()} WHERE {where}", extras + parametros
+        ).df().iloc[0]
+        # datas extremas da base inteira, sem filtros, como os dias do índice no caminho pandas
+        primeiro, ultimo = cur.execute(f"SELECT min(data)::DATE, max(data)::DATE FROM {self._sales()}").fetchone()
+        resultado: dict[str, dict[str, Any] | None] = {}
+        for nome, (de, ate) in periodos.items():
+            receita, lucro = float(linha[f"receita_{nome}"] or 0), float(linha[f"lucro_{nome}"] or 0)
+            resultado[nome] = (
+                {
+                    "inicio": de,
+                    "fim": ate,
+                    "receita": receita,
+                    "lucro": lucro,
+                    "margem_pct": lucro / receita * 100 if receita else 0,
+                    "cobertura": period_coverage(de, ate, primeiro, ultimo),
+                }
+                if linha[f"linhas_{nome}"]
+                else None
+            )
+        return resultado
+
+    def meta_real(self, filtros: dict, grao: str) -> pd.DataFrame:
+        """Só a seção "meta_real" em outro grão, com uma leitura da receita por dia."""
+        where, parametros = self._where(filtros)
+        consulta = f"SELECT data::DATE AS dia, sum(receita) AS receita FROM {self._sales()} WHERE {where} GROUP BY 1"
+        return self._meta_real(self._cursor(), filtros, grao, consulta, parametros)
+
+    def _meta_real(
+        self, cur, filtros: dict, grao: str, consulta_diaria: str, parametros: list[Any] | None = None
+    ) -> pd.DataFrame:
+        # receita por dia vinda do SQL, agrupada no grão e juntada às metas como em analytics.period_meta_vs_real
+        diario = cur.execute(consulta_diaria, parametros or []).df()
+        realizado = pd.Series(diario["receita"].to_numpy()).groupby(period_keys(day_key(diario["dia"]), grao)).sum()
+        metas = self._selected_targets(cur, filtros)
+        return meta_vs_real(realizado, spread_targets(metas, filtros["inicio"], filtros["fim"], grao), grao)
+
+    def _selected_targets(self, cur, filtros: dict) -> pd.DataFrame:
+        """Metas mensais dos estados e canais filtrados, de todos os meses (``analytics.selected_targets``)."""
+        estados, canais = list(filtros["estados"]), list(filtros["canais"])
+        return cur.execute(
+            f"""
+            SELECT
+                estado::VARCHAR AS estado,
+                canal::VARCHAR AS canal,
+                (substr(ano_mes, 1, 4) || substr(ano_mes, 6, 2))::INTEGER AS mes_key,
+                meta_faturamento::DOUBLE AS meta_faturamento,
+                meta_pedidos::DOUBLE AS meta_pedidos
+            FROM {self._targets()}
+            WHERE estado IN ({', '.join(['?'] * len(estados))})
+              AND canal IN ({', '.join(['?'] * len(canais))})
+            """,
+            estados + canais,
+        ).df()
+
+    @staticmethod
+    def _summary(cur, col: str, pedidos: pd.Series | None = None) -> pd.DataFrame:
+        resumo = cur.execute(
+            f"SELECT {col}, sum(receita) AS receita, sum(lucro) AS margem FROM celulas GROUP BY {col} ORDER BY {col}"
+        ).df()
+        if pedidos is not None:
+            resumo.insert(2, "pedidos", resumo[col].map(pedidos).fillna(0).astype(np.int64))
+        resumo["margem_pct"] = (resumo["margem"] / resumo["receita"] * 100).round(1)
+        return resumo
+
+    @staticmethod
+    def _top_products(cur, n: int) -> pd.DataFrame:
+        # meta de cada estado/canal rateada pela participação do produto na receita do estado/canal
+        produtos = cur.execute(
+            """
+            WITH pec AS (
+                SELECT produto, marca, categoria, estado, canal,
+                       sum(receita) AS receita, sum(pedidos) AS pedidos, sum(linhas) AS linhas
+                FROM celulas GROUP BY ALL
+            ),
+            fator AS (
+                SELECT ec.estado, ec.canal, coalesce(m.meta, 0) / ec.receita AS fator
+                FROM (SELECT estado, canal, sum(receita) AS receita FROM pec GROUP BY ALL) AS ec
+                LEFT JOIN (SELECT estado, canal, sum(meta_faturamento) AS meta FROM metas GROUP BY ALL) AS m
+                  USING (estado, canal)
+                WHERE ec.receita > 0
+            )
+            SELECT produto, marca, categoria,
+                   sum(pec.receita) AS receita,
+                   sum(pec.pedidos)::BIGINT AS pedidos,
+                   sum(pec.receita) / sum(pec.linhas) AS ticket,
+                   coalesce(sum(pec.receita * fator.fator), 0) AS meta
+            FROM pec LEFT JOIN fator USING (estado, canal)
+            GROUP BY ALL
+            ORDER BY receita DESC, produto, marca, categoria
+            LIMIT ?
+            """,
+            [n],
+        ).df()
+        produtos["meta"] = produtos["meta"].astype(np.float64)
+        return format_top_products(produtos)
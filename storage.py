@@ -0,0 +1,206 @@
+"""Leitura e gravação das bases de vendas e metas em CSV ou Parquet.
+
+O formato Parquet guarda as vendas particionadas por ``ano_mes`` (layout
+``ano_mes=AAAA-MM/part-*.parquet``) e as colunas de baixa cardinalidade como
+dicionário, o que permite ler só as colunas e os meses necessários.
+"""
+
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+SALES_CSV = "sales_data.csv"
+TARGETS_CSV = "monthly_targets.csv"
+SALES_DATASET = "sales"
+TARGETS_PARQUET = "monthly_targets.parquet"
+
+PARTITION_COLUMN = "ano_mes"
+DICT_COLUMNS = ["estado", "regiao", "cidade", "canal", "categoria", "marca", "produto", "trimestre"]
+TARGET_DICT_COLUMNS = ["estado", "canal"]
+
+
+def sales_dataset_path(base_dir: Path) -> Path:
+    return Path(base_dir) / SALES_DATASET
+
+
+def has_parquet(base_dir: Path) -> bool:
+    return sales_dataset_path(base_dir).is_dir() and (Path(base_dir) / TARGETS_PARQUET).exists()
+
+
+def data_version(base_dir: Path) -> tuple[tuple[str, int, int], ...]:
+    """Impressão digital (caminho, mtime, tamanho) dos arquivos que seriam lidos."""
+    base_dir = Path(base_dir)
+    if has_parquet(base_dir):
+        arquivos = sorted(sales_dataset_path(base_dir).rglob("*.parquet")) + [base_dir / TARGETS_PARQUET]
+    else:
+        arquivos = [base_dir / SALES_CSV, base_dir / TARGETS_CSV]
+    versao = []
+    for arquivo in arquivos:
+        info = arquivo.stat()
+        versao.append((arquivo.relative_to(base_dir).as_posix(), info.st_mtime_ns, info.st_size))
+    return tuple(versao)
+
+
+def split_version(versao: tuple) -> dict[str, tuple]:
+    """Separa uma ``data_version`` nas partes de vendas e de metas."""
+    metas = {TARGETS_CSV, TARGETS_PARQUET}
+    return {
+        "versao_vendas": tuple(item for item in versao if item[0] not in metas),
+        "versao_metas": tuple(item for item in versao if item[0] in metas),
+    }
+
+
+def _to_arrow(df: pd.DataFrame, dict_columns: Iterable[str]) -> pa.Table:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col in dict_columns:
+        if col in table.column_names and not pa.types.is_dictionary(table.schema.field(col).type):
+            idx = table.column_names.index(col)
+            table = table.set_column(idx, col, table.column(col).dictionary_encode())
+    return table
+
+
+def reset_sales_dataset(base_dir: Path) -> Path:
+    destino = sales_dataset_path(base_dir)
+    if destino.exists():
+        shutil.rmtree(destino)
+    destino.mkdir(parents=True)
+    return destino
+
+
+def write_sales_chunk(chunk: pd.DataFrame, base_dir: Path, offset: int) -> None:
+    # o nome leva a posição do primeiro pedido do bloco: blocos acrescentados
+    # depois nunca sobrescrevem arquivos existentes
+    pq.write_to_dataset(
+        _to_arrow(chunk, DICT_COLUMNS),
+        root_path=sales_dataset_path(base_dir),
+        partition_cols=[PARTITION_COLUMN],
+        basename_template=f"part-{offset:012d}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def write_targets(targets: pd.DataFrame, base_dir: Path) -> Path:
+    destino = Path(base_dir) / TARGETS_PARQUET
+    pq.write_table(_to_arrow(targets, TARGET_DICT_COLUMNS), destino)
+    return destino
+
+
+def list_partitions(base_dir: Path) -> list[str]:
+    prefixo = f"{PARTITION_COLUMN}="
+    return sorted(
+        p.name[len(prefixo):] for p in sales_dataset_path(base_dir).iterdir() if p.is_dir() and p.name.startswith(prefixo)
+    )
+
+
+def count_sales(base_dir: Path, ano_meses: Sequence[str] | None = None) -> int:
+    """Linhas de vendas (só das partições ``ano_meses``, no Parquet), sem ler as colunas."""
+    if not has_parquet(base_dir):
+        # CSV: uma linha por venda mais o cabeçalho; ``ano_meses`` não poda um arquivo único
+        with open(Path(base_dir) / SALES_CSV, "rb") as arquivo:
+            return max(sum(bloco.count(b"\n") for bloco in iter(lambda: arquivo.read(1 << 24), b"")) - 1, 0)
+    dataset = ds.dataset(sales_dataset_path(base_dir), format="parquet", partitioning="hive")
+    filtro = ds.field(PARTITION_COLUMN).isin(list(ano_meses)) if ano_meses is not None else None
+    return dataset.count_rows(filter=filtro)
+
+
+def appended_files(anterior: tuple, atual: tuple) -> list[str] | None:
+    """Arquivos de vendas novos entre duas versões de ``data_version``.
+
+    Devolve ``None`` quando a mudança não é um simples acréscimo de arquivos ao
+    dataset Parquet (algum arquivo de vendas antigo mudou ou sumiu).
+    """
+    prefixo = SALES_DATASET + "/"
+    vendas_antes = {item for item in anterior if item[0].startswith(prefixo)}
+    vendas_agora = {item for item in atual if item[0].startswith(prefixo)}
+    if not vendas_antes or not vendas_antes <= vendas_agora:
+        return None
+    return sorted(item[0] for item in vendas_agora - vendas_antes)
+
+
+def _table_to_pandas(table: pa.Table) -> pd.DataFrame:
+    if PARTITION_COLUMN in table.column_names:
+        # a coluna de partição volta como dicionário; o restante do app espera texto
+        idx = table.column_names.index(PARTITION_COLUMN)
+        table = table.set_column(idx, PARTITION_COLUMN, table.column(PARTITION_COLUMN).cast(pa.string()))
+    return table.to_pandas()
+
+
+def read_sales_parquet(
+    base_dir: Path,
+    columns: Sequence[str] | None = None,
+    ano_meses: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    dataset = ds.dataset(sales_dataset_path(base_dir), format="parquet", partitioning="hive")
+    filtro = ds.field(PARTITION_COLUMN).isin(list(ano_meses)) if ano_meses is not None else None
+    return _table_to_pandas(dataset.to_table(columns=list(columns) if columns is not None else None, filter=filtro))
+
+
+def read_sales_files(base_dir: Path, arquivos: Sequence[str], columns: Sequence[str] | None = None) -> pd.DataFrame:
+    dataset = ds.dataset(
+        [str(Path(base_dir) / arquivo) for arquivo in arquivos],
+        format="parquet",
+        partitioning="hive",
+        partition_base_dir=str(sales_dataset_path(base_dir)),
+    )
+    return _table_to_pandas(dataset.to_table(columns=list(columns) if columns is not None else None))
+
+
+def read_sales(
+    base_dir: Path,
+    columns: Sequence[str] | None = None,
+    ano_meses: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    if has_parquet(base_dir):
+        return read_sales_parquet(base_dir, columns, ano_meses)
+
+    datas = ["data"] if columns is None or "data" in columns else None
+    data = pd.read_csv(Path(base_dir) / SALES_CSV, usecols=columns, parse_dates=datas)
+    if ano_meses is not None:
+        data = data[data[PARTITION_COLUMN].isin(ano_meses)].reset_index(drop=True)
+    return data
+
+
+def empty_sales(base_dir: Path) -> pd.DataFrame:
+    """Base de vendas sem linhas, com as colunas e tipos que ``iter_sales_batches`` devolve."""
+    if has_parquet(base_dir):
+        dataset = ds.dataset(sales_dataset_path(base_dir), format="parquet", partitioning="hive")
+        return _table_to_pandas(dataset.schema.empty_table())
+    return pd.read_csv(Path(base_dir) / SALES_CSV, nrows=0, parse_dates=["data"])
+
+
+def iter_sales_batches(
+    base_dir: Path,
+    columns: Sequence[str] | None = None,
+    ano_meses: Sequence[str] | None = None,
+    batch_size: int = 1_000_000,
+) -> Iterator[pd.DataFrame]:
+    """Percorre a base em blocos de até ``batch_size`` linhas, sem carregá-la inteira."""
+    if has_parquet(base_dir):
+        dataset = ds.dataset(sales_dataset_path(base_dir), format="parquet", partitioning="hive")
+        filtro = ds.field(PARTITION_COLUMN).isin(list(ano_meses)) if ano_meses is not None else None
+        for batch in dataset.to_batches(
+            columns=list(columns) if columns is not None else None, filter=filtro, batch_size=batch_size
+        ):
+            if batch.num_rows:
+                yield _table_to_pandas(pa.Table.from_batches([batch]))
+        return
+
+    datas = ["data"] if columns is None or "data" in columns else None
+    for chunk in pd.read_csv(Path(base_dir) / SALES_CSV, usecols=columns, parse_dates=datas, chunksize=batch_size):
+        if ano_meses is not None:
+            chunk = chunk[chunk[PARTITION_COLUMN].isin(ano_meses)]
+        if not chunk.empty:
+            yield chunk
+
+
+def read_targets(base_dir: Path) -> pd.DataFrame:
+    if has_parquet(base_dir):
+        return pq.read_table(Path(base_dir) / TARGETS_PARQUET).to_pandas()
+    return pd.read_csv(Path(base_dir) / TARGETS_CSV)
@@ -0,0 +1,46 @@
+"""Bases pequenas geradas pelo próprio ``generate_data``, compartilhadas pelos testes."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# os módulos do painel ficam na raiz do repositório
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import generate_data  # noqa: E402
+import storage  # noqa: E402
+
+CESTA = "1:0.5,2:0.3,3:0.2"
+
+
+def write_base(
+    destino: Path, pedidos: int, formato: str, cesta: str = CESTA, chunk_size: int = 1_000_000
+) -> Path:
+    """Grava vendas e metas como ``generate_data.main`` faz."""
+    destino.mkdir(parents=True, exist_ok=True)
+    inicio, fim = pd.Timestamp("2023-01-01"), pd.Timestamp("2024-12-31")
+    if formato == "parquet":
+        storage.reset_sales_dataset(destino)
+    parciais = generate_data.generate_shards(
+        pedidos, inicio, fim, destino, formato, chunk_size, cesta=generate_data.parse_basket(cesta)
+    )
+    metas = generate_data.targets_from_base(generate_data.merge_targets_base(parciais))
+    if formato == "parquet":
+        storage.write_targets(metas, destino)
+    else:
+        metas.to_csv(destino / storage.TARGETS_CSV, index=False)
+    return destino
+
+
+@pytest.fixture(scope="session")
+def parquet_base(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return write_base(tmp_path_factory.mktemp("parquet"), 20_000, "parquet")
+
+
+@pytest.fixture(scope="session")
+def csv_base(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return write_base(tmp_path_factory.mktemp("csv"), 5_000, "csv")
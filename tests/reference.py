@@ -0,0 +1,51 @@
+"""Cálculos de referência: pandas direto sobre as linhas de venda, sem cubo, índice nem contador."""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import pandas as pd
+
+import storage
+from analytics import FILTER_COLUMNS
+from cube import CUBE_DIMS, CUBE_MEASURES
+
+
+def raw_sales(base_dir) -> pd.DataFrame:
+    vendas = storage.read_sales(base_dir)
+    return vendas.astype({col: str for col in ("estado", "canal", "categoria", "marca", "produto", "pedido_id")})
+
+
+def dimensions(vendas: pd.DataFrame) -> dict:
+    return {
+        "inicio": vendas["data"].min().date(),
+        "fim": vendas["data"].max().date(),
+        **{chave: sorted(vendas[col].unique()) for chave, col in FILTER_COLUMNS.items()},
+    }
+
+
+def filter_states(dims: dict) -> list[dict]:
+    """Recortes usados nos testes: tudo, período e estados, período curto e canal, categorias."""
+    return [
+        dims,
+        {**dims, "estados": ["SP", "RJ"], "inicio": dt.date(2023, 3, 1)},
+        {**dims, "canais": ["Marketplace"], "inicio": dt.date(2024, 2, 10), "fim": dt.date(2024, 9, 20)},
+        {**dims, "categorias": dims["categorias"][:2], "inicio": dt.date(2023, 6, 15), "fim": dt.date(2023, 6, 15)},
+    ]
+
+
+def filter_sales(vendas: pd.DataFrame, filtros: dict) -> pd.DataFrame:
+    datas = vendas["data"].dt.date
+    mascara = (
+        (datas >= filtros["inicio"])
+        & (datas <= filtros["fim"])
+        & vendas["estado"].isin(filtros["estados"])
+        & vendas["canal"].isin(filtros["canais"])
+        & vendas["categoria"].isin(filtros["categorias"])
+    )
+    return vendas[mascara]
+
+
+def comparable_cube(cubo: pd.DataFrame) -> pd.DataFrame:
+    """Cubo indexado pelas dimensões em texto, para comparar cubos com categorias diferentes."""
+    return cubo.astype({col: str for col in CUBE_DIMS[1:]}).set_index(CUBE_DIMS)[CUBE_MEASURES].sort_index()
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+
+from cache import estimate_size
+from engine import DashboardEngine
+from timeindex import GRAOS
+
+PERIODOS = [
+    (dt.date(2024, 2, 10), dt.date(2024, 2, 20)),
+    (dt.date(2023, 3, 15), dt.date(2023, 9, 10)),
+    (dt.date(2023, 1, 1), dt.date(2024, 12, 31)),
+]
+
+
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_target_card_matches_chart_at_every_grain(parquet_base, periodo):
+    engine = DashboardEngine(parquet_base)
+    versao = engine.version()
+    filtros = {**engine.dimensions(versao), "inicio": periodo[0], "fim": periodo[1], "estados": ["SP", "MG"]}
+    for grao in GRAOS:
+        views = engine.views(filtros, versao, grao=grao)
+        assert views["meta_real"]["meta"].sum() == pytest.approx(views["kpis"]["meta_total"])
+
+
+@pytest.mark.parametrize(
+    "periodo, cobertura",
+    [
+        ((dt.date(2023, 1, 1), dt.date(2024, 12, 31)), {"ano_anterior": 0.5, "periodo_anterior": None}),
+        ((dt.date(2023, 7, 1), dt.date(2024, 6, 30)), {"ano_anterior": 181 / 365, "periodo_anterior": 181 / 366}),
+        ((dt.date(2024, 1, 1), dt.date(2024, 6, 30)), {"ano_anterior": 1.0, "periodo_anterior": 1.0}),
+    ],
+)
+def test_comparison_reports_partial_coverage(parquet_base, periodo, cobertura):
+    engine = DashboardEngine(parquet_base)
+    versao = engine.version()
+    filtros = {**engine.dimensions(versao), "inicio": periodo[0], "fim": periodo[1]}
+    comparacao = engine.views(filtros, versao)["comparacao"]
+    assert comparacao["atual"]["cobertura"] == 1.0
+    for chave, esperado in cobertura.items():
+        if esperado is None:
+            assert comparacao[chave] is None
+        else:
+            assert comparacao[chave]["cobertura"] == pytest.approx(esperado)
+
+
+def test_product_allocator_size_counts_cube_length_arrays(parquet_base):
+    engine = DashboardEngine(parquet_base)
+    alocador = engine.load_cube(engine.version())[2]
+    assert estimate_size(alocador) >= alocador.produto_idx.nbytes + alocador.ec_idx.nbytes
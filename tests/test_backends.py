@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from engine import DashboardEngine
+from reference import filter_states
+
+pytest.importorskip("duckdb")
+
+
+@pytest.mark.parametrize("pedidos", ["hll", "exato"])
+@pytest.mark.parametrize("base", ["parquet_base", "csv_base"])
+def test_duckdb_matches_pandas_order_counts(request, base, pedidos):
+    base_dir = request.getfixturevalue(base)
+    pandas_engine = DashboardEngine(base_dir, backend="pandas", pedidos=pedidos)
+    duckdb_engine = DashboardEngine(base_dir, backend="duckdb", pedidos=pedidos)
+    versao = pandas_engine.version()
+    for filtros in filter_states(pandas_engine.dimensions(versao)):
+        esperado = pandas_engine.views(filtros, versao)
+        obtido = duckdb_engine.views(filtros, versao)
+        assert obtido["kpis"]["pedidos"] == esperado["kpis"]["pedidos"]
+        assert obtido["kpis"]["ticket"] == pytest.approx(esperado["kpis"]["ticket"])
+        pd.testing.assert_series_equal(
+            obtido["canal"].set_index("canal")["pedidos"],
+            esperado["canal"].set_index("canal")["pedidos"],
+            check_dtype=False,
+            check_index_type=False,
+            check_categorical=False,
+        )
+
+
+@pytest.mark.parametrize("base", ["parquet_base", "csv_base"])
+def test_duckdb_matches_pandas_comparison(request, base):
+    base_dir = request.getfixturevalue(base)
+    pandas_engine = DashboardEngine(base_dir, backend="pandas")
+    duckdb_engine = DashboardEngine(base_dir, backend="duckdb")
+    versao = pandas_engine.version()
+    for filtros in filter_states(pandas_engine.dimensions(versao)):
+        esperado = pandas_engine.views(filtros, versao)["comparacao"]
+        obtido = duckdb_engine.views(filtros, versao)["comparacao"]
+        assert obtido.keys() == esperado.keys()
+        for chave, resumo in esperado.items():
+            assert (obtido[chave] is None) == (resumo is None)
+            if resumo is not None:
+                assert obtido[chave] == pytest.approx(resumo)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import CUBE_DIMS, SOURCE_COLUMNS, build_cube, merge_cubes
+from reference import comparable_cube, raw_sales
+from schema import day_key, prepare_sales
+
+
+@pytest.fixture(scope="module")
+def vendas(parquet_base) -> pd.DataFrame:
+    return raw_sales(parquet_base)[SOURCE_COLUMNS]
+
+
+def test_build_cube_matches_groupby_on_rows(vendas):
+    linhas = vendas.assign(dia=day_key(vendas["data"]).astype(np.int32))
+    esperado = (
+        linhas.groupby(CUBE_DIMS)
+        .agg(
+            receita=("receita", "sum"),
+            lucro=("lucro", "sum"),
+            custo=("custo", "sum"),
+            quantidade=("quantidade", "sum"),
+            pedidos=("pedido_id", "nunique"),
+            linhas=("pedido_id", "size"),
+        )
+        .sort_index()
+    )
+    pd.testing.assert_frame_equal(comparable_cube(build_cube(prepare_sales(vendas))), esperado, check_dtype=False)
+
+
+@pytest.mark.parametrize("corte", ["pedidos", "dias"])
+def test_merge_cubes_matches_full_build(vendas, corte):
+    # base e acréscimo compactados em separado, com categorias e códigos próprios, como no acréscimo incremental
+    if corte == "pedidos":
+        novo = pd.factorize(vendas["pedido_id"])[0] % 5 == 0
+    else:
+        novo = (vendas["data"] >= "2024-10-01").to_numpy()
+    base, delta = prepare_sales(vendas[~novo]), prepare_sales(vendas[novo])
+    fundido = merge_cubes(build_cube(base), build_cube(delta))
+    assert np.all(np.diff(fundido["dia"].to_numpy()) >= 0)
+    pd.testing.assert_frame_equal(comparable_cube(fundido), comparable_cube(build_cube(prepare_sales(vendas))))
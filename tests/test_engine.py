@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+import storage
+from analytics import order_counts
+from conftest import write_base
+from engine import DashboardEngine
+from instrumentation import StageProfiler
+from reference import comparable_cube, dimensions, filter_sales, filter_states, raw_sales
+
+
+def append_orders(base_dir) -> None:
+    """Acrescenta ao dataset pedidos novos: cópias de pedidos existentes e pedidos num mês depois da base."""
+    vendas = storage.read_sales(base_dir).astype({"pedido_id": str})
+    codigos = pd.factorize(vendas["pedido_id"])[0]
+    copias = vendas[codigos % 5 == 0].assign(pedido_id=lambda df: "N" + df["pedido_id"])
+    depois = vendas[vendas["ano_mes"].astype(str) == "2024-12"].assign(
+        pedido_id=lambda df: "J" + df["pedido_id"],
+        data=lambda df: df["data"] + pd.Timedelta(days=31),
+        ano=2025,
+        mes=1,
+        ano_mes="2025-01",
+        trimestre="2025Q1",
+    )
+    storage.write_sales_chunk(pd.concat([copias, depois], ignore_index=True), base_dir, offset=10**9)
+
+
+@pytest.mark.parametrize("pedidos", ["exato", "hll"])
+def test_incremental_load_matches_full_rebuild(tmp_path, pedidos):
+    base_dir = write_base(tmp_path, 4_000, "parquet")
+    engine = DashboardEngine(base_dir, pedidos=pedidos)
+    anterior = engine.version()
+    engine.load_cube(anterior)
+    append_orders(base_dir)
+    versao = engine.version()
+    assert storage.appended_files(anterior, versao)
+
+    profiler = StageProfiler(enabled=True)
+    cubo, _, _, contador = engine.load_cube(versao, profiler)
+    profiler.close()
+    assert "acrescimo_incremental" in [registro["etapa"] for registro in profiler.registros]
+    cubo_inteiro, _, _, contador_inteiro = DashboardEngine(base_dir, pedidos=pedidos).load_cube(versao)
+    pd.testing.assert_frame_equal(comparable_cube(cubo), comparable_cube(cubo_inteiro))
+
+    vendas = raw_sales(base_dir)
+    for filtros in filter_states(dimensions(vendas)):
+        obtido, esperado = order_counts(contador, filtros), order_counts(contador_inteiro, filtros)
+        assert obtido["total"] == esperado["total"]
+        pd.testing.assert_series_equal(obtido["canal"].rename(index=str), esperado["canal"].rename(index=str))
+        if pedidos == "exato":
+            assert obtido["total"] == filter_sales(vendas, filtros)["pedido_id"].nunique()
+
+
+def test_views_match_pandas_on_rows(parquet_base):
+    engine = DashboardEngine(parquet_base)
+    versao = engine.version()
+    vendas = raw_sales(parquet_base)
+    for filtros in filter_states(engine.dimensions(versao)):
+        recorte = filter_sales(vendas, filtros)
+        views = engine.views(filtros, versao)
+        if recorte.empty:
+            assert views is None
+            continue
+        receita, lucro, pedidos = recorte["receita"].sum(), recorte["lucro"].sum(), recorte["pedido_id"].nunique()
+        kpis = views["kpis"]
+        assert kpis["receita_total"] == pytest.approx(receita)
+        assert kpis["pedidos"] == pedidos
+        assert kpis["ticket"] == pytest.approx(receita / pedidos)
+        assert kpis["margem_pct"] == pytest.approx(lucro / receita * 100)
+        assert views["meta_real"]["realizado"].sum() == pytest.approx(receita)
+
+        canal = views["canal"].astype({"canal": str}).set_index("canal")
+        por_canal = recorte.groupby("canal")
+        pd.testing.assert_series_equal(canal["receita"], por_canal["receita"].sum(), check_names=False)
+        pd.testing.assert_series_equal(
+            canal["pedidos"], por_canal["pedido_id"].nunique(), check_names=False, check_dtype=False
+        )
+        categoria = views["categoria"].set_index(["categoria", "marca"])["receita"].sort_index()
+        pd.testing.assert_series_equal(categoria, recorte.groupby(["categoria", "marca"])["receita"].sum())
+        estados = views["estados"].astype({"estado": str}).set_index("estado")["receita"]
+        pd.testing.assert_series_equal(estados, recorte.groupby("estado")["receita"].sum(), check_names=False)
+
+        produtos = views["produtos"]
+        esperado = recorte.groupby("produto")["receita"].sum().nlargest(len(produtos)).round(2)
+        assert produtos["produto"].tolist() == esperado.index.tolist()
+        assert produtos["receita"].tolist() == pytest.approx(esperado.tolist())
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import storage
+from export import FORMATOS, export_sales, prune_exports
+
+
+def test_prune_exports_by_age_and_count(tmp_path):
+    agora = time.time()
+    idades = {"vendas_a.csv": 1, "vendas_b.parquet": 2, "vendas_c.csv": 3, "vendas_d.csv": 10}
+    idades |= {".vendas_e.csv.tmp-1": 0.1, ".vendas_f.csv.tmp-2": 10, "outro.csv": 10}
+    for nome, horas in idades.items():
+        caminho = tmp_path / nome
+        caminho.write_text("x")
+        os.utime(caminho, (agora - horas * 3600,) * 2)
+
+    assert prune_exports(tmp_path, "vendas_", idade_horas=6, manter=2, agora=agora) == 3
+    restantes = sorted(p.name for p in tmp_path.iterdir())
+    assert restantes == [".vendas_e.csv.tmp-1", "outro.csv", "vendas_a.csv", "vendas_b.parquet"]
+    assert prune_exports(tmp_path / "ausente", "vendas_", idade_horas=6, manter=2) == 0
+
+
+@pytest.mark.parametrize("base", ["parquet_base", "csv_base"])
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_export_outside_the_data_keeps_the_columns(request, tmp_path, base, formato):
+    base_dir = request.getfixturevalue(base)
+    filtros = {"inicio": dt.date(2030, 1, 1), "fim": dt.date(2030, 12, 31)}
+    resumo = export_sales(base_dir, filtros, tmp_path / f"vazio.{formato}")
+    assert resumo["exportadas"] == 0
+    lido = pd.read_csv(resumo["arquivo"]) if formato == "csv" else pd.read_parquet(resumo["arquivo"])
+    assert lido.empty
+    assert list(lido.columns) == list(storage.empty_sales(base_dir).columns)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+import generate_data
+import storage
+from conftest import write_base
+
+
+def reference_targets(base_dir) -> pd.DataFrame:
+    vendas = storage.read_sales(base_dir).astype({"estado": str, "canal": str, "pedido_id": str})
+    return generate_data.build_targets(vendas).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("chunk_size", [97, 997, 1_000_000])
+def test_streamed_targets_match_in_memory_with_baskets(parquet_base, chunk_size):
+    # blocos lidos cortam pedidos de vários itens ao meio: nenhum pedido pode ser contado duas vezes
+    streamed = generate_data.build_targets_from_disk(parquet_base, chunk_size=chunk_size)
+    pd.testing.assert_frame_equal(streamed.reset_index(drop=True), reference_targets(parquet_base))
+
+
+def test_streamed_targets_match_in_memory_on_csv(csv_base):
+    streamed = generate_data.build_targets_from_disk(csv_base, chunk_size=997)
+    pd.testing.assert_frame_equal(streamed.reset_index(drop=True), reference_targets(csv_base))
+
+
+def test_generated_targets_match_in_memory(parquet_base):
+    # metas gravadas na geração, somando os agregados de cada shard
+    gravadas = storage.read_targets(parquet_base).astype({"estado": str, "canal": str})
+    pd.testing.assert_frame_equal(gravadas.reset_index(drop=True), reference_targets(parquet_base), check_dtype=False)
+
+
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_generated_base_does_not_depend_on_chunk_size(tmp_path, monkeypatch, formato):
+    # blocos de sementes pequenos para que a base tenha vários, cortados em posições diferentes dos shards
+    monkeypatch.setattr(generate_data, "BLOCO_SEMENTE", 1_000)
+    bases = [
+        storage.read_sales(write_base(tmp_path / str(chunk_size), 5_500, formato, chunk_size=chunk_size))
+        .sort_values("pedido_id", ignore_index=True)
+        for chunk_size in (700, 2_500, 1_000_000)
+    ]
+    for base in bases[1:]:
+        pd.testing.assert_frame_equal(base, bases[0])
+
+
+def test_seed_blocks_cut_at_block_multiples(monkeypatch):
+    monkeypatch.setattr(generate_data, "BLOCO_SEMENTE", 1_000)
+    assert generate_data.seed_blocks(0, 2_500, 1_500) == [[(0, 1_000)], [(1_000, 1_000), (2_000, 500)]]
+    # acréscimo a partir do meio de um bloco: o primeiro bloco vai só até o próximo múltiplo
+    esperado = [[(2_500, 500), (3_000, 1_000)], [(4_000, 1_000), (5_000, 500)]]
+    assert generate_data.seed_blocks(2_500, 3_000, 2_000) == esperado
+    assert generate_data.seed_blocks(0, 0, 1_000) == []
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import tracemalloc
+
+from instrumentation import StageProfiler
+
+
+def test_tracing_stops_when_last_profiler_closes():
+    assert not tracemalloc.is_tracing()
+    primeiro, segundo = StageProfiler(enabled=True), StageProfiler(enabled=True)
+    with primeiro.etapa("etapa"):
+        pass
+    primeiro.close()
+    assert tracemalloc.is_tracing()
+    segundo.close()
+    segundo.close()
+    assert not tracemalloc.is_tracing()
+    with primeiro.etapa("depois"):
+        pass
+    assert [r["etapa"] for r in primeiro.registros] == ["etapa"]
+
+
+def test_tracing_started_elsewhere_is_left_on():
+    tracemalloc.start()
+    try:
+        StageProfiler(enabled=True).close()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
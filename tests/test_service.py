@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from engine import DashboardEngine
+from service import AggregationService, HTTPError, read_message
+
+
+def read(mensagem: bytes):
+    async def ler():
+        reader = asyncio.StreamReader()
+        reader.feed_data(mensagem)
+        reader.feed_eof()
+        return await read_message(reader)
+
+    return asyncio.run(ler())
+
+
+def test_read_message_body():
+    inicial, cabecalhos, corpo = read(b"POST /views HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}")
+    assert (inicial, cabecalhos["content-length"], corpo) == ("POST /views HTTP/1.1", "2", b"{}")
+
+
+@pytest.mark.parametrize("valor", [b"abc", b"-5", b"+2", b"1_0", b"", "²".encode("latin-1")])
+def test_read_message_rejects_invalid_content_length(valor):
+    with pytest.raises(HTTPError) as erro:
+        read(b"POST /views HTTP/1.1\r\nContent-Length: " + valor + b"\r\n\r\n{}")
+    assert erro.value.status == 400
+
+
+def test_read_message_rejects_oversized_lines():
+    with pytest.raises(HTTPError) as erro:
+        read(b"GET /" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n")
+    assert erro.value.status == 400
+    with pytest.raises(HTTPError) as erro:
+        read(b"GET /health HTTP/1.1\r\nX-Grande: " + b"a" * 70_000 + b"\r\n\r\n")
+    assert erro.value.status == 431
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [{"secoes": 5}, {"secoes": "kpis"}, {"secoes": [["kpis"]]}, {"grao": ["mes"]}, {"estados": [["SP"]]}, {"canais": 3}],
+)
+def test_views_rejects_payload_types(csv_base, payload):
+    servico = AggregationService(DashboardEngine(csv_base), workers=1)
+
+    async def consultar():
+        return await servico.route("POST", "/views", json.dumps(payload).encode())
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(consultar())
+    finally:
+        servico.pool.shutdown()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+import sketch
+from analytics import order_counts
+from cube import SOURCE_COLUMNS
+from reference import dimensions, filter_sales, filter_states, raw_sales
+from schema import prepare_sales
+from sketch import OrderCounter
+
+
+@pytest.fixture(scope="module")
+def vendas(parquet_base) -> pd.DataFrame:
+    return raw_sales(parquet_base)[SOURCE_COLUMNS]
+
+
+def merged_counter(vendas: pd.DataFrame, novo, modo: str) -> OrderCounter:
+    base = OrderCounter.from_sales(prepare_sales(vendas[~novo], pedido_hash=modo == "hll"), modo)
+    delta = prepare_sales(vendas[novo], pedido_hash=modo == "hll")
+    return base.merge(OrderCounter.from_sales(delta, modo, primeiro_codigo=base.proximo_codigo))
+
+
+def assert_matches_rows(contador: OrderCounter, vendas: pd.DataFrame) -> None:
+    for filtros in filter_states(dimensions(vendas)):
+        recorte = filter_sales(vendas, filtros)
+        obtido = order_counts(contador, filtros)
+        assert obtido["total"] == recorte["pedido_id"].nunique()
+        esperado = recorte.groupby("canal")["pedido_id"].nunique()
+        pd.testing.assert_series_equal(
+            obtido["canal"].rename(index=str), esperado, check_names=False, check_dtype=False
+        )
+
+
+def test_exact_counts_match_distinct_orders(vendas):
+    assert_matches_rows(OrderCounter.from_sales(prepare_sales(vendas)), vendas)
+
+
+@pytest.mark.parametrize("corte", ["pedidos", "dias"])
+def test_exact_merge_matches_distinct_orders(vendas, corte):
+    if corte == "pedidos":
+        novo = pd.factorize(vendas["pedido_id"])[0] % 3 == 0
+    else:
+        novo = (vendas["data"] >= "2024-10-01").to_numpy()
+    assert_matches_rows(merged_counter(vendas, novo, "exato"), vendas)
+
+
+def test_hll_merge_matches_full_sketch(vendas):
+    # a união de esboços é o máximo registrador a registrador: a mesma estimativa do esboço da base inteira
+    fundido = merged_counter(vendas, (vendas["data"] >= "2024-10-01").to_numpy(), "hll")
+    inteiro = OrderCounter.from_sales(prepare_sales(vendas, pedido_hash=True), "hll")
+    for filtros in filter_states(dimensions(vendas)):
+        esperado = order_counts(inteiro, filtros)
+        obtido = order_counts(fundido, filtros)
+        assert obtido["total"] == esperado["total"]
+        pd.testing.assert_series_equal(obtido["canal"].rename(index=str), esperado["canal"].rename(index=str))
+
+
+@pytest.mark.parametrize("fracao", [0, 10**9])
+def test_exact_counts_same_with_and_without_bitmap(vendas, monkeypatch, fracao):
+    # 0: sempre ordena as entradas selecionadas; 10**9: sempre usa o mapa de bits
+    monkeypatch.setattr(sketch, "FRACAO_MAPA", fracao)
+    assert_matches_rows(OrderCounter.from_sales(prepare_sales(vendas)), vendas)
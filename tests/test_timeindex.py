@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from cube import SOURCE_COLUMNS, build_cube
+from reference import dimensions, filter_sales, filter_states, raw_sales
+from schema import day_key, prepare_sales
+from timeindex import GRAOS, DailyPrefixIndex, PeriodRollups, period_keys
+
+
+@pytest.fixture(scope="module")
+def vendas(parquet_base) -> pd.DataFrame:
+    return raw_sales(parquet_base)[SOURCE_COLUMNS]
+
+
+@pytest.fixture(scope="module")
+def indice(vendas) -> DailyPrefixIndex:
+    return DailyPrefixIndex(build_cube(prepare_sales(vendas)))
+
+
+def periods(dims: dict) -> list[dict]:
+    # os recortes de sempre e um período que passa das bordas da base
+    return filter_states(dims) + [{**dims, "inicio": dt.date(2022, 11, 20), "fim": dt.date(2023, 2, 3)}]
+
+
+def test_prefix_totals_match_row_sums(vendas, indice):
+    for filtros in periods(dimensions(vendas)):
+        recorte = filter_sales(vendas, filtros)
+        totais = indice.totals(filtros, filtros["inicio"], filtros["fim"])
+        assert totais["receita"] == pytest.approx(recorte["receita"].sum())
+        assert totais["lucro"] == pytest.approx(recorte["lucro"].sum())
+        assert totais["linhas"] == len(recorte)
+
+
+@pytest.mark.parametrize("grao", GRAOS)
+def test_rollups_match_row_groupby(vendas, indice, grao):
+    rollups = PeriodRollups(indice)
+    for filtros in periods(dimensions(vendas)):
+        recorte = filter_sales(vendas, filtros)
+        esperado = recorte["receita"].groupby(period_keys(day_key(recorte["data"]), grao)).sum()
+        obtido = rollups.realized(filtros, grao)
+        # períodos sem venda no recorte aparecem com zero nas tabelas agregadas
+        pd.testing.assert_series_equal(
+            obtido[obtido.abs() > 0.005], esperado, check_names=False, check_index_type=False
+        )
@@ -0,0 +1,223 @@
+"""Índice de somas acumuladas por dia para KPIs de qualquer período em O(1).
+
+Para cada combinação estado × canal × categoria, guarda a soma acumulada dia a
+dia das medidas aditivas do cubo. O total de um período é a diferença entre
+duas posições do acumulado, então mudar só o ``periodo`` não percorre o cubo:
+o custo depende do número de combinações selecionadas, não do volume de dias
+ou de vendas. O mesmo índice responde aos períodos de comparação (mesmo
+período do ano anterior e período anterior) sem varredura extra, e a fração
+dos dias de cada período dentro da base diz se a comparação entre eles vale.
+
+``PeriodRollups`` soma esses acumulados por dia, semana ISO, mês e trimestre,
+uma vez por versão dos dados: a série de meta vs. realizado em qualquer grão
+lê as tabelas já agregadas, e só os períodos cortados pelo filtro de datas
+(no máximo o primeiro e o último) voltam aos acumulados. As metas mensais são
+distribuídas igualmente pelos dias do mês e somadas no grão pedido, então a
+soma das metas do recorte é a mesma em todos os grãos e igual à de
+``prorate_targets``, usada no cartão de meta e no rateio por produto.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from schema import EPOCH, day_key, day_key_of, month_key_of_day, month_label, month_start
+
+INDEX_DIMS = ["estado", "canal", "categoria"]
+INDEX_MEASURES = ["receita", "lucro", "linhas"]
+GRAOS = ("dia", "semana", "mes", "trimestre")
+
+
+class DailyPrefixIndex:
+    """Acumulados por dia de ``INDEX_MEASURES`` para cada estado × canal × categoria do cubo."""
+
+    def __init__(self, cubo: pd.DataFrame) -> None:
+        self.categorias = {col: cubo[col].cat.categories for col in INDEX_DIMS}
+        self.forma = tuple(len(self.categorias[col]) for col in INDEX_DIMS)
+        dias = cubo["dia"].to_numpy()
+        self.primeiro_dia = int(dias.min()) if len(dias) else 0
+        self.n_dias = int(dias.max()) - self.primeiro_dia + 1 if len(dias) else 0
+
+        combinacao = np.ravel_multi_index(
+            tuple(cubo[col].cat.codes.to_numpy().astype(np.int64) for col in INDEX_DIMS), self.forma
+        )
+        posicao = combinacao * self.n_dias + (dias - self.primeiro_dia)
+        tamanho = int(np.prod(self.forma)) * self.n_dias
+        # acumulado[m][c, d] = soma da medida m na combinação c até o dia d - 1 (coluna 0 zerada)
+        self.acumulado = {}
+        for medida in INDEX_MEASURES:
+            diario = np.bincount(posicao, weights=cubo[medida].to_numpy(), minlength=tamanho)
+            acumulado = np.zeros((int(np.prod(self.forma)), self.n_dias + 1))
+            np.cumsum(diario.reshape(-1, self.n_dias), axis=1, out=acumulado[:, 1:])
+            self.acumulado[medida] = acumulado
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sum(acumulado.nbytes for acumulado in self.acumulado.values())
+
+    def day_range(self, inicio: dt.date, fim: dt.date) -> tuple[int, int]:
+        """Colunas ``[a, b)`` do acumulado que cobrem o período, limitadas aos dias da base."""
+        a = int(np.clip(day_key_of(inicio) - self.primeiro_dia, 0, self.n_dias))
+        b = int(np.clip(day_key_of(fim) - self.primeiro_dia + 1, 0, self.n_dias))
+        return a, max(a, b)
+
+    def coverage(self, inicio: dt.date, fim: dt.date) -> float:
+        """Fração dos dias de [inicio, fim] que a base cobre."""
+        a, b = self.day_range(inicio, fim)
+        return (b - a) / ((fim - inicio).days + 1)
+
+    def combinations(self, filtros: dict) -> np.ndarray:
+        """Linhas do índice (combinações) que atendem aos filtros de estado, canal e categoria."""
+        chaves = {"estado": "estados", "canal": "canais", "categoria": "categorias"}
+        mascaras = [self.categorias[col].isin(filtros[chaves[col]]) for col in INDEX_DIMS]
+        selecionadas = mascaras[0][:, None, None] & mascaras[1][None, :, None] & mascaras[2][None, None, :]
+        return np.flatnonzero(selecionadas.ravel())
+
+    def totals(self, filtros: dict, inicio: dt.date, fim: dt.date) -> dict[str, float]:
+        """Somas das medidas no período [inicio, fim], por diferença de acumulados."""
+        a, b = self.day_range(inicio, fim)
+        linhas = self.combinations(filtros)
+        if b <= a:
+            return {medida: 0.0 for medida in INDEX_MEASURES}
+        return {
+            medida: float((acumulado[linhas, b] - acumulado[linhas, a]).sum())
+            for medida, acumulado in self.acumulado.items()
+        }
+
+
+def shift_year(data: dt.date, anos: int = -1) -> dt.date:
+    try:
+        return data.replace(year=data.year + anos)
+    except ValueError:  # 29 de fevereiro
+        return data.replace(year=data.year + anos, day=28)
+
+
+def period_coverage(inicio: dt.date, fim: dt.date, primeiro: dt.date, ultimo: dt.date) -> float:
+    """Fração dos dias de [inicio, fim] dentro de [primeiro, ultimo], as datas extremas da base."""
+    dentro = (min(fim, ultimo) - max(inicio, primeiro)).days + 1
+    return max(dentro, 0) / ((fim - inicio).days + 1)
+
+
+def comparison_periods(inicio: dt.date, fim: dt.date) -> dict[str, tuple[dt.date, dt.date]]:
+    """Mesmo período do ano anterior e período imediatamente anterior, de mesma duração."""
+    duracao = fim - inicio + dt.timedelta(days=1)
+    return {
+        "ano_anterior": (shift_year(inicio), shift_year(fim)),
+        "periodo_anterior": (inicio - duracao, inicio - dt.timedelta(days=1)),
+    }
+
+
+def period_keys(dias: np.ndarray, grao: str) -> np.ndarray:
+    """Chave inteira e crescente do período de cada dia (dias desde 1970-01-01)."""
+    dias = np.asarray(dias).astype(np.int64)
+    if grao == "dia":
+        return dias
+    if grao == "semana":
+        # 1970-01-01 foi uma quinta-feira: a semana ISO começa 3 dias antes
+        return (dias + 3) // 7
+    meses = month_key_of_day(dias).astype(np.int64)
+    if grao == "mes":
+        return meses
+    if grao == "trimestre":
+        return (meses // 100) * 10 + (meses % 100 - 1) // 3 + 1
+    raise ValueError(f"Grão inválido: {grao!r}. Use {', '.join(GRAOS)}.")
+
+
+def period_start(chaves: np.ndarray, grao: str) -> pd.Series:
+    chaves = np.asarray(chaves).astype(np.int64)
+    if grao == "dia":
+        return pd.Series((EPOCH + chaves.astype("timedelta64[D]")).astype("datetime64[ns]"))
+    if grao == "semana":
+        return pd.Series((EPOCH + (chaves * 7 - 3).astype("timedelta64[D]")).astype("datetime64[ns]"))
+    if grao == "trimestre":
+        chaves = (chaves // 10) * 100 + (chaves % 10 - 1) * 3 + 1
+    return month_start(chaves)
+
+
+def period_label(chaves: np.ndarray, grao: str) -> pd.Series:
+    """Rótulos "2024-03-05", "2024-W10", "2024-03" ou "2024-T1"."""
+    if grao == "mes":
+        return month_label(chaves)
+    if grao == "trimestre":
+        chaves = pd.Series(np.asarray(chaves).astype(np.int64))
+        return (chaves // 10).astype(str) + "-T" + (chaves % 10).astype(str)
+    inicios = period_start(chaves, grao)
+    if grao == "dia":
+        return inicios.dt.strftime("%Y-%m-%d")
+    iso = inicios.dt.isocalendar()
+    return iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+
+
+class PeriodRollups:
+    """Receita por estado × canal × categoria em cada grão de ``GRAOS``, a partir do índice diário."""
+
+    def __init__(self, indice: DailyPrefixIndex) -> None:
+        self.indice = indice
+        dias = indice.primeiro_dia + np.arange(indice.n_dias)
+        acumulado = indice.acumulado["receita"]
+        self.limites: dict[str, np.ndarray] = {}
+        self.chaves: dict[str, np.ndarray] = {}
+        self.receita: dict[str, np.ndarray] = {}
+        for grao in GRAOS:
+            chaves = period_keys(dias, grao)
+            # colunas do acumulado onde cada período começa, mais o fim da base
+            limites = np.concatenate(([0], np.flatnonzero(np.diff(chaves)) + 1, [indice.n_dias]))
+            self.limites[grao] = limites
+            self.chaves[grao] = chaves[limites[:-1]]
+            self.receita[grao] = acumulado[:, limites[1:]] - acumulado[:, limites[:-1]]
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sum(tabela.nbytes for tabela in self.receita.values())
+
+    def realized(self, filtros: dict, grao: str) -> pd.Series:
+        """Receita do recorte por período (chave de ``period_keys``), para os períodos que tocam o filtro."""
+        a, b = self.indice.day_range(filtros["inicio"], filtros["fim"])
+        limites = self.limites[grao]
+        if b <= a:
+            return pd.Series(dtype=np.float64)
+        p0 = int(np.searchsorted(limites, a, side="right")) - 1
+        p1 = int(np.searchsorted(limites, b, side="left"))
+        linhas = self.indice.combinations(filtros)
+        valores = self.receita[grao][linhas, p0:p1].sum(axis=0)
+        # primeiro e último períodos podem estar cortados pelo filtro: somados nos acumulados
+        inicios = np.maximum(limites[p0:p1], a)
+        fins = np.minimum(limites[p0 + 1:p1 + 1], b)
+        acumulado = self.indice.acumulado["receita"]
+        for i in np.flatnonzero((inicios != limites[p0:p1]) | (fins != limites[p0 + 1:p1 + 1])):
+            valores[i] = (acumulado[linhas, fins[i]] - acumulado[linhas, inicios[i]]).sum()
+        return pd.Series(valores, index=self.chaves[grao][p0:p1])
+
+
+def month_coverage(meses: np.ndarray, inicio: dt.date, fim: dt.date) -> np.ndarray:
+    """Fração dos dias de cada mês (AAAAMM) que cai em [inicio, fim]."""
+    meses = np.asarray(meses).astype(np.int64)
+    primeiro = day_key(month_start(meses))
+    seguinte = day_key(month_start(np.where(meses % 100 == 12, meses + 89, meses + 1)))
+    dentro = np.minimum(seguinte, day_key_of(fim) + 1) - np.maximum(primeiro, day_key_of(inicio))
+    return np.clip(dentro, 0, None) / (seguinte - primeiro)
+
+
+def prorate_targets(metas: pd.DataFrame, inicio: dt.date, fim: dt.date) -> pd.DataFrame:
+    """Metas dos meses que tocam o período, proporcionais aos dias de cada mês dentro dele.
+
+    Mesma regra de ``spread_targets``: a soma é o total das metas do gráfico em qualquer grão.
+    """
+    fracao = month_coverage(metas["mes_key"].to_numpy(), inicio, fim)
+    dentro = fracao > 0
+    return metas[dentro].assign(
+        meta_faturamento=metas["meta_faturamento"].to_numpy()[dentro] * fracao[dentro],
+        meta_pedidos=metas["meta_pedidos"].to_numpy()[dentro] * fracao[dentro],
+    )
+
+
+def spread_targets(metas: pd.DataFrame, inicio: dt.date, fim: dt.date, grao: str) -> pd.Series:
+    """Meta de faturamento por período entre ``inicio`` e ``fim``, cada mês dividido igualmente pelos seus dias."""
+    dias = np.arange(day_key_of(inicio), day_key_of(fim) + 1)
+    meses = (EPOCH + dias.astype("timedelta64[D]")).astype("datetime64[M]")
+    dias_no_mes = ((meses + 1).astype("datetime64[D]") - meses.astype("datetime64[D]")).astype(np.int64)
+    por_mes = metas.groupby("mes_key")["meta_faturamento"].sum()
+    meta_dia = por_mes.reindex(month_key_of_day(dias)).fillna(0).to_numpy() / dias_no_mes
+    chaves, grupo = np.unique(period_keys(dias, grao), return_inverse=True)
+    return pd.Series(np.bincount(grupo, weights=meta_dia, minlength=len(chaves)), index=chaves)
@@ -0,0 +1,128 @@
+"""Pré-aquecimento dos caches do painel ao subir o processo.
+
+Sem ele, a primeira sessão depois de um deploy ou reinício paga a leitura da
+base, a montagem do cubo e todas as agregações. ``WarmUp`` faz esse trabalho
+em segundo plano, num pool de threads sobre a mesma ``DashboardEngine``: carrega
+os dados e as estruturas derivadas e depois calcula a visão padrão ("todos os
+filtros") e as combinações populares configuradas, por exemplo cada estado e
+cada canal sozinhos.
+
+Nada espera pelo aquecimento: uma requisição que chega antes usa o que já
+estiver pronto, e o que ainda está sendo calculado é compartilhado pelo
+``LRUCache.get_or_compute`` em vez de calculado duas vezes.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from analytics import FILTER_COLUMNS, parse_filters
+from engine import DashboardEngine
+
+# padrão: cada estado e cada canal sozinhos, além da visão com todos os filtros
+WARMUP_PADRAO = "estados,canais"
+
+log = logging.getLogger("painel.warmup")
+
+
+def parse_warmup(texto: str) -> tuple[str, ...]:
+    """Filtros variados um valor por vez, ex. "estados,canais"; vazio ou "0" desliga."""
+    chaves = tuple(parte.strip() for parte in texto.split(",") if parte.strip() and parte.strip() != "0")
+    invalidas = [chave for chave in chaves if chave not in FILTER_COLUMNS]
+    if invalidas:
+        raise ValueError(f"Filtros de pré-aquecimento inválidos: {', '.join(invalidas)}. Use {', '.join(FILTER_COLUMNS)}.")
+    return chaves
+
+
+def popular_filters(
+    dimensoes: dict[str, Any], por: tuple[str, ...], extras: list[dict[str, Any]] | None = None
+) -> list[dict[str, Any]]:
+    """Visão padrão, um estado de filtros por valor de cada chave em ``por`` e os ``extras`` (formato JSON)."""
+    todos = parse_filters({}, dimensoes)
+    combinacoes = [todos]
+    for chave in por:
+        combinacoes.extend({**todos, chave: [valor]} for valor in dimensoes[chave])
+    combinacoes.extend(parse_filters(payload, dimensoes) for payload in extras or [])
+    return combinacoes
+
+
+def read_extras(caminho: Path | None) -> list[dict[str, Any]]:
+    """Lista JSON de filtros no formato do serviço (``inicio``, ``fim``, ``estados``...)."""
+    if caminho is None:
+        return []
+    extras = json.loads(Path(caminho).read_text(encoding="utf-8"))
+    if not isinstance(extras, list):
+        raise ValueError(f"{caminho} deve conter uma lista JSON de filtros")
+    return extras
+
+
+class WarmUp:
+    """Aquecimento em segundo plano; ``status()`` informa o progresso."""
+
+    def __init__(
+        self,
+        engine: DashboardEngine,
+        por: tuple[str, ...] = ("estados", "canais"),
+        extras: list[dict[str, Any]] | None = None,
+        workers: int = 2,
+    ) -> None:
+        self.engine = engine
+        self.por = por
+        self.extras = extras or []
+        self.workers = max(workers, 1)
+        self._lock = threading.Lock()
+        self._status: dict[str, Any] = {"etapa": "parado", "total": 0, "concluidos": 0, "erros": 0, "segundos": None}
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "WarmUp":
+        """Dispara o aquecimento numa thread de fundo e retorna na hora."""
+        with self._lock:
+            if self._thread is None:
+                self._status["etapa"] = "carga"
+                self._thread = threading.Thread(target=self._run, name="painel-aquecimento", daemon=True)
+                self._thread.start()
+        return self
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+    def _update(self, **campos: Any) -> None:
+        with self._lock:
+            self._status.update(campos)
+
+    def _run(self) -> None:
+        inicio = time.perf_counter()
+        try:
+            versao = self.engine.version()
+            # a carga (leitura, cubo, contador de pedidos) vem primeiro: todas as visões dependem dela
+            dimensoes = self.engine.dimensions(versao)
+            combinacoes = popular_filters(dimensoes, self.por, self.extras)
+        except Exception:
+            log.exception("Falha no pré-aquecimento")
+            self._update(etapa="falhou", segundos=time.perf_counter() - inicio)
+            return
+
+        self._update(etapa="agregados", total=len(combinacoes))
+
+        def aquecer(filtros: dict[str, Any]) -> None:
+            try:
+                self.engine.views(filtros, versao)
+                with self._lock:
+                    self._status["concluidos"] += 1
+            except Exception:
+                log.exception("Falha ao pré-calcular %s", filtros)
+                with self._lock:
+                    self._status["erros"] += 1
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="painel-aquecimento") as pool:
+            list(pool.map(aquecer, combinacoes))
+        segundos = time.perf_counter() - inicio
+        self._update(etapa="pronto", segundos=segundos)
+        log.info("Pré-aquecimento concluído: %s visões em %.1fs", len(combinacoes), segundos)